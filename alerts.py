@@ -0,0 +1,276 @@
+import json
+import os
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+from data_store import STORE_DIR
+from indicators import INDICATOR_COLUMNS
+
+ALERT_STATE_PATH = os.path.join(STORE_DIR, 'alerts', 'state.npz')
+# Cột được dùng trong điều kiện: giá, khối lượng và các chỉ báo của add_technical_indicators
+RULE_COLUMNS = ('open', 'high', 'low', 'close', 'volume') + INDICATOR_COLUMNS
+
+# Cú pháp điều kiện: "<cột|số> <toán tử> <cột|số>", ví dụ "RSI > 70", "close crosses_above BB_Upper"
+_CONDITION = re.compile(
+    r'^\s*(\S+)\s+(>=|<=|>|<|==|crosses[ _]above|crosses[ _]below|crosses)\s+(\S+)\s*$', re.IGNORECASE)
+
+_OPERATORS = {
+    '>': lambda a, b, pa, pb: a > b,
+    '<': lambda a, b, pa, pb: a < b,
+    '>=': lambda a, b, pa, pb: a >= b,
+    '<=': lambda a, b, pa, pb: a <= b,
+    '==': lambda a, b, pa, pb: a == b,
+    # Cắt lên/xuống: so sánh phiên trước với phiên mới nhất
+    'crosses_above': lambda a, b, pa, pb: (pa <= pb) & (a > b),
+    'crosses_below': lambda a, b, pa, pb: (pa >= pb) & (a < b),
+    'crosses': lambda a, b, pa, pb: ((pa <= pb) & (a > b)) | ((pa >= pb) & (a < b)),
+}
+
+
+def load_rules(path: str):
+    # Đọc danh sách quy tắc từ file JSON hoặc TOML (khóa "rules")
+    if path.endswith('.toml'):
+        import tomllib
+        with open(path, 'rb') as f:
+            config = tomllib.load(f)
+    else:
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+    return config['rules'] if isinstance(config, dict) else config
+
+
+def _operand(token):
+    try:
+        return float(token)
+    except ValueError:
+        return token
+
+
+def compile_condition(text: str):
+    match = _CONDITION.match(text)
+    if not match:
+        raise ValueError(f"Điều kiện không hợp lệ: {text!r}")
+    lhs, op, rhs = match.groups()
+    op = op.lower().replace(' ', '_')
+    lhs, rhs = _operand(lhs), _operand(rhs)
+    for operand in (lhs, rhs):
+        if isinstance(operand, str) and operand not in RULE_COLUMNS:
+            raise ValueError(f"Cột không hợp lệ trong điều kiện {text!r}: {operand} "
+                             f"(dùng được: {', '.join(RULE_COLUMNS)})")
+    return lhs, _OPERATORS[op], rhs
+
+
+class AlertRule:
+    # Một quy tắc đã biên dịch: mọi điều kiện trong "when" phải cùng đúng
+
+    def __init__(self, name: str, when, symbols=None, cooldown_days: float = 0, message: str = None):
+        self.name = name
+        self.text = [when] if isinstance(when, str) else list(when)
+        self.conditions = [compile_condition(text) for text in self.text]
+        if isinstance(symbols, str) and symbols != '*':
+            symbols = [symbols]
+        self.symbols = {s.upper() for s in symbols} if symbols and symbols != '*' else None
+        self.cooldown = np.int64(cooldown_days * 86400 * 10**9)
+        self.message = message or " và ".join(self.text)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config['name'], config['when'], config.get('symbols'),
+                   config.get('cooldown_days', 0), config.get('message'))
+
+    def columns(self):
+        return {x for lhs, _, rhs in self.conditions for x in (lhs, rhs) if isinstance(x, str)}
+
+    def evaluate(self, current, previous, positions):
+        # current/previous: cột -> mảng giá trị phiên mới nhất/phiên trước của mọi mã;
+        # positions: mã -> vị trí trong các mảng đó
+        if self.symbols is not None:
+            # Quy tắc cho vài mã: chỉ đánh giá đúng các vị trí đó
+            index = np.array([positions[s] for s in self.symbols if s in positions], dtype=np.intp)
+            current = {c: current[c][index] for c in self.columns()}
+            previous = {c: previous[c][index] for c in self.columns()}
+        hit = None
+        with np.errstate(invalid='ignore'):
+            for lhs, op, rhs in self.conditions:
+                a, pa = (current[lhs], previous[lhs]) if isinstance(lhs, str) else (lhs, lhs)
+                b, pb = (current[rhs], previous[rhs]) if isinstance(rhs, str) else (rhs, rhs)
+                result = op(a, b, pa, pb)
+                hit = result if hit is None else hit & result
+        if self.symbols is not None:
+            full = np.zeros(len(positions), dtype=bool)
+            full[index] = hit
+            return full
+        return hit
+
+
+def last_bars(frames, columns):
+    # Lấy hai phiên cuối của mỗi mã cho các cột cần dùng: (mã, giá trị mới nhất, giá trị phiên trước, thời gian phiên)
+    symbols, rows, times = [], [], []
+    columns = sorted(columns)
+    indexers = {}
+    for symbol, df in frames.items():
+        if df is None or len(df) < 2:
+            continue
+        # Đổi cả bảng sang mảng một lần rồi cắt: nhanh hơn nhiều so với df[columns] hay df.iloc[-2:]
+        key = tuple(df.columns)
+        if key not in indexers:
+            indexers[key] = df.columns.get_indexer(columns)
+        if (indexers[key] < 0).any():
+            # Thiếu cột (chưa tính chỉ báo): bỏ qua mã này thay vì đọc nhầm cột cuối
+            missing = [c for c, i in zip(columns, indexers[key]) if i < 0]
+            print(f"Bỏ qua cảnh báo cho {symbol}: thiếu cột {', '.join(missing)}")
+            continue
+        try:
+            tail = df.to_numpy(dtype=np.float64)[-2:, indexers[key]]
+        except (TypeError, ValueError):
+            # Bảng có cột chữ: lấy từng cột cần dùng
+            tail = np.array([df[c].to_numpy(dtype=np.float64)[-2:] for c in columns]).T
+        symbols.append(symbol)
+        rows.append(tail)
+        times.append(pd.Timestamp(df.index[-1]).value)
+    if not rows:
+        empty = {c: np.empty(0) for c in columns}
+        return np.array([], dtype=object), empty, empty, np.empty(0, dtype=np.int64)
+    values = np.stack(rows)
+    current = {c: values[:, 1, i] for i, c in enumerate(columns)}
+    previous = {c: values[:, 0, i] for i, c in enumerate(columns)}
+    return np.array(symbols, dtype=object), current, previous, np.array(times, dtype=np.int64)
+
+
+class AlertEngine:
+    # Đánh giá toàn bộ quy tắc trên phiên mới nhất của mọi mã trong một lượt.
+    # Trạng thái (quy tắc x mã) chỉ cho phép báo khi điều kiện chuyển từ sai sang đúng
+    # và đã qua cooldown kể từ lần báo trước, để không gửi lặp lại ở mỗi lần làm mới.
+
+    def __init__(self, rules, state_path: str = ALERT_STATE_PATH):
+        self.rules = [r if isinstance(r, AlertRule) else AlertRule.from_config(r) for r in rules]
+        self.columns = set().union(*(rule.columns() for rule in self.rules)) if self.rules else set()
+        self.cooldown = np.array([rule.cooldown for rule in self.rules], dtype=np.int64)[:, None]
+        self.state_path = state_path
+        self.symbols = {}
+        self.active = np.zeros((len(self.rules), 0), dtype=bool)
+        self.last_alert = np.zeros((len(self.rules), 0), dtype=np.int64)
+        self.last_bar = np.zeros(0, dtype=np.int64)
+        if state_path:
+            self.load_state()
+
+    @classmethod
+    def from_file(cls, path: str, state_path: str = ALERT_STATE_PATH):
+        return cls(load_rules(path), state_path)
+
+    def _slots(self, symbols):
+        # Vị trí cột trạng thái của từng mã; mở rộng ma trận khi gặp mã mới
+        new = [s for s in symbols if s not in self.symbols]
+        if new:
+            for s in new:
+                self.symbols[s] = len(self.symbols)
+            grow = len(new)
+            self.active = np.pad(self.active, ((0, 0), (0, grow)))
+            self.last_alert = np.pad(self.last_alert, ((0, 0), (0, grow)))
+            self.last_bar = np.pad(self.last_bar, (0, grow))
+        slots = np.fromiter((self.symbols[s] for s in symbols), dtype=np.intp, count=len(symbols))
+        # Cùng thứ tự mã như lần trước (thường gặp): dùng lát cắt để tránh sao chép ma trận trạng thái
+        if len(slots) and slots[-1] - slots[0] == len(slots) - 1 and (np.diff(slots) == 1).all():
+            return slice(slots[0], slots[-1] + 1)
+        return slots
+
+    def evaluate(self, frames):
+        # frames: mã -> DataFrame đã có chỉ báo. Trả về danh sách (mã, [quy tắc], thời gian phiên).
+        return self.evaluate_bars(*last_bars(frames, self.columns))
+
+    def evaluate_bars(self, symbols, current, previous, times):
+        # Dạng bảng: symbols (mảng mã), current/previous (cột -> mảng theo mã), times (int64 ns)
+        if not len(symbols) or not self.rules:
+            return []
+        slots = self._slots(symbols)
+        positions = {s: i for i, s in enumerate(symbols)}
+        hits = np.stack([rule.evaluate(current, previous, positions) for rule in self.rules])
+
+        was_active = self.active[:, slots]
+        # Phiên cũ đã đánh giá rồi (làm mới khi chưa có nến mới): giữ nguyên trạng thái
+        new_bar = times > self.last_bar[slots]
+        last = self.last_alert[:, slots]
+        cooled = (last == 0) | (times - last >= self.cooldown)
+        fired = hits & ~was_active & cooled & new_bar
+
+        self.active[:, slots] = np.where(new_bar, hits, was_active)
+        np.copyto(last, times, where=fired)
+        self.last_alert[:, slots] = last
+        self.last_bar[slots] = np.maximum(self.last_bar[slots], times)
+
+        alerts = []
+        for j in np.flatnonzero(fired.any(axis=0)):
+            rules = [self.rules[i] for i in np.flatnonzero(fired[:, j])]
+            alerts.append((symbols[j], rules, pd.Timestamp(times[j])))
+        return alerts
+
+    def notify(self, alerts, frames, delivery):
+        # Gửi ảnh biểu đồ kèm nội dung cảnh báo qua đường gửi ảnh Telegram
+        from charts import chart_png
+        for symbol, rules, bar_time in alerts:
+            df = frames[symbol]
+            lines = [f"🔔 *{symbol}* {bar_time:%d/%m/%Y} - giá {df['close'].iloc[-1]:,.2f}"]
+            lines += [f"• {rule.name}: {rule.message}" for rule in rules]
+            delivery.send_photo(chart_png(df, symbol), "\n".join(lines))
+
+    def run(self, frames, delivery=None):
+        alerts = self.evaluate(frames)
+        if alerts and delivery is not None:
+            self.notify(alerts, frames, delivery)
+        if self.state_path:
+            self.save_state()
+        return alerts
+
+    def load_state(self):
+        if not os.path.exists(self.state_path):
+            return
+        state = np.load(self.state_path, allow_pickle=False)
+        symbols = [str(s) for s in state['symbols']]
+        slots = self._slots(symbols)
+        self.last_bar[slots] = state['last_bar']
+        # Chỉ khôi phục trạng thái của các quy tắc còn trong cấu hình
+        saved = {str(name): i for i, name in enumerate(state['rules'])}
+        for i, rule in enumerate(self.rules):
+            if rule.name in saved:
+                self.active[i, slots] = state['active'][saved[rule.name]]
+                self.last_alert[i, slots] = state['last_alert'][saved[rule.name]]
+
+    def save_state(self):
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        tmp_path = self.state_path + '.tmp.npz'
+        np.savez(tmp_path, symbols=np.array(list(self.symbols), dtype=str),
+                 rules=np.array([rule.name for rule in self.rules], dtype=str),
+                 active=self.active, last_alert=self.last_alert, last_bar=self.last_bar)
+        os.replace(tmp_path, self.state_path)
+
+
+# --- CHẠY CHÍNH ---
+if __name__ == "__main__":
+    from batch_fetch import fetch_many
+    from indicators import add_technical_indicators
+    from telegram_sender import TelegramDelivery
+
+    if len(sys.argv) < 3:
+        print("Cách dùng: python alerts.py <file quy tắc .json|.toml> <mã> [mã ...]")
+        sys.exit(1)
+    engine = AlertEngine.from_file(sys.argv[1])
+    symbols = [s.upper() for s in sys.argv[2:]]
+
+    data, errors = fetch_many(symbols)
+    for symbol, error in errors.items():
+        print(f"Lỗi khi lấy dữ liệu {symbol}: {error}")
+    frames = {symbol: add_technical_indicators(df) for symbol, df in data.items()}
+
+    token = os.environ.get('PTCK_TELEGRAM_TOKEN')
+    chat_id = os.environ.get('PTCK_TELEGRAM_CHAT_ID')
+    delivery = TelegramDelivery(token, chat_id) if token and chat_id else None
+    alerts = engine.run(frames, delivery)
+    if delivery is not None:
+        delivery.close()
+    for symbol, rules, bar_time in alerts:
+        print(f"{symbol} {bar_time:%d/%m/%Y}: " + ", ".join(rule.name for rule in rules))
+    if not alerts:
+        print("Không có cảnh báo mới.")
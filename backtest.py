@@ -0,0 +1,280 @@
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from indicators import BB_DEV, BB_WINDOW, RSI_WINDOW, _wilder
+
+# Phí giao dịch tính trên giá trị lệnh: phí môi giới mua/bán và thuế TNCN 0,1% khi bán
+BUY_FEE = 0.0015
+SELL_FEE = 0.0015
+SELL_TAX = 0.001
+# Cổ phiếu mua ở phiên b chỉ bán được từ phiên b+SETTLEMENT_DAYS (T+2)
+SETTLEMENT_DAYS = 2
+# Tín hiệu xác định ở giá đóng cửa phiên t, lệnh khớp ở giá đóng cửa phiên t+DELAY
+DELAY = 1
+TRADING_DAYS = 252
+
+# Tham số của từng chiến lược (chỉ mua/bán, không bán khống)
+STRATEGIES = {
+    'ma_cross': ('fast', 'slow'),
+    'bollinger': ('window', 'dev'),
+    'rsi': ('window', 'low', 'high'),
+}
+
+DEFAULT_PARAMS = {
+    'ma_cross': {'fast': 5, 'slow': 50},
+    'bollinger': {'window': BB_WINDOW, 'dev': BB_DEV},
+    'rsi': {'window': RSI_WINDOW, 'low': 30, 'high': 70},
+}
+
+DEFAULT_GRIDS = {
+    'ma_cross': {'fast': range(3, 31), 'slow': range(20, 201, 5)},
+    'bollinger': {'window': range(10, 61, 2), 'dev': np.arange(1.0, 3.01, 0.125)},
+    'rsi': {'window': range(4, 31, 2), 'low': range(10, 46, 5), 'high': range(50, 91, 5)},
+}
+
+
+def _rolling_mean_std(close, windows, with_std=False):
+    # Trung bình (và độ lệch chuẩn tổng thể) trượt cho nhiều cửa sổ từ một lần cumsum
+    n = len(close)
+    ref = np.nanmean(close) if n else 0.0
+    x = close - ref
+    csum = np.concatenate([[0.0], np.cumsum(x)])
+    csum_sq = np.concatenate([[0.0], np.cumsum(x * x)]) if with_std else None
+    means, stds = {}, {}
+    for window in windows:
+        mean = np.full(n, np.nan)
+        std = np.full(n, np.nan)
+        if n >= window:
+            m = (csum[window:] - csum[:-window]) / window
+            mean[window - 1:] = m + ref
+            if with_std:
+                m_sq = (csum_sq[window:] - csum_sq[:-window]) / window
+                std[window - 1:] = np.sqrt(np.maximum(m_sq - m * m, 0.0))
+        means[window] = mean
+        stds[window] = std
+    return means, stds
+
+
+def _rsi(close, window):
+    diff = np.zeros_like(close)
+    diff[1:] = np.diff(close)
+    diff = np.nan_to_num(diff, nan=0.0)
+    avg_gain = _wilder(np.where(diff > 0, diff, 0.0)[None], window)[0]
+    avg_loss = _wilder(np.where(diff < 0, -diff, 0.0)[None], window)[0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = np.where(avg_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + avg_gain / avg_loss))
+    rsi[:window - 1] = np.nan
+    return rsi
+
+
+def _hold(enter, exit):
+    # Trạng thái nắm giữ theo tín hiệu mua/bán gần nhất (mua được ưu tiên nếu trùng phiên)
+    rows, n = enter.shape
+    last = np.where(enter | exit, np.arange(n), -1)
+    np.maximum.accumulate(last, axis=1, out=last)
+    return enter[np.arange(rows)[:, None], np.maximum(last, 0)] & (last >= 0)
+
+
+def _signals(close, strategy, params, columns=None):
+    # Ma trận (tổ hợp tham số x phiên): True nếu muốn nắm giữ sau phiên đó.
+    # columns: các cột chỉ báo có sẵn từ add_technical_indicators, dùng lại khi trùng tham số.
+    columns = columns or {}
+    if strategy == 'ma_cross':
+        windows = {p['fast'] for p in params} | {p['slow'] for p in params}
+        missing = [w for w in windows if f'MA{w}' not in columns]
+        means, _ = _rolling_mean_std(close, missing)
+        means.update({w: columns[f'MA{w}'] for w in windows if f'MA{w}' in columns})
+        fast = np.stack([means[p['fast']] for p in params])
+        slow = np.stack([means[p['slow']] for p in params])
+        with np.errstate(invalid='ignore'):
+            return fast > slow
+
+    if strategy == 'bollinger':
+        windows = {p['window'] for p in params}
+        means, stds = _rolling_mean_std(close, windows, with_std=True)
+        if BB_WINDOW in windows and 'BB_Middle' in columns and 'BB_Upper' in columns:
+            means[BB_WINDOW] = columns['BB_Middle']
+            stds[BB_WINDOW] = (columns['BB_Upper'] - columns['BB_Middle']) / BB_DEV
+        middle = np.stack([means[p['window']] for p in params])
+        std = np.stack([stds[p['window']] for p in params])
+        dev = np.array([p['dev'] for p in params], dtype=np.float64)[:, None]
+        # Mua khi giá đóng cửa thủng dải dưới, bán khi vượt lại đường giữa
+        with np.errstate(invalid='ignore'):
+            return _hold(close < middle - dev * std, close > middle)
+
+    if strategy == 'rsi':
+        windows = {p['window'] for p in params}
+        rsi = {w: columns['RSI'] if w == RSI_WINDOW and 'RSI' in columns else _rsi(close, w) for w in windows}
+        values = np.stack([rsi[p['window']] for p in params])
+        low = np.array([p['low'] for p in params], dtype=np.float64)[:, None]
+        high = np.array([p['high'] for p in params], dtype=np.float64)[:, None]
+        # Mua khi RSI dưới ngưỡng quá bán, bán khi RSI vượt ngưỡng quá mua
+        with np.errstate(invalid='ignore'):
+            return _hold(values < low, values > high)
+
+    raise ValueError(f"Chiến lược không hỗ trợ: {strategy}")
+
+
+def apply_settlement(position, days: int = SETTLEMENT_DAYS):
+    # Kéo dài các lần nắm giữ ngắn hơn days phiên vì cổ phiếu chưa về tài khoản.
+    # Chỉ những phiên không nắm giữ ngay sau một lần mua trong days-1 phiên trước mới cần xét lại.
+    if days <= 1:
+        return position
+    rows, n = position.shape
+    recent = np.zeros_like(position)
+    for lag in range(1, days):
+        recent[:, lag:] |= position[:, :-lag]
+    candidates = np.flatnonzero((recent & ~position).any(axis=0))
+    if not len(candidates):
+        return position
+    padded = np.concatenate([np.zeros((rows, days), dtype=bool), position], axis=1)
+    for t in candidates:
+        # padded[:, t:t+days] là trạng thái các phiên t-days .. t-1
+        window = padded[:, t:t + days]
+        padded[:, t + days] |= window[:, -1] & ~window.all(axis=1)
+    return padded[:, days:]
+
+
+def simulate(close, position, fees: bool = True):
+    # Lợi nhuận từng phiên sau phí khi dùng toàn bộ vốn cho mỗi lệnh.
+    # position[:, t]: có nắm giữ sau phiên t; lợi nhuận phiên t+1 thuộc về trạng thái phiên t.
+    change = np.zeros(len(close))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change[1:] = close[1:] / close[:-1] - 1
+    change = np.nan_to_num(change, nan=0.0, posinf=0.0, neginf=0.0)
+    held = position.astype(np.float64)
+    daily = np.zeros_like(held)
+    daily[:, 1:] = held[:, :-1] * change[1:]
+    if fees:
+        trade = np.diff(held, axis=1, prepend=0.0)
+        daily -= np.where(trade > 0, BUY_FEE, 0.0) + np.where(trade < 0, SELL_FEE + SELL_TAX, 0.0)
+    return daily
+
+
+def performance(daily, position):
+    # Chỉ số hiệu quả cho từng dòng tổ hợp tham số
+    n = daily.shape[1]
+    equity = np.cumprod(1.0 + daily, axis=1)
+    final = equity[:, -1]
+    years = max(n / TRADING_DAYS, 1e-9)
+    std = daily.std(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(std > 0, daily.mean(axis=1) / std * np.sqrt(TRADING_DAYS), 0.0)
+        cagr = np.where(final > 0, final ** (1.0 / years) - 1.0, -1.0)
+    drawdown = equity / np.maximum.accumulate(equity, axis=1) - 1.0
+    return {
+        'total_return': final - 1.0,
+        'cagr': cagr,
+        'sharpe': sharpe,
+        'max_drawdown': drawdown.min(axis=1),
+        'trades': (np.diff(position.astype(np.int8), axis=1, prepend=0) > 0).sum(axis=1),
+        'exposure': position.mean(axis=1),
+    }
+
+
+def run_strategy(close, strategy, params, columns=None, fees: bool = True,
+                 delay: int = DELAY, settlement: int = SETTLEMENT_DAYS):
+    # Mô phỏng đồng thời nhiều tổ hợp tham số trên cùng một chuỗi giá; trả về (lợi nhuận, trạng thái)
+    close = np.asarray(close, dtype=np.float64)
+    signal = _signals(close, strategy, params, columns)
+    position = np.zeros_like(signal)
+    if delay:
+        position[:, delay:] = signal[:, :-delay]
+    else:
+        position = signal
+    position = apply_settlement(position, settlement)
+    return simulate(close, position, fees), position
+
+
+def backtest(df, strategy: str = 'ma_cross', fees: bool = True, delay: int = DELAY,
+             settlement: int = SETTLEMENT_DAYS, **params):
+    # Kiểm định một chiến lược trên DataFrame đã có chỉ báo; trả về (bảng theo phiên, chỉ số tổng hợp)
+    params = {**DEFAULT_PARAMS[strategy], **params}
+    close = df['close'].to_numpy(dtype=np.float64)
+    columns = {name: df[name].to_numpy(dtype=np.float64) for name in df.columns
+               if name.startswith(('MA', 'BB_')) or name == 'RSI'}
+    daily, position = run_strategy(close, strategy, [params], columns, fees, delay, settlement)
+    stats = {name: values[0].item() for name, values in performance(daily, position).items()}
+    result = pd.DataFrame({
+        'position': position[0].astype(np.int8),
+        'return': daily[0],
+        'equity': np.cumprod(1.0 + daily[0]),
+    }, index=df.index)
+    return result, stats
+
+
+def param_grid(strategy: str, grid=None):
+    # Tất cả tổ hợp tham số, bỏ các tổ hợp vô nghĩa (MA nhanh >= MA chậm, ngưỡng mua >= ngưỡng bán)
+    grid = grid or DEFAULT_GRIDS[strategy]
+    names = STRATEGIES[strategy]
+    combos = [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+    if strategy == 'ma_cross':
+        combos = [p for p in combos if p['fast'] < p['slow']]
+    elif strategy == 'rsi':
+        combos = [p for p in combos if p['low'] < p['high']]
+    return combos
+
+
+_worker_close = None
+
+
+def _init_worker(close):
+    # Chuỗi giá chỉ gửi sang mỗi tiến trình con một lần
+    global _worker_close
+    _worker_close = close
+
+
+def _sweep_chunk(job):
+    strategy, params, options = job
+    daily, position = run_strategy(_worker_close, strategy, params, **options)
+    return performance(daily, position)
+
+
+def sweep(data, strategy: str = 'ma_cross', grid=None, max_workers=None, chunksize: int = 256,
+          fees: bool = True, delay: int = DELAY, settlement: int = SETTLEMENT_DAYS):
+    # Quét lưới tham số trên process pool; mỗi tác vụ mô phỏng một khối chunksize tổ hợp bằng ma trận.
+    # data: DataFrame có cột close hoặc mảng giá đóng cửa. Trả về bảng xếp theo Sharpe giảm dần.
+    if isinstance(data, pd.DataFrame):
+        close = data['close'].to_numpy(dtype=np.float64)
+    else:
+        close = np.asarray(data, dtype=np.float64)
+    combos = param_grid(strategy, grid)
+    if not combos:
+        return pd.DataFrame(columns=list(STRATEGIES[strategy]))
+    options = {'fees': fees, 'delay': delay, 'settlement': settlement}
+    jobs = [(strategy, combos[i:i + chunksize], options) for i in range(0, len(combos), chunksize)]
+    max_workers = min(max_workers or os.cpu_count() or 1, len(jobs))
+    if max_workers == 1:
+        results = [performance(*run_strategy(close, strategy, chunk, **opts)) for _, chunk, opts in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(close,)) as pool:
+            results = list(pool.map(_sweep_chunk, jobs))
+    table = pd.DataFrame(combos)
+    for name in results[0]:
+        table[name] = np.concatenate([r[name] for r in results])
+    return table.sort_values('sharpe', ascending=False, ignore_index=True)
+
+
+# --- CHẠY CHÍNH ---
+if __name__ == "__main__":
+    from data_store import get_stock_history
+    from indicators import add_technical_indicators
+
+    symbol = sys.argv[1].upper() if len(sys.argv) > 1 else 'HPG'
+    df = get_stock_history(symbol, days_back=5 * 365)
+    if df is None or df.empty:
+        print(f"Không có dữ liệu cho mã {symbol}")
+        sys.exit(1)
+    df = add_technical_indicators(df)
+
+    for strategy in STRATEGIES:
+        _, stats = backtest(df, strategy)
+        print(f"{symbol} - {strategy} {DEFAULT_PARAMS[strategy]}: "
+              f"lợi nhuận {stats['total_return']:.1%}, Sharpe {stats['sharpe']:.2f}, "
+              f"sụt giảm tối đa {stats['max_drawdown']:.1%}, {stats['trades']} lệnh mua")
+        print(sweep(df, strategy).head(5).to_string(index=False))
@@ -0,0 +1,68 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tenacity import Retrying, retry_if_not_exception_type, stop_after_attempt, wait_exponential
+
+from data_store import get_stock_history
+
+
+class RateLimiter:
+    # Token bucket dùng chung giữa các luồng: tối đa `rate` lượt gọi mỗi giây
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = float(rate)
+        self.capacity = max(1, int(burst))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def fetch_many(symbols, days_back: int = 180, interval: str = '1D', max_workers: int = 8,
+               rate_per_sec: float = 5, retries: int = 3, fetch=None):
+    # Lấy dữ liệu nhiều mã song song; trả về (dữ liệu theo mã, lỗi theo mã)
+    fetch = fetch or (lambda symbol: get_stock_history(symbol, days_back, interval=interval))
+    limiter = RateLimiter(rate_per_sec, burst=max_workers)
+
+    def fetch_one(symbol):
+        for attempt in Retrying(stop=stop_after_attempt(retries),
+                                wait=wait_exponential(multiplier=0.5, max=8),
+                                # Mã không có dữ liệu (không tồn tại, đã hủy niêm yết): thử lại cũng vô ích
+                                retry=retry_if_not_exception_type(LookupError),
+                                reraise=True):
+            with attempt:
+                limiter.acquire()
+                return fetch(symbol)
+
+    data, errors = {}, {}
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        return data, errors
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(symbols))) as pool:
+        # Mỗi luồng chạy trong bản sao ngữ cảnh của nơi gọi để capture() của nơi gọi thấy sự kiện của nó
+        futures = {symbol: pool.submit(contextvars.copy_context().run, fetch_one, symbol) for symbol in symbols}
+        for symbol, future in futures.items():
+            try:
+                df = future.result()
+            except Exception as e:
+                errors[symbol] = e
+                continue
+            if df is None or df.empty:
+                errors[symbol] = LookupError(f"Không có dữ liệu cho mã {symbol}.")
+            else:
+                data[symbol] = df
+    return data, errors
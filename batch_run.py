@@ -0,0 +1,291 @@
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date
+
+from tenacity import Retrying, retry_if_not_exception_type, stop_after_attempt, wait_exponential
+
+from batch_fetch import RateLimiter
+from data_store import STORE_DIR, get_stock_history
+from indicators import add_technical_indicators
+from metrics import get_metrics
+from parallel_render import init_worker, frame_to_payload, payload_to_frame
+from pyramid import PricePyramid
+
+# Các bước xử lý mỗi mã, chạy theo đúng thứ tự này
+STAGES = ('fetch', 'indicators', 'chart', 'report')
+CHECKPOINT_DIR = os.path.join(STORE_DIR, 'batch')
+# In tiến độ tối đa một dòng mỗi PROGRESS_INTERVAL giây
+PROGRESS_INTERVAL = 1.0
+
+
+def read_watchlist(path: str):
+    # Mỗi dòng một hoặc nhiều mã (cách nhau bởi dấu phẩy/khoảng trắng); bỏ qua dòng bắt đầu bằng #
+    symbols = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0]
+            symbols.extend(s.upper() for s in line.replace(',', ' ').split())
+    return list(dict.fromkeys(symbols))
+
+
+class Checkpoint:
+    # Ghi nối tiếp kết quả từng mã vào file JSON Lines; chạy lại sẽ bỏ qua các mã đã xong
+    # đủ các bước được yêu cầu
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.completed = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Dòng cuối bị cắt dở khi tiến trình bị dừng giữa chừng
+                        continue
+                    if record.get('status') == 'ok':
+                        self.completed.setdefault(record['symbol'], set()).update(record.get('stages', ()))
+
+    def is_done(self, symbol: str, stages=STAGES):
+        return set(stages) <= self.completed.get(symbol, set())
+
+    def record(self, symbol: str, status: str, **fields):
+        line = json.dumps({'symbol': symbol, 'status': status, 'time': time.time(), **fields},
+                          ensure_ascii=False)
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+            if status == 'ok':
+                self.completed.setdefault(symbol, set()).update(fields.get('stages', ()))
+
+
+def _render_chart(job):
+    # Chạy trong tiến trình con: vẽ biểu đồ bằng template dựng sẵn của tiến trình và ghi ra file
+    from chart_renderer import template_png
+    symbol, payload, out_dir = job
+    path = os.path.join(out_dir, f"{symbol}_chart.png")
+    with open(path, 'wb') as f:
+        f.write(template_png(payload_to_frame(payload), symbol))
+    return path
+
+
+def _format_eta(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+class BatchPipeline:
+    # Mỗi bước có pool riêng: lấy dữ liệu và báo cáo là I/O (luồng), vẽ biểu đồ tốn CPU (tiến trình).
+    # Một mã xong bước này thì chuyển ngay sang bước sau, không chờ cả lô.
+
+    def __init__(self, stages=STAGES, out_dir: str = 'output', days_back: int = 180,
+                 checkpoint: Checkpoint = None, fetch_workers: int = 8, indicator_workers: int = 2,
+                 chart_workers: int = None, report_workers: int = 4, rate_per_sec: float = 5,
+                 retries: int = 3, period: str = 'year', fmt: str = 'text'):
+        stages = set(stages)
+        if stages & {'indicators', 'chart'}:
+            # Tính chỉ báo và vẽ biểu đồ đều cần dữ liệu giá
+            stages.add('fetch')
+        self.stages = [stage for stage in STAGES if stage in stages]
+        self.out_dir = out_dir
+        self.days_back = days_back
+        self.checkpoint = checkpoint
+        self.workers = {
+            'fetch': fetch_workers,
+            'indicators': indicator_workers,
+            'chart': chart_workers or os.cpu_count() or 1,
+            'report': report_workers,
+        }
+        self.limiter = RateLimiter(rate_per_sec, burst=fetch_workers)
+        self.retries = retries
+        self.period = period
+        self.fmt = fmt
+        # Mỗi mã chỉ cập nhật một lần trong lô: không giữ các mức trong bộ nhớ
+        self.pyramid = PricePyramid(cache_size=0)
+
+    def _fetch(self, symbol):
+        for attempt in Retrying(stop=stop_after_attempt(self.retries),
+                                wait=wait_exponential(multiplier=0.5, max=8),
+                                # Mã không có dữ liệu (không tồn tại, đã hủy niêm yết): thử lại cũng vô ích
+                                retry=retry_if_not_exception_type(LookupError),
+                                reraise=True):
+            with attempt:
+                self.limiter.acquire()
+                df = get_stock_history(symbol, self.days_back)
+        if df is None or df.empty:
+            raise LookupError(f"Không có dữ liệu cho mã {symbol}.")
+        # Cập nhật tháp giá tuần/tháng để dashboard vẽ khoảng dài không phải gom lại
+        try:
+            self.pyramid.update(symbol)
+        except Exception as e:
+            # Tháp giá chỉ để dashboard vẽ nhanh hơn: lỗi ở đây không làm hỏng mã
+            print(f"Lỗi cập nhật tháp giá {symbol}: {e}")
+        return df
+
+    def _report(self, symbol):
+        from reports import write_financial_report
+        _, path = write_financial_report(symbol, period=self.period, fmt=self.fmt, out_dir=self.out_dir)
+        return path
+
+    def _submit(self, pools, stage, symbol, df):
+        if stage == 'fetch':
+            return pools[stage].submit(self._fetch, symbol)
+        if stage == 'indicators':
+            return pools[stage].submit(add_technical_indicators, df)
+        if stage == 'chart':
+            if 'MA5' not in df:
+                df = add_technical_indicators(df)
+            return pools[stage].submit(_render_chart, (symbol, frame_to_payload(df), self.out_dir))
+        return pools[stage].submit(self._report, symbol)
+
+    def run(self, symbols, progress=print):
+        # Trả về (số mã xong, lỗi theo mã: (bước, lỗi))
+        os.makedirs(self.out_dir, exist_ok=True)
+        pending = [s for s in symbols if not (self.checkpoint and self.checkpoint.is_done(s, self.stages))]
+        skipped = len(symbols) - len(pending)
+        if skipped:
+            progress(f"Bỏ qua {skipped} mã đã xong ở lần chạy trước.")
+        if not pending or not self.stages:
+            return 0, {}
+
+        events = queue.Queue()
+        pools = {}
+        for stage in self.stages:
+            workers = min(self.workers[stage], len(pending))
+            if stage == 'chart':
+                pools[stage] = ProcessPoolExecutor(max_workers=workers, initializer=init_worker)
+            else:
+                pools[stage] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'batch-{stage}')
+
+        def advance(symbol, index, df, outputs):
+            if index == len(self.stages):
+                events.put((symbol, None, None, outputs))
+                return
+            stage = self.stages[index]
+            try:
+                future = self._submit(pools, stage, symbol, df)
+            except Exception as e:
+                events.put((symbol, stage, e, outputs))
+                return
+            future.add_done_callback(lambda f: finished(symbol, index, df, outputs, f))
+
+        def finished(symbol, index, df, outputs, future):
+            stage = self.stages[index]
+            try:
+                result = future.result()
+            except Exception as e:
+                events.put((symbol, stage, e, outputs))
+                return
+            if stage in ('fetch', 'indicators'):
+                df = result
+            else:
+                outputs = outputs + [result]
+            advance(symbol, index + 1, df, outputs)
+
+        start = time.perf_counter()
+        for symbol in pending:
+            advance(symbol, 0, None, [])
+
+        done, errors, last_print = 0, {}, 0.0
+        try:
+            while done + len(errors) < len(pending):
+                symbol, stage, error, outputs = events.get()
+                if error is None:
+                    done += 1
+                    if self.checkpoint:
+                        self.checkpoint.record(symbol, 'ok', stages=self.stages, outputs=outputs)
+                else:
+                    errors[symbol] = (stage, error)
+                    progress(f"Lỗi {symbol} ở bước {stage}: {error}")
+                    if self.checkpoint:
+                        self.checkpoint.record(symbol, 'error', stage=stage, error=str(error))
+
+                finished_count = done + len(errors)
+                now = time.perf_counter()
+                if now - last_print >= PROGRESS_INTERVAL or finished_count == len(pending):
+                    last_print = now
+                    elapsed = now - start
+                    rate = finished_count / elapsed if elapsed else 0.0
+                    eta = (len(pending) - finished_count) / rate if rate else 0.0
+                    progress(f"[{finished_count}/{len(pending)}] {rate:.2f} mã/giây, "
+                             f"còn khoảng {_format_eta(eta)}, lỗi {len(errors)}")
+        finally:
+            for pool in pools.values():
+                pool.shutdown(wait=True, cancel_futures=True)
+        return done, errors
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Chạy lô cuối ngày: lấy dữ liệu → chỉ báo → biểu đồ → báo cáo")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--watchlist', help="file danh sách mã")
+    source.add_argument('--exchange', nargs='+', help="toàn bộ mã trên sàn: HOSE, HNX, UPCOM")
+    source.add_argument('--symbols', nargs='+', help="danh sách mã")
+    parser.add_argument('--stages', default=','.join(STAGES), help="các bước cần chạy, cách nhau bởi dấu phẩy")
+    parser.add_argument('--days', type=int, default=180)
+    parser.add_argument('--out', default='output', help="thư mục ghi biểu đồ và báo cáo")
+    parser.add_argument('--job', help="tên lô dùng cho file checkpoint (mặc định theo nguồn mã và ngày)")
+    parser.add_argument('--fresh', action='store_true', help="bỏ checkpoint cũ, chạy lại toàn bộ")
+    parser.add_argument('--fetch-workers', type=int, default=8)
+    parser.add_argument('--indicator-workers', type=int, default=2)
+    parser.add_argument('--chart-workers', type=int, default=None)
+    parser.add_argument('--report-workers', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=5, help="số lượt gọi API tối đa mỗi giây")
+    parser.add_argument('--period', default='year', choices=['year', 'quarter'])
+    parser.add_argument('--format', default='text', choices=['text', 'wide', 'markdown', 'csv'])
+    args = parser.parse_args(argv)
+
+    stages = [s.strip() for s in args.stages.split(',') if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        parser.error(f"Bước không hợp lệ: {', '.join(unknown)}")
+    args.stages = stages
+    return args
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    if args.watchlist:
+        symbols = read_watchlist(args.watchlist)
+        source = os.path.splitext(os.path.basename(args.watchlist))[0]
+    elif args.exchange:
+        from scanner import list_universe
+        symbols = list_universe(args.exchange)
+        source = '-'.join(ex.upper() for ex in args.exchange)
+    else:
+        symbols = list(dict.fromkeys(s.upper() for s in args.symbols))
+        source = 'symbols'
+
+    job = args.job or f"{source}-{date.today():%Y%m%d}"
+    path = os.path.join(CHECKPOINT_DIR, f"{job}.jsonl")
+    if args.fresh and os.path.exists(path):
+        os.remove(path)
+
+    pipeline = BatchPipeline(
+        args.stages, out_dir=args.out, days_back=args.days, checkpoint=Checkpoint(path),
+        fetch_workers=args.fetch_workers, indicator_workers=args.indicator_workers,
+        chart_workers=args.chart_workers, report_workers=args.report_workers,
+        rate_per_sec=args.rate, period=args.period, fmt=args.format,
+    )
+    print(f"Lô {job}: {len(symbols)} mã, các bước {' → '.join(pipeline.stages)}")
+    start = time.perf_counter()
+    done, errors = pipeline.run(symbols, progress=lambda msg: print(msg, flush=True))
+    elapsed = time.perf_counter() - start
+    print(f"Xong {done} mã, lỗi {len(errors)} mã trong {elapsed:.1f}s. Checkpoint: {path}")
+    # Số liệu các bước trong tiến trình chính (lấy dữ liệu, chỉ báo, báo cáo) cho Prometheus
+    get_metrics().write_prometheus()
+    # Mã thoát khác 0 để cron báo lỗi; chạy lại sẽ chỉ xử lý các mã lỗi/chưa xong
+    return 1 if errors else 0
+
+
+# --- CHẠY CHÍNH ---
+if __name__ == "__main__":
+    sys.exit(main())
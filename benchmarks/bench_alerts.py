@@ -0,0 +1,77 @@
+# Độ trễ mỗi lần làm mới của AlertEngine: vài nghìn quy tắc trên toàn bộ ~1.600 mã,
+# mỗi lần chỉ đánh giá phiên mới nhất. Chạy từ thư mục gốc:
+# python -m benchmarks.bench_alerts [số mã] [số quy tắc] [số lần làm mới]
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from alerts import AlertEngine
+from indicators import add_technical_indicators
+
+
+def make_frames(count, bars=120, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end='2024-12-31', periods=bars, name='time')
+    frames = {}
+    for i in range(count):
+        close = 20 * np.exp(np.cumsum(rng.normal(0, 0.02, bars)))
+        df = pd.DataFrame({'open': close, 'high': close * 1.01, 'low': close * 0.99,
+                           'close': close, 'volume': rng.integers(1_000, 1_000_000, bars)}, index=index)
+        frames[f"S{i:04d}"] = add_technical_indicators(df)
+    return frames
+
+
+def make_rules(count, symbols, seed=0):
+    rng = np.random.default_rng(seed)
+    templates = [
+        lambda: f"RSI > {rng.integers(60, 90)}",
+        lambda: f"RSI < {rng.integers(10, 40)}",
+        lambda: "close crosses_above BB_Upper",
+        lambda: "close crosses_below BB_Lower",
+        lambda: "MA5 crosses MA50",
+        lambda: f"close > {rng.uniform(10, 40):.2f}",
+    ]
+    rules = []
+    for i in range(count):
+        rule = {'name': f"rule{i}", 'when': templates[i % len(templates)](), 'cooldown_days': 3}
+        if i % 3 == 0:
+            rule['symbols'] = list(rng.choice(symbols, 5, replace=False))
+        rules.append(rule)
+    return rules
+
+
+def next_bar(frames, rng):
+    # Thêm một phiên cho mọi mã (giữ độ dài cố định) rồi tính lại chỉ báo
+    out = {}
+    for symbol, df in frames.items():
+        close = df['close'].iloc[-1] * np.exp(rng.normal(0, 0.02))
+        row = pd.DataFrame({'open': close, 'high': close * 1.01, 'low': close * 0.99, 'close': close,
+                            'volume': 1_000}, index=[df.index[-1] + pd.offsets.BDay()])
+        out[symbol] = add_technical_indicators(pd.concat([df.iloc[1:, :5], row]))
+    return out
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1600
+    rule_count = int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+    refreshes = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    frames = make_frames(count)
+    engine = AlertEngine(make_rules(rule_count, list(frames)), state_path=None)
+    rng = np.random.default_rng(1)
+
+    timings, fired = [], 0
+    for _ in range(refreshes):
+        start = time.perf_counter()
+        alerts = engine.evaluate(frames)
+        timings.append(time.perf_counter() - start)
+        fired += sum(len(rules) for _, rules, _ in alerts)
+        # Làm mới lần nữa trên cùng phiên: không được báo lặp
+        assert not engine.evaluate(frames)
+        frames = next_bar(frames, rng)
+
+    print(f"{count} mã x {rule_count} quy tắc, {refreshes} lần làm mới:")
+    print(f"  độ trễ mỗi lần: trung vị {np.median(timings) * 1000:.1f} ms, lớn nhất {max(timings) * 1000:.1f} ms")
+    print(f"  {fired} cảnh báo đã kích hoạt")
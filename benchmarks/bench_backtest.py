@@ -0,0 +1,70 @@
+# Tốc độ quét lưới tham số của backtest trên dữ liệu ngày nhiều năm (giả lập), kèm kiểm tra
+# kết quả ma trận khớp với mô phỏng từng phiên bằng vòng lặp.
+# Chạy từ thư mục gốc: python -m benchmarks.bench_backtest [số năm] [số tiến trình]
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from backtest import (BUY_FEE, DEFAULT_PARAMS, SELL_FEE, SELL_TAX, SETTLEMENT_DAYS, STRATEGIES,
+                      backtest, param_grid, sweep)
+from indicators import add_technical_indicators
+
+
+def make_frame(years, seed=0):
+    rng = np.random.default_rng(seed)
+    bars = years * 250
+    close = 20 * np.exp(np.cumsum(rng.normal(0.0002, 0.02, bars)))
+    index = pd.bdate_range(end='2024-12-31', periods=bars, name='time')
+    df = pd.DataFrame({'open': close, 'high': close * 1.01, 'low': close * 0.99,
+                       'close': close, 'volume': rng.integers(1_000, 1_000_000, bars)}, index=index)
+    return add_technical_indicators(df)
+
+
+def reference_equity(close, signal):
+    # Mô phỏng tuần tự: khớp lệnh phiên sau tín hiệu, không bán trước T+2, tính phí từng lệnh
+    held, bought_at, equity, out = False, None, 1.0, []
+    want = np.concatenate([[False], signal[:-1]])
+    for t in range(len(close)):
+        if t and held:
+            equity *= close[t] / close[t - 1]
+        if want[t] and not held:
+            held, bought_at = True, t
+            equity *= 1 - BUY_FEE
+        elif not want[t] and held and t - bought_at >= SETTLEMENT_DAYS:
+            held = False
+            equity *= 1 - SELL_FEE - SELL_TAX
+        out.append(equity)
+    return np.array(out)
+
+
+def check(df):
+    from backtest import _signals
+    close = df['close'].to_numpy()
+    for strategy in STRATEGIES:
+        result, _ = backtest(df, strategy)
+        signal = _signals(close, strategy, [DEFAULT_PARAMS[strategy]])[0]
+        expected = reference_equity(close, signal)
+        # Phí trừ theo tỷ lệ cộng dồn trong ngày nên chỉ sai khác rất nhỏ so với nhân trực tiếp
+        assert np.allclose(result['equity'].to_numpy(), expected, rtol=1e-3), strategy
+
+
+if __name__ == "__main__":
+    years = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    df = make_frame(years)
+    check(df)
+
+    print(f"{len(df)} phiên ({years} năm), {workers} tiến trình:")
+    for strategy in STRATEGIES:
+        combos = len(param_grid(strategy))
+        start = time.perf_counter()
+        table = sweep(df, strategy, max_workers=workers)
+        elapsed = time.perf_counter() - start
+        best = table.iloc[0]
+        params = ", ".join(f"{name}={best[name]:g}" for name in STRATEGIES[strategy])
+        print(f"  {strategy:10s} {combos:5d} tổ hợp trong {elapsed:6.3f}s = "
+              f"{combos / elapsed / workers:8.0f} tổ hợp/giây/nhân; tốt nhất: {params}, "
+              f"Sharpe {best['sharpe']:.2f}")
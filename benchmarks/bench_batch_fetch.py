@@ -0,0 +1,53 @@
+# So sánh thời gian lấy dữ liệu tuần tự và song song với một nguồn giả lập cục bộ.
+# Chạy từ thư mục gốc: python -m benchmarks.bench_batch_fetch
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+from batch_fetch import fetch_many
+
+
+class FakeProvider:
+    # Giả lập quote.history: độ trễ mạng cố định và thỉnh thoảng lỗi tạm thời
+    def __init__(self, latency: float = 0.05, error_rate: float = 0.05, bars: int = 120):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.index = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=bars, name='time')
+
+    def __call__(self, symbol):
+        time.sleep(self.latency)
+        if random.random() < self.error_rate:
+            raise ConnectionError(f"{symbol}: lỗi mạng giả lập")
+        close = 20 + np.cumsum(np.random.normal(0, 0.3, len(self.index)))
+        return pd.DataFrame({'open': close, 'high': close + 0.5, 'low': close - 0.5,
+                             'close': close, 'volume': 100_000}, index=self.index)
+
+
+def run_serial(provider, symbols):
+    data = {}
+    for symbol in symbols:
+        try:
+            data[symbol] = provider(symbol)
+        except Exception:
+            pass
+    return data
+
+
+if __name__ == "__main__":
+    random.seed(0)
+    provider = FakeProvider()
+    print(f"{'số mã':>6} {'tuần tự (s)':>12} {'song song (s)':>14} {'tăng tốc':>9} {'lỗi':>4}")
+    for n in (5, 10, 30, 60, 120):
+        symbols = [f"S{i:03d}" for i in range(n)]
+
+        start = time.perf_counter()
+        run_serial(provider, symbols)
+        serial = time.perf_counter() - start
+
+        start = time.perf_counter()
+        data, errors = fetch_many(symbols, fetch=provider, max_workers=16, rate_per_sec=100)
+        parallel = time.perf_counter() - start
+
+        print(f"{n:>6} {serial:>12.3f} {parallel:>14.3f} {serial / parallel:>8.1f}x {len(errors):>4}")
@@ -0,0 +1,50 @@
+# Đo bộ nhớ khi mở lần lượt N tab biểu đồ: giữ mọi figure (như create_gui cũ)
+# so với LRUPool chỉ giữ MAX_LIVE_CANVASES figure, các tab còn lại chỉ giữ dữ liệu dạng mảng.
+# Dùng backend Agg thay cho Tk để chạy được không cần màn hình.
+# Chạy từ thư mục gốc: python -m benchmarks.bench_canvas_memory [số tab ...]
+# Lưu ý: chế độ giữ mọi figure với 500 tab cần vài GB RAM.
+import subprocess
+import sys
+
+import psutil
+
+
+def child(mode, count):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    from benchmarks.bench_chart_render import make_frames
+    from charts import plot_chart
+    from figure_pool import LRUPool
+    from parallel_render import frame_to_payload, payload_to_frame
+
+    process = psutil.Process()
+    payloads = [frame_to_payload(df) for df in make_frames(count)]
+    baseline = process.memory_info().rss
+
+    live = [] if mode == 'all' else LRUPool(on_evict=lambda key, fig: plt.close(fig))
+    for i, payload in enumerate(payloads):
+        fig = plot_chart(payload_to_frame(payload), f"S{i:03d}")
+        fig.canvas.draw()
+        if mode == 'all':
+            live.append(fig)
+        else:
+            live.put(i, fig)
+    print((process.memory_info().rss - baseline) / 2**20)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ['--child']:
+        child(sys.argv[2], int(sys.argv[3]))
+        sys.exit()
+
+    sizes = [int(n) for n in sys.argv[1:]] or [10, 100, 500]
+    print(f"{'số tab':>7} {'giữ tất cả (MB)':>16} {'LRU pool (MB)':>14}")
+    for count in sizes:
+        row = []
+        for mode in ('all', 'pool'):
+            out = subprocess.run([sys.executable, '-m', 'benchmarks.bench_canvas_memory', '--child', mode, str(count)],
+                                 capture_output=True, text=True, check=True)
+            row.append(float(out.stdout.strip().splitlines()[-1]))
+        print(f"{count:>7} {row[0]:>16.1f} {row[1]:>14.1f}")
@@ -0,0 +1,86 @@
+# So sánh thời gian vẽ mỗi mã: mpf.plot(..., returnfig=True) dựng figure mới mỗi lần
+# và ChartTemplate dựng một lần rồi chỉ thay dữ liệu.
+# Chạy từ thư mục gốc: python -m benchmarks.bench_chart_render
+import time
+from io import BytesIO
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from chart_renderer import ChartTemplate
+from charts import SAVEFIG_SETTINGS, plot_chart
+from indicators import add_technical_indicators
+
+
+def make_frames(count, bars=180, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end='2025-06-30', periods=bars, name='time')
+    frames = []
+    for _ in range(count):
+        close = 20 + np.abs(np.cumsum(rng.normal(0, 0.3, bars)))
+        open_ = close + rng.normal(0, 0.2, bars)
+        df = pd.DataFrame({
+            'open': open_,
+            'high': np.maximum(open_, close) + rng.uniform(0, 0.4, bars),
+            'low': np.minimum(open_, close) - rng.uniform(0, 0.4, bars),
+            'close': close,
+            'volume': rng.integers(100_000, 2_000_000, bars),
+        }, index=index)
+        frames.append(add_technical_indicators(df))
+    return frames
+
+
+def mpf_path(frames, encode):
+    for i, df in enumerate(frames):
+        fig = plot_chart(df, f"S{i:03d}")
+        if encode:
+            fig.savefig(BytesIO(), **SAVEFIG_SETTINGS)
+        else:
+            fig.canvas.draw()
+        plt.close(fig)
+
+
+def template_path(frames, encode):
+    template = ChartTemplate()
+    for i, df in enumerate(frames):
+        if encode:
+            template.render_png(df, f"S{i:03d}")
+        else:
+            template.update(df, f"S{i:03d}")
+            template.fig.canvas.draw()
+
+
+def compare_png(a, b):
+    # (chênh lệch kích thước ảnh theo chiều cao, chênh lệch điểm ảnh trung bình trên phần chung)
+    from matplotlib.image import imread
+    a, b = imread(BytesIO(a))[..., :3], imread(BytesIO(b))[..., :3]
+    h, w = min(a.shape[0], b.shape[0]), min(a.shape[1], b.shape[1])
+    return abs(a.shape[0] - b.shape[0]) / max(a.shape[0], b.shape[0]), float(np.abs(a[:h, :w] - b[:h, :w]).mean())
+
+
+if __name__ == "__main__":
+    frames = make_frames(50)
+
+    # Ảnh của template (dùng cho batch_run/parallel_render) phải giống ảnh mpf.plot
+    template = ChartTemplate()
+    for i, df in enumerate(frames[:5]):
+        fig = plot_chart(df, f"S{i:03d}")
+        buf = BytesIO()
+        fig.savefig(buf, **SAVEFIG_SETTINGS)
+        plt.close(fig)
+        size_diff, pixel_diff = compare_png(buf.getvalue(), template.render_png(df, f"S{i:03d}"))
+        assert size_diff < 0.03 and pixel_diff < 0.08, (i, size_diff, pixel_diff)
+    print(f"ảnh template so với mpf.plot: lệch chiều cao {size_diff:.1%}, lệch điểm ảnh trung bình {pixel_diff:.3f}")
+
+    print(f"{'chế độ':<14} {'mpf.plot (ms/mã)':>17} {'template (ms/mã)':>17} {'tăng tốc':>9}")
+    for label, encode in (('draw', False), ('draw + PNG', True)):
+        start = time.perf_counter()
+        mpf_path(frames, encode)
+        t_mpf = (time.perf_counter() - start) / len(frames)
+        start = time.perf_counter()
+        template_path(frames, encode)
+        t_tpl = (time.perf_counter() - start) / len(frames)
+        print(f"{label:<14} {t_mpf * 1e3:>17.1f} {t_tpl * 1e3:>17.1f} {t_mpf / t_tpl:>8.1f}x")
@@ -0,0 +1,101 @@
+# Mô phỏng nhiều phiên dashboard mở cùng lúc sau giờ đóng cửa: so sánh số lần gọi nguồn dữ liệu
+# khi mỗi phiên tự gọi và khi dùng chung DataService (gộp yêu cầu trùng).
+# Chạy từ thư mục gốc: python -m benchmarks.bench_data_service [số phiên] [độ trễ nguồn (giây)]
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from batch_fetch import fetch_many
+from data_service import DataService
+
+POPULAR = ['BID', 'HPG', 'SSI', 'VCB', 'FPT']
+OTHERS = ['CII', 'PDR', 'MWG', 'VNM', 'TCB', 'ACB', 'VIC', 'GAS']
+
+
+class FakeProvider:
+    # Nguồn giả: mỗi lần gọi mất `latency` giây, đếm số lần gọi theo khóa
+    def __init__(self, latency):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def _record(self, key):
+        with self.lock:
+            self.calls[key] = self.calls.get(key, 0) + 1
+        time.sleep(self.latency)
+
+    def history(self, symbol, days_back, interval):
+        self._record(('quote', symbol, days_back))
+        index = pd.bdate_range(end='2024-12-31', periods=days_back * 5 // 7, name='time')
+        return pd.DataFrame({'close': 1.0, 'volume': 1}, index=index)
+
+    def profile(self, symbol):
+        self._record(('profile', symbol))
+        return pd.DataFrame({'symbol': [symbol]}), pd.DataFrame(), pd.DataFrame()
+
+
+def session_requests(seed):
+    rng = random.Random(seed)
+    symbols = rng.sample(POPULAR, 3) + rng.sample(OTHERS, 1)
+    return [(symbol, rng.choice([180, 180, 365])) for symbol in symbols]
+
+
+def run(sessions, get_quote, get_profile):
+    barrier = threading.Barrier(sessions)
+    latencies = []
+
+    def session(seed):
+        barrier.wait()
+        start = time.perf_counter()
+        for symbol, days_back in session_requests(seed):
+            get_quote(symbol, days_back)
+            get_profile(symbol)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        list(pool.map(session, range(sessions)))
+    return time.perf_counter() - start, sorted(latencies)
+
+
+if __name__ == "__main__":
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+
+    direct = FakeProvider(latency)
+    t_direct, lat_direct = run(sessions, lambda s, d: direct.history(s, d, '1D'), direct.profile)
+
+    shared = FakeProvider(latency)
+    # Không giới hạn tốc độ gọi nguồn để so sánh ngang với cách mỗi phiên tự gọi
+    service = DataService(history=shared.history, profile=shared.profile, rate_per_sec=0)
+    t_shared, lat_shared = run(sessions, service.quote_history, service.company_profile)
+
+    keys = {key for seed in range(sessions) for s, d in session_requests(seed) for key in (('quote', s, d), ('profile', s))}
+    # Mỗi khóa chỉ được gọi nguồn đúng một lần dù nhiều phiên hỏi cùng lúc
+    assert set(shared.calls) == keys and all(n == 1 for n in shared.calls.values()), shared.calls
+
+    print(f"{sessions} phiên đồng thời, nguồn trễ {latency * 1000:.0f} ms mỗi lần gọi:")
+    print(f"  mỗi phiên tự gọi:  {sum(direct.calls.values()):5d} lần gọi nguồn, "
+          f"p50 {lat_direct[len(lat_direct) // 2]:.2f}s, tổng {t_direct:.2f}s")
+    print(f"  DataService chung: {sum(shared.calls.values()):5d} lần gọi nguồn, "
+          f"p50 {lat_shared[len(lat_shared) // 2]:.2f}s, tổng {t_shared:.2f}s")
+    print(f"  {service.snapshot()}")
+
+    # Lần chạy lại của dashboard: 30 mã đã có trong cache không bị giới hạn tốc độ gọi nguồn
+    instant = FakeProvider(0)
+    service = DataService(history=instant.history, profile=instant.profile)
+    watchlist = [f"S{i:02d}" for i in range(30)]
+    load = lambda s: service.quote_history(s, 180)
+    start = time.perf_counter()
+    fetch_many(watchlist, fetch=load, rate_per_sec=0)
+    t_first = time.perf_counter() - start
+    start = time.perf_counter()
+    data, errors = fetch_many(watchlist, fetch=load, rate_per_sec=0)
+    t_rerun = time.perf_counter() - start
+    assert len(data) == len(watchlist) and sum(instant.calls.values()) == len(watchlist)
+    print(f"  {len(watchlist)} mã qua fetch_many: lần đầu {t_first:.2f}s (giới hạn tốc độ nguồn), "
+          f"chạy lại {t_rerun * 1000:.1f} ms")
@@ -0,0 +1,62 @@
+# So sánh compute_indicators (NumPy) với cách tính cũ dùng thư viện ta.
+# Chạy từ thư mục gốc: python -m benchmarks.bench_indicators
+import time
+
+import numpy as np
+import pandas as pd
+import ta
+
+from indicators import compute_indicators, INDICATOR_COLUMNS
+
+TOLERANCE = 1e-6
+
+
+def ta_indicators(df):
+    # Bản sao add_technical_indicators trước đây
+    df['MA5'] = ta.trend.sma_indicator(df['close'], window=5)
+    df['MA10'] = ta.trend.sma_indicator(df['close'], window=10)
+    df['MA50'] = ta.trend.sma_indicator(df['close'], window=50)
+    bb = ta.volatility.BollingerBands(close=df['close'], window=20, window_dev=2)
+    df['BB_Middle'] = bb.bollinger_mavg()
+    df['BB_Upper'] = bb.bollinger_hband()
+    df['BB_Lower'] = bb.bollinger_lband()
+    df['RSI'] = ta.momentum.RSIIndicator(df['close'], window=14).rsi()
+    return df
+
+
+def best_of(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def check(expected, actual):
+    for name in INDICATOR_COLUMNS:
+        exp = expected[name].to_numpy()
+        both = ~np.isnan(exp)
+        assert (np.isnan(actual[name]) == ~both).all(), f"{name}: NaN khác nhau"
+        err = np.max(np.abs(actual[name][both] - exp[both]) / np.maximum(1.0, np.abs(exp[both])), initial=0.0)
+        assert err < TOLERANCE, f"{name}: sai số {err:.2e}"
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    print(f"{'số nến':>9} {'ta (ms)':>10} {'numpy (ms)':>11} {'tăng tốc':>9}")
+    for n in (1_000, 10_000, 1_000_000):
+        close = 50 + np.abs(np.cumsum(rng.normal(0, 0.5, n)))
+        repeat = 3 if n >= 1_000_000 else 20
+        t_ta, expected = best_of(lambda: ta_indicators(pd.DataFrame({'close': close})), repeat)
+        t_np, actual = best_of(lambda: compute_indicators(close), repeat)
+        check(expected, actual)
+        print(f"{n:>9,} {t_ta * 1e3:>10.2f} {t_np * 1e3:>11.2f} {t_ta / t_np:>8.1f}x")
+
+    # Cả danh sách theo dõi trong một lần gọi (symbols x bars)
+    symbols, bars = 500, 1_000
+    panel = 50 + np.abs(np.cumsum(rng.normal(0, 0.5, (symbols, bars)), axis=1))
+    t_loop, _ = best_of(lambda: [ta_indicators(pd.DataFrame({'close': row})) for row in panel], 1)
+    t_batch, _ = best_of(lambda: compute_indicators(panel), 3)
+    print(f"\n{symbols} mã x {bars} nến: ta từng mã {t_loop * 1e3:.1f} ms, "
+          f"numpy theo lô {t_batch * 1e3:.1f} ms ({t_loop / t_batch:.1f}x)")
@@ -0,0 +1,91 @@
+# Gom lệnh khớp thành nến nhiều khung: phát lại một phiên đã ghi (nhanh nhất có thể) vào
+# IntradayAggregator và so với pandas resample trên cùng dữ liệu.
+# Chạy từ thư mục gốc: python -m benchmarks.bench_intraday [số mã] [số lệnh mỗi mã]
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from intraday import BAR_FIELDS, IntradayAggregator, ReplayFeed, interval_ns
+
+INTERVALS = ('1m', '5m', '15m')
+
+
+def make_session(count, per_symbol, seed=0):
+    # Một phiên 9:15-11:30 và 13:00-14:30, lệnh khớp ngẫu nhiên xen kẽ giữa các mã
+    rng = np.random.default_rng(seed)
+    day = pd.Timestamp('2024-06-03')
+    morning = (day + pd.Timedelta('9h15min')).value, (day + pd.Timedelta('11h30min')).value
+    afternoon = (day + pd.Timedelta('13h')).value, (day + pd.Timedelta('14h30min')).value
+    frames = []
+    for i in range(count):
+        half = per_symbol // 2
+        times = np.sort(np.concatenate([rng.integers(*morning, half), rng.integers(*afternoon, per_symbol - half)]))
+        price = np.round(20 * np.exp(np.cumsum(rng.normal(0, 0.0005, per_symbol))), 2)
+        frames.append(pd.DataFrame({'symbol': f"S{i:02d}", 'time': pd.to_datetime(times), 'price': price,
+                                    'volume': rng.integers(1, 100, per_symbol) * 100.0}))
+    return pd.concat(frames).sort_values('time', kind='stable').reset_index(drop=True)
+
+
+def resample(ticks, interval):
+    rule = f"{interval_ns(interval) // 60_000_000_000}min"
+    out = {}
+    for symbol, df in ticks.groupby('symbol'):
+        df = df.set_index('time')
+        bars = df['price'].resample(rule).ohlc()
+        bars['volume'] = df['volume'].resample(rule).sum()
+        out[symbol] = bars.dropna(subset=['open'])
+    return out
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    per_symbol = int(sys.argv[2]) if len(sys.argv) > 2 else 4000
+
+    ticks = make_session(count, per_symbol)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'ticks.parquet')
+        ticks.to_parquet(path, index=False)
+        feed = ReplayFeed(path)
+
+        aggregator = IntradayAggregator(INTERVALS, capacity=512)
+        start = time.perf_counter()
+        aggregator.consume(feed)
+        elapsed = time.perf_counter() - start
+
+    # Các nến trong bộ đệm phải trùng với pandas resample
+    for interval in INTERVALS:
+        expected = resample(ticks, interval)
+        for symbol, bars in expected.items():
+            ring = aggregator.ring(symbol, interval)
+            bars = bars.iloc[-ring.capacity:]
+            assert (ring.view('time') == bars.index.to_numpy()).all(), (symbol, interval)
+            for field in BAR_FIELDS:
+                assert np.allclose(ring.view(field), bars[field].to_numpy()), (symbol, interval, field)
+
+    # Lệnh đến trễ vài giây (vẫn trong cùng phút) không được ghi đè giá đóng cửa bằng giá cũ hơn
+    rng = np.random.default_rng(1)
+    times = ticks['time'].astype('int64').to_numpy()
+    delay = rng.integers(0, 5_000_000_000, len(ticks)) * (rng.random(len(ticks)) < 0.05)
+    arrival = np.minimum(times + delay, times - times % 60_000_000_000 + 59_999_999_999)
+    shuffled = ticks.iloc[np.argsort(arrival, kind='stable')].reset_index(drop=True)
+    late = IntradayAggregator(INTERVALS, capacity=512)
+    late.consume(ReplayFeed(shuffled))
+    for interval in INTERVALS:
+        for symbol, bars in resample(ticks, interval).items():
+            ring = late.ring(symbol, interval)
+            assert np.allclose(ring.view('close'), bars['close'].iloc[-ring.capacity:].to_numpy()), (symbol, interval)
+
+    # View không sao chép: chỉ báo tính thẳng trên bộ nhớ của bộ đệm
+    ring = aggregator.ring('S00', '1m')
+    assert np.shares_memory(ring.view('close'), ring.values)
+    values = aggregator.indicators('S00', '1m')
+
+    session = (ticks['time'].iloc[-1] - ticks['time'].iloc[0]).total_seconds()
+    print(f"{len(ticks)} lệnh khớp, {count} mã, khung {', '.join(INTERVALS)}: {elapsed:.2f}s "
+          f"({len(ticks) / elapsed:,.0f} lệnh/giây, nhanh hơn thời gian thực {session / elapsed:,.0f}x)")
+    print(f"bộ đệm: {aggregator.nbytes() / 2**20:.1f} MB cố định; số nến 1m của S00: {len(ring)}, "
+          f"RSI cuối {values['RSI'][-1]:.1f}")
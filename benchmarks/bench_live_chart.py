@@ -0,0 +1,118 @@
+# Biểu đồ trực tiếp: phát lại các nến 1 phút đã ghi cho một bảng nhiều mã, so sánh cập nhật phần đuôi
+# (LiveChart, blitting) với vẽ lại toàn bộ biểu đồ mỗi lần có giá mới.
+# Chạy từ thư mục gốc: python -m benchmarks.bench_live_chart [số mã] [số nến phát lại] [số lần khớp mỗi nến]
+import sys
+import time
+
+import matplotlib
+
+matplotlib.use('Agg')
+
+import numpy as np
+import pandas as pd
+
+from chart_renderer import ChartTemplate
+from indicators import INDICATOR_COLUMNS, add_technical_indicators
+from live_chart import LiveBoard
+
+BUDGET_MS = 50
+
+
+def make_history(count, bars, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2024-06-03 09:15', periods=bars, freq='1min', name='time')
+    frames = {}
+    for i in range(count):
+        close = np.round(20 * np.exp(np.cumsum(rng.normal(0, 0.002, bars))), 2)
+        open_ = np.round(close * (1 + rng.normal(0, 0.001, bars)), 2)
+        frames[f"S{i:02d}"] = pd.DataFrame({
+            'open': open_, 'high': np.maximum(open_, close) * 1.001, 'low': np.minimum(open_, close) * 0.999,
+            'close': close, 'volume': rng.integers(1_000, 50_000, bars).astype(float),
+        }, index=index)
+    return frames
+
+
+def record_ticks(frames, bars, ticks, seed=1):
+    # Bản ghi cập nhật: mỗi nến mới có `ticks` lần thay đổi (giá khớp, khối lượng cộng dồn), xen kẽ giữa các mã.
+    # Bản ghi bắt đầu bằng một lần sửa nến cuối của lịch sử (nến đang hình thành khi mở biểu đồ).
+    rng = np.random.default_rng(seed)
+    start = next(iter(frames.values())).index[-1]
+    records = []
+    for symbol, df in frames.items():
+        bar = {'time': start, **df.iloc[-1][['open', 'high', 'low', 'close', 'volume']].to_dict()}
+        price = round(bar['close'] * (1 + rng.normal(0, 0.003)), 2)
+        bar.update(high=max(bar['high'], price), low=min(bar['low'], price), close=price,
+                   volume=bar['volume'] + float(rng.integers(100, 5_000)))
+        records.append((symbol, bar))
+    last = {s: pd.Series(bar) for s, bar in records}
+    for k in range(1, bars + 1):
+        when = start + pd.Timedelta(minutes=k)
+        state = {}
+        for symbol, prev in last.items():
+            price = round(float(prev['close']) * (1 + rng.normal(0, 0.002)), 2)
+            state[symbol] = {'time': when, 'open': price, 'high': price, 'low': price, 'close': price, 'volume': 0.0}
+        for _ in range(ticks):
+            for symbol, bar in state.items():
+                price = round(bar['close'] * (1 + rng.normal(0, 0.001)), 2)
+                bar.update(high=max(bar['high'], price), low=min(bar['low'], price), close=price,
+                           volume=bar['volume'] + float(rng.integers(100, 5_000)))
+                records.append((symbol, dict(bar)))
+        last = {s: pd.Series(b) for s, b in state.items()}
+    return records
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    bars = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    ticks = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    frames = make_history(count, 300)
+    records = record_ticks(frames, bars, ticks)
+
+    start = time.perf_counter()
+    board = LiveBoard(frames)
+    t_setup = time.perf_counter() - start
+
+    costs, modes = [], []
+    for symbol, bar in records:
+        start = time.perf_counter()
+        modes.append(board.update(symbol, bar))
+        costs.append(time.perf_counter() - start)
+    costs = np.array(costs) * 1000
+
+    # Vẽ lại toàn bộ mỗi lần cập nhật (dựng DataFrame, tính chỉ báo, vẽ figure) trên một phần bản ghi
+    template = ChartTemplate()
+    history = {s: df.copy() for s, df in frames.items()}
+    full = []
+    for symbol, bar in records[:200]:
+        start = time.perf_counter()
+        df = history[symbol]
+        when = pd.Timestamp(bar['time'])
+        row = pd.DataFrame([{k: bar[k] for k in ('open', 'high', 'low', 'close', 'volume')}],
+                           index=pd.DatetimeIndex([when], name='time'))
+        df = history[symbol] = pd.concat([df[df.index < when], row])
+        template.update(add_technical_indicators(df).iloc[-120:], symbol)
+        template.fig.canvas.draw()
+        full.append(time.perf_counter() - start)
+    full = np.array(full) * 1000
+
+    # Chỉ báo cập nhật từng lần khớp phải trùng với tính lại toàn bộ trên các nến cuối cùng
+    # (kể cả nến cuối của lịch sử đã bị sửa ở lần cập nhật đầu tiên)
+    for symbol in frames:
+        chart = board[symbol].frame()
+        actual = chart.iloc[-(bars + 1):]
+        expected = add_technical_indicators(pd.concat([frames[symbol].iloc[:-1], actual[list(frames[symbol])]]))
+        for name in INDICATOR_COLUMNS:
+            assert np.allclose(actual[name], expected[name].iloc[-(bars + 1):], equal_nan=True), (symbol, name)
+
+    redraws = modes.count('redraw')
+    print(f"{count} mã, {len(records)} lần cập nhật ({bars} nến x {ticks} lần khớp), dựng bảng {t_setup:.2f}s")
+    print(f"LiveChart: trung bình {costs.mean():.2f} ms, p50 {np.percentile(costs, 50):.2f} ms, "
+          f"p95 {np.percentile(costs, 95):.2f} ms, tối đa {costs.max():.1f} ms; vẽ lại toàn bộ {redraws} lần")
+    print(f"Vẽ lại mỗi lần: trung bình {full.mean():.1f} ms, p95 {np.percentile(full, 95):.1f} ms "
+          f"({full.mean() / costs.mean():.0f}x chậm hơn)")
+    print(f"Làm mới cả bảng {count} mã: {costs.mean() * count:.0f} ms")
+    p95 = np.percentile(costs, 95)
+    if p95 > BUDGET_MS:
+        print(f"VƯỢT NGÂN SÁCH: p95 {p95:.1f} ms > {BUDGET_MS} ms mỗi biểu đồ")
+        sys.exit(1)
@@ -0,0 +1,61 @@
+# Bộ nhớ và thời gian tính chỉ báo: DataFrame riêng từng mã so với CompactPanel.
+# Chạy từ thư mục gốc: python -m benchmarks.bench_panel [số mã] [số năm]
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from indicators import INDICATOR_COLUMNS, add_technical_indicators
+from panel import CompactPanel
+
+
+def make_frames(count, years, seed=0):
+    # Giá làm tròn theo bước giá 10 đồng như dữ liệu vnstock; một số mã niêm yết muộn hoặc tạm ngừng giao dịch
+    rng = np.random.default_rng(seed)
+    bars = years * 250
+    index = pd.bdate_range(end='2024-12-31', periods=bars, name='time')
+    frames = {}
+    for i in range(count):
+        start = int(rng.integers(0, bars // 2)) if rng.random() < 0.2 else 0
+        close = np.round(20 * np.exp(np.cumsum(rng.normal(0, 0.02, bars - start))), 2)
+        df = pd.DataFrame({
+            'open': close, 'high': np.round(close * 1.01, 2), 'low': np.round(close * 0.99, 2), 'close': close,
+            'volume': rng.integers(1_000, 5_000_000, bars - start),
+        }, index=index[start:])
+        if rng.random() < 0.05:
+            df = df.drop(df.index[len(df) // 2:len(df) // 2 + 5])
+        frames[f"S{i:04d}"] = df
+    return frames
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1600
+    years = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    frames = make_frames(count, years)
+    start = time.perf_counter()
+    panel = CompactPanel.from_frames(frames)
+    t_build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    panel.compute_indicators()
+    t_panel = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with_indicators = {s: add_technical_indicators(df) for s, df in frames.items()}
+    t_frames = time.perf_counter() - start
+    frame_bytes = sum(int(df.memory_usage(index=True, deep=True).sum()) for df in with_indicators.values())
+
+    # Kiểm tra vài mã: giá giữ nguyên, chỉ báo khớp trong sai số float32
+    for symbol in list(frames)[::max(1, count // 20)]:
+        expected = with_indicators[symbol]
+        actual = panel[symbol].to_frame()
+        assert (actual['close'].to_numpy() == expected['close'].to_numpy()).all(), symbol
+        for name in INDICATOR_COLUMNS:
+            assert np.allclose(actual[name], expected[name], rtol=1e-5, equal_nan=True), (symbol, name)
+
+    print(panel.report())
+    print(f"DataFrame + chỉ báo: {frame_bytes / 2**20:.1f} MB, bảng gọn + chỉ báo: {panel.nbytes() / 2**20:.1f} MB "
+          f"({frame_bytes / panel.nbytes():.1f}x)")
+    print(f"dựng bảng {t_build:.2f}s; chỉ báo: bảng gọn {t_panel:.2f}s, từng DataFrame {t_frames:.2f}s")
@@ -0,0 +1,34 @@
+# So sánh vẽ tuần tự bằng mpf (plot_chart, không qua cache ảnh) với vẽ song song trên process pool,
+# mỗi tiến trình một ChartTemplate dựng sẵn.
+# Chạy từ thư mục gốc: python -m benchmarks.bench_parallel_render
+import os
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+
+from benchmarks.bench_chart_render import make_frames
+from chart_renderer import ChartTemplate
+from charts import figure_to_png, plot_chart
+from parallel_render import render_many
+
+if __name__ == "__main__":
+    frames = {f"S{i:03d}": df for i, df in enumerate(make_frames(48))}
+
+    start = time.perf_counter()
+    serial = {symbol: figure_to_png(plot_chart(df, symbol)) for symbol, df in frames.items()}
+    t_serial = time.perf_counter() - start
+    print(f"tuần tự: {t_serial:.2f}s ({len(frames) / t_serial:.1f} ảnh/s)")
+    template = ChartTemplate()
+    expected = {symbol: template.render_png(df, symbol) for symbol, df in frames.items()}
+
+    cores = os.cpu_count() or 1
+    for workers in sorted({1, 2, 4, cores} & set(range(1, cores + 1))):
+        start = time.perf_counter()
+        images, errors = render_many(frames, max_workers=workers)
+        elapsed = time.perf_counter() - start
+        assert not errors, errors
+        # Ảnh từ tiến trình con phải giống hệt ảnh vẽ bằng template trong tiến trình chính
+        assert images == expected
+        print(f"{workers:>2} tiến trình: {elapsed:.2f}s ({len(frames) / elapsed:.1f} ảnh/s, "
+              f"{t_serial / elapsed:.2f}x)")
@@ -0,0 +1,81 @@
+# Tháp giá ngày/tuần/tháng: thời gian vẽ khoảng 20 năm bằng nến ngày so với mức được chọn theo ngân sách,
+# và cập nhật tăng dần so với dựng lại toàn bộ.
+# Chạy từ thư mục gốc: python -m benchmarks.bench_pyramid [số năm]
+import sys
+import tempfile
+import time
+
+import matplotlib
+
+matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from charts import plot_chart
+from data_store import OHLCVStore
+from indicators import add_technical_indicators
+from pyramid import CANDLE_BUDGET, LEVELS, PricePyramid, chart_title, fit_to_budget, resample_ohlcv
+
+
+def make_daily(years, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end='2024-12-31', periods=years * 250, name='time')
+    close = np.round(20 * np.exp(np.cumsum(rng.normal(0, 0.02, len(index)))), 2)
+    open_ = np.round(close * (1 + rng.normal(0, 0.005, len(index))), 2)
+    return pd.DataFrame({
+        'open': open_, 'high': np.maximum(open_, close) * 1.01, 'low': np.minimum(open_, close) * 0.99,
+        'close': close, 'volume': rng.integers(1_000, 5_000_000, len(index)).astype(float),
+    }, index=index)
+
+
+def timed_plot(df, title):
+    start = time.perf_counter()
+    fig = plot_chart(df, title)
+    fig.canvas.draw()
+    plt.close(fig)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    years = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    daily = make_daily(years)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = OHLCVStore(tmp, fetch=None)
+        # Lưu thiếu 10 phiên cuối để đo cập nhật tăng dần
+        store.save('AAA', daily.iloc[:-10])
+        pyramid = PricePyramid(store, root=f"{tmp}/pyramid")
+
+        start = time.perf_counter()
+        pyramid.update('AAA')
+        t_build = time.perf_counter() - start
+
+        t_updates = []
+        for k in range(10, 0, -1):
+            store.save('AAA', daily.iloc[:len(daily) - k + 1])
+            start = time.perf_counter()
+            levels = pyramid.update('AAA')
+            t_updates.append(time.perf_counter() - start)
+
+        # Cập nhật tăng dần phải trùng với dựng lại từ đầu
+        for level in LEVELS:
+            expected = add_technical_indicators(resample_ohlcv(daily, level))
+            pd.testing.assert_frame_equal(levels[level], expected, check_freq=False)
+
+        six_months = add_technical_indicators(daily).iloc[-125:]
+        t_six = timed_plot(six_months, 'AAA')
+
+        start = time.perf_counter()
+        view, level = fit_to_budget(daily, 'AAA', pyramid=pyramid)
+        t_fit = time.perf_counter() - start
+        t_level = timed_plot(view, chart_title('AAA', level))
+
+        t_full = timed_plot(add_technical_indicators(daily), 'AAA')
+
+    print(f"{years} năm = {len(daily)} nến ngày; ngân sách {CANDLE_BUDGET} nến")
+    print(f"dựng tháp {t_build * 1000:.1f} ms, cập nhật mỗi phiên mới {np.mean(t_updates) * 1000:.1f} ms")
+    print(f"vẽ 6 tháng nến ngày: {t_six:.2f}s")
+    print(f"vẽ {years} năm nến ngày: {t_full:.2f}s")
+    print(f"vẽ {years} năm qua tháp: {len(view)} nến {level}, chọn mức {t_fit * 1000:.1f} ms + vẽ {t_level:.2f}s")
@@ -0,0 +1,61 @@
+# So sánh df_to_summary cũ (vòng lặp items()) với bản định dạng theo cột và bản gọn.
+# Chạy từ thư mục gốc: python -m benchmarks.bench_reports [số mã]
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from reports import df_to_summary, summary_table
+
+
+def df_to_summary_loop(df, n=3):
+    # Bản cũ trong backup/main copy 4.py
+    if df is None or df.empty:
+        return "Không có dữ liệu."
+    df = df.fillna('')
+    lines = []
+    cols = df.columns[1:n+1]
+    for col in cols:
+        lines.append(f"*{col}*")
+        for idx, val in df[col].items():
+            lines.append(f"  - {idx}: {val}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def make_statements(count, rows=120, years=8, seed=0):
+    rng = np.random.default_rng(seed)
+    index = [f"Chỉ tiêu {i}" for i in range(rows)]
+    frames = []
+    for i in range(count):
+        values = rng.normal(1e9, 5e8, (rows, years))
+        values[rng.random((rows, years)) < 0.1] = np.nan
+        df = pd.DataFrame(values, index=index, columns=[str(2024 - k) for k in range(years)])
+        df.insert(0, 'ticker', f"S{i:04d}")
+        frames.append(df)
+    return frames
+
+
+def timed(func, frames):
+    start = time.perf_counter()
+    out = [func(df) for df in frames]
+    return time.perf_counter() - start, out
+
+
+if __name__ == "__main__":
+    # Mỗi mã có 4 báo cáo; mặc định ~1.600 mã trên HOSE/HNX/UPCoM
+    symbols = int(sys.argv[1]) if len(sys.argv) > 1 else 1600
+    frames = make_statements(symbols * 4)
+
+    t_loop, expected = timed(df_to_summary_loop, frames)
+    t_vec, actual = timed(df_to_summary, frames)
+    assert actual == expected, "df_to_summary khác kết quả bản cũ"
+    t_md, _ = timed(lambda df: summary_table(df, fmt='markdown'), frames)
+    t_csv, _ = timed(lambda df: summary_table(df, fmt='csv'), frames)
+
+    print(f"{symbols} mã x 4 báo cáo:")
+    print(f"  bản cũ (items):      {t_loop:6.2f}s")
+    print(f"  df_to_summary mới:   {t_vec:6.2f}s ({t_loop / t_vec:.1f}x)")
+    print(f"  bảng Markdown gọn:   {t_md:6.2f}s ({t_loop / t_md:.1f}x)")
+    print(f"  CSV gọn:             {t_csv:6.2f}s ({t_loop / t_csv:.1f}x)")
@@ -0,0 +1,62 @@
+# Đo thời gian quét toàn thị trường trên kho dữ liệu giả lập (~1.600 mã HOSE/HNX/UPCoM).
+# Chạy từ thư mục gốc: python -m benchmarks.bench_scanner [số mã] [số phiên]
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_store import OHLCVStore
+from scanner import DEFAULT_SCREENS, load_price_panel, scan_market, scan_panel
+
+
+def make_store(root, count, bars=250, seed=0):
+    rng = np.random.default_rng(seed)
+    store = OHLCVStore(root=root, fetch=None)
+    dates = pd.bdate_range(end='2024-12-31', periods=bars, name='time')
+    symbols = [f"S{i:04d}" for i in range(count)]
+    for symbol in symbols:
+        # Một số mã niêm yết muộn hoặc tạm ngừng giao dịch vài phiên
+        start = int(rng.integers(0, bars // 3)) if rng.random() < 0.1 else 0
+        keep = np.ones(bars - start, dtype=bool)
+        keep[rng.random(keep.size) < 0.02] = False
+        close = 20 * np.exp(np.cumsum(rng.normal(0, 0.02, bars - start)))
+        df = pd.DataFrame({
+            'open': close, 'high': close * 1.01, 'low': close * 0.99, 'close': close,
+            'volume': rng.integers(1_000, 1_000_000, bars - start),
+        }, index=dates[start:])[keep]
+        store.save(symbol, df)
+    return store, symbols
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1600
+    bars = int(sys.argv[2]) if len(sys.argv) > 2 else 250
+
+    with tempfile.TemporaryDirectory() as root:
+        store, symbols = make_store(root, count, bars)
+
+        start = time.perf_counter()
+        load_price_panel(symbols, store=store)
+        t_build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        panels = load_price_panel(symbols, store=store)
+        t_load = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = scan_panel(panels['close'], panels['volume'], DEFAULT_SCREENS)
+        t_scan = time.perf_counter() - start
+
+        start = time.perf_counter()
+        scan_market(symbols=symbols, days_back=365, store=store)
+        t_total = time.perf_counter() - start
+
+    print(f"{count} mã x {bars} phiên:")
+    print(f"  dựng bảng gộp lần đầu:   {t_build:6.3f}s")
+    print(f"  đọc bảng gộp:            {t_load:6.3f}s")
+    print(f"  chỉ báo + điều kiện lọc: {t_scan:6.3f}s")
+    print(f"  scan_market (tổng):      {t_total:6.3f}s")
+    print(f"  {len(result)} mã khớp tín hiệu")
+    print(result.head(10).to_string(index=False))
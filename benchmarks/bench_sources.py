@@ -0,0 +1,142 @@
+# Chọn nguồn dữ liệu: mô phỏng ba nguồn (một nguồn thỉnh thoảng rất chậm, một nguồn chậm hơn nhưng ổn định,
+# một nguồn hỏng một thời gian) và so sánh độ trễ khi chỉ dùng một nguồn với SourceRouter
+# (chọn nguồn nhanh nhất, gửi dự phòng theo phân vị, ngắt mạch).
+# Chạy từ thư mục gốc: python -m benchmarks.bench_sources [số yêu cầu]
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from data_store import normalize_history
+from sources import NoData, SourceRouter, SourceUnavailable
+
+SCALE = 0.01  # 1 đơn vị mô phỏng = 10 ms
+
+
+class FakeSource:
+    def __init__(self, name, base, tail_prob, tail, fail_until=0, seed=0):
+        self.name = name
+        self.base, self.tail_prob, self.tail = base, tail_prob, tail
+        self.fail_until = fail_until
+        self.rng = np.random.default_rng(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def history(self, symbol):
+        with self.lock:
+            self.calls += 1
+            calls = self.calls
+            slow = self.rng.random() < self.tail_prob
+            jitter = self.rng.exponential(0.3)
+        if calls <= self.fail_until:
+            time.sleep(0.5 * SCALE)
+            raise ConnectionError(f"{self.name} trả về 503")
+        time.sleep((self.tail if slow else self.base + jitter) * SCALE)
+        # Mỗi nguồn một kiểu cột thời gian như vnstock: VCI 'time', TCBS 'date' (chuỗi), MSN có múi giờ
+        days = pd.bdate_range(end='2024-12-31', periods=5)
+        frame = pd.DataFrame({'open': 10.0, 'high': 11.0, 'low': 9.0, 'close': 10.5, 'volume': 1000.0}, index=days)
+        if self.name == 'VCI':
+            return frame.rename_axis('time').reset_index()
+        if self.name == 'TCBS':
+            return frame.rename_axis('date').reset_index().assign(date=lambda df: df['date'].dt.strftime('%Y-%m-%d'))
+        return frame.tz_localize('Asia/Ho_Chi_Minh').rename_axis('Date').rename(columns=str.title).reset_index()
+
+
+def run(fetch, requests, workers=8):
+    latencies, errors = [], 0
+
+    def one(i):
+        start = time.perf_counter()
+        try:
+            df = fetch(f"S{i:03d}")
+            assert list(df.columns) == ['open', 'high', 'low', 'close', 'volume'] and df.index.name == 'time'
+            assert df.index.tz is None and len(df) == 5
+            ok = True
+        except SourceUnavailable:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for seconds, ok in pool.map(one, range(requests)):
+            latencies.append(seconds * 1000)
+            errors += not ok
+    return np.array(latencies), errors
+
+
+def make_sources():
+    # VCI nhanh nhưng 4% yêu cầu rất chậm; TCBS chậm hơn, ổn định; MSN hỏng 30 yêu cầu đầu
+    return {
+        'VCI': FakeSource('VCI', base=3, tail_prob=0.04, tail=150, seed=1),
+        'TCBS': FakeSource('TCBS', base=6, tail_prob=0.01, tail=60, seed=2),
+        'MSN': FakeSource('MSN', base=4, tail_prob=0.02, tail=80, fail_until=30, seed=3),
+    }
+
+
+if __name__ == "__main__":
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+
+    sources = make_sources()
+    single, single_errors = run(lambda s: normalize_history(sources['VCI'].history(s)), requests)
+
+    sources = make_sources()
+    router = SourceRouter({'quote': ('MSN', 'VCI', 'TCBS')})
+    routed, routed_errors = run(
+        lambda s: router.call('quote', lambda src: normalize_history(sources[src].history(s)))[0], requests)
+
+    for name, values, errors in (("Chỉ VCI", single, single_errors), ("SourceRouter", routed, routed_errors)):
+        print(f"{name:<13s} p50 {np.percentile(values, 50):6.0f} ms, p95 {np.percentile(values, 95):6.0f} ms, "
+              f"p99 {np.percentile(values, 99):6.0f} ms, tối đa {values.max():6.0f} ms, lỗi {errors}")
+    snapshot = router.snapshot()
+    print({k: v for k, v in snapshot.items() if k != 'sources'})
+    for source, health in snapshot['sources'].items():
+        print(f"  {source:<12s} {health}")
+    print("số lần gọi mỗi nguồn:", {name: source.calls for name, source in sources.items()})
+    router.pool.shutdown(wait=True)
+
+    # Mã không có dữ liệu là lỗi của yêu cầu: ném lại NoData, không chuyển nguồn, không ngắt mạch
+    def unknown(src):
+        raise NoData(f"{src}: không tìm thấy mã")
+
+    router = SourceRouter({'quote': ('VCI', 'TCBS', 'MSN')})
+    for _ in range(20):
+        try:
+            router.call('quote', unknown)
+        except LookupError:
+            pass
+    snapshot = router.snapshot()
+    assert snapshot['breaker_opens'] == 0 and snapshot['failovers'] == 0, snapshot
+    assert snapshot['sources']['quote:VCI']['calls'] == 20 and snapshot['sources']['quote:TCBS']['calls'] == 0, snapshot
+    router.pool.shutdown(wait=True)
+
+    # Nguồn trả về dữ liệu sai định dạng (KeyError) là lỗi của nguồn: tính vào sức khỏe và chuyển nguồn
+    def broken(src):
+        if src == 'VCI':
+            raise KeyError('time')
+        return src
+
+    router = SourceRouter({'quote': ('VCI', 'TCBS')})
+    assert all(router.call('quote', broken)[1] == 'TCBS' for _ in range(5))
+    snapshot = router.snapshot()
+    assert snapshot['sources']['quote:VCI']['error_rate'] == 1.0 and snapshot['failovers'] == 1, snapshot
+    router.pool.shutdown(wait=True)
+
+    # Nguồn treo đứng đầu thứ tự ưu tiên: quá hạn thì chuyển nguồn và ngắt mạch sau vài lần
+    sources = make_sources()
+    release = threading.Event()
+
+    def hung(src, s):
+        if src == 'HUNG':
+            release.wait()
+        return normalize_history(sources[src].history(s))
+
+    router = SourceRouter({'quote': ('HUNG', 'TCBS')}, timeout=0.2)
+    hung_latency, hung_errors = run(lambda s: router.call('quote', lambda src: hung(src, s))[0], 40, workers=4)
+    release.set()
+    router.pool.shutdown(wait=True)
+    snapshot = router.snapshot()
+    print(f"Nguồn treo     p50 {np.percentile(hung_latency, 50):6.0f} ms, tối đa {hung_latency.max():6.0f} ms, "
+          f"lỗi {hung_errors}, quá hạn {snapshot['timeouts']}, ngắt mạch {snapshot['breaker_opens']}")
+    assert hung_errors == 0 and snapshot['sources']['quote:HUNG']['state'] == 'open', snapshot
@@ -0,0 +1,104 @@
+# Thời gian khởi động: đo bằng python -X importtime các module đầu vào (không được kéo theo thư viện nặng
+# khi chưa dùng) và thời gian từ lúc chạy tiến trình tới khi có ảnh biểu đồ đầu tiên (dữ liệu đã có trong kho).
+# Thoát với mã 1 nếu vượt ngân sách. Chạy từ thư mục gốc: python -m benchmarks.bench_startup [số lần chạy]
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_store import OHLCVStore
+
+# Ngân sách (ms), có thể nới bằng biến môi trường trên máy chậm
+FIRST_CHART_BUDGET_MS = float(os.environ.get('PTCK_FIRST_CHART_BUDGET_MS', 3000))
+IMPORT_BUDGET_MS = float(os.environ.get('PTCK_IMPORT_BUDGET_MS', 1500))
+
+# Module đầu vào và các thư viện nặng chúng không được import ngay khi khởi động
+ENTRY_MODULES = {
+    'data_store': ('vnstock', 'matplotlib', 'mplfinance'),
+    'data_service': ('vnstock', 'matplotlib', 'mplfinance'),
+    'fundamentals': ('vnstock', 'matplotlib', 'mplfinance'),
+    'charts': ('vnstock', 'matplotlib', 'mplfinance'),
+    'batch_run': ('vnstock', 'matplotlib', 'mplfinance'),
+    'main': ('vnstock', 'matplotlib', 'mplfinance'),
+}
+
+FIRST_CHART = """
+import time
+start = time.perf_counter()
+from chart_cache import ChartCache
+from charts import chart_png
+from data_store import OHLCVStore, get_stock_history
+from indicators import add_technical_indicators
+store = OHLCVStore({root!r}, fetch=lambda *args: None)
+df = get_stock_history('AAA', 180, store=store)
+png = chart_png(add_technical_indicators(df), 'AAA', cache=ChartCache({cache!r}))
+assert png[:4] == b'\\x89PNG'
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+def importtime(code, env):
+    # Chạy code với -X importtime; trả về (stdout, {module cấp đầu: thời gian tích lũy ms}, tập module đã import)
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], env=env,
+                          capture_output=True, text=True, check=True)
+    top, loaded = {}, set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        loaded.add(name.strip())
+        if not name[1:].startswith(' '):
+            top[name.strip()] = int(cumulative) / 1000
+    return proc.stdout, top, loaded
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [os.getcwd(), os.environ.get('PYTHONPATH')]))}
+    failures = []
+
+    print("Import module đầu vào:")
+    for module, forbidden in ENTRY_MODULES.items():
+        _, top, loaded = importtime(f"import {module}", env)
+        total = top.get(module, 0.0)
+        heavy = [name for name in forbidden if name in loaded]
+        print(f"  {module:<14s} {total:7.0f} ms{'  (kéo theo: ' + ', '.join(heavy) + ')' if heavy else ''}")
+        if heavy:
+            failures.append(f"import {module} kéo theo {', '.join(heavy)}")
+        if total > IMPORT_BUDGET_MS:
+            failures.append(f"import {module} {total:.0f} ms > {IMPORT_BUDGET_MS:.0f} ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Kho có sẵn dữ liệu nên không có lượt gọi mạng nào
+        index = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=250, name='time')
+        close = 20 * np.exp(np.cumsum(np.random.default_rng(0).normal(0, 0.02, len(index))))
+        OHLCVStore(os.path.join(tmp, 'data'), fetch=None).save('AAA', pd.DataFrame(
+            {'open': close, 'high': close * 1.01, 'low': close * 0.99, 'close': close, 'volume': 1e6}, index=index))
+
+        walls, inner = [], []
+        for i in range(runs):
+            code = FIRST_CHART.format(root=os.path.join(tmp, 'data'), cache=os.path.join(tmp, f'charts{i}'))
+            start = time.perf_counter()
+            out = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True)
+            walls.append((time.perf_counter() - start) * 1000)
+            inner.append(float(out.stdout))
+        code = FIRST_CHART.format(root=os.path.join(tmp, 'data'), cache=os.path.join(tmp, 'charts-importtime'))
+        _, top, _ = importtime(code, env)
+
+    wall = statistics.median(walls)
+    print(f"Biểu đồ đầu tiên: {wall:.0f} ms tính cả khởi động trình thông dịch "
+          f"({statistics.median(inner):.0f} ms sau khi trình thông dịch chạy), trung vị {runs} lần")
+    print("Import tốn thời gian nhất trên đường tới biểu đồ đầu tiên:")
+    for name, ms in sorted(top.items(), key=lambda item: -item[1])[:8]:
+        print(f"  {name:<28s} {ms:7.0f} ms")
+    if wall > FIRST_CHART_BUDGET_MS:
+        failures.append(f"biểu đồ đầu tiên {wall:.0f} ms > {FIRST_CHART_BUDGET_MS:.0f} ms")
+
+    if failures:
+        print("VƯỢT NGÂN SÁCH:\n  " + "\n  ".join(failures))
+        sys.exit(1)
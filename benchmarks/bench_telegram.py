@@ -0,0 +1,87 @@
+# Gửi ảnh tới một máy chủ giả lập Telegram API chạy cục bộ:
+# gọi requests.post từng ảnh (như backup) so với hàng đợi TelegramDelivery.
+# Máy chủ giả lập trả 429 kèm retry_after cho một phần yêu cầu.
+# Chạy từ thư mục gốc: python -m benchmarks.bench_telegram [số ảnh]
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from telegram_sender import TelegramDelivery
+
+LATENCY = 0.08
+RATE_LIMIT_RATIO = 0.05
+
+
+class FakeTelegramHandler(BaseHTTPRequestHandler):
+    photos = 0
+    requests = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(LATENCY)
+        with self.lock:
+            FakeTelegramHandler.requests += 1
+        if random.random() < RATE_LIMIT_RATIO:
+            self._reply(429, {'ok': False, 'error_code': 429, 'parameters': {'retry_after': 0.2}})
+            return
+        with self.lock:
+            FakeTelegramHandler.photos += body.count(b'filename=')
+        self._reply(200, {'ok': True, 'result': {}})
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeTelegramHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def reset():
+    FakeTelegramHandler.photos = FakeTelegramHandler.requests = 0
+
+
+if __name__ == "__main__":
+    random.seed(0)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    photo = b'\x89PNG' + bytes(150_000)
+    server, api_url = start_server()
+
+    reset()
+    start = time.perf_counter()
+    for i in range(count):
+        # Cách cũ: mỗi ảnh một requests.post mới, chặn luồng chính, không thử lại
+        requests.post(f"{api_url}/botTOKEN/sendPhoto", files={'photo': ('chart.png', photo)},
+                      data={'chat_id': '1', 'caption': f"S{i}"})
+    t_old = time.perf_counter() - start
+    print(f"requests.post từng ảnh: {t_old:.2f}s, {FakeTelegramHandler.photos}/{count} ảnh tới nơi, "
+          f"{FakeTelegramHandler.requests} yêu cầu")
+
+    reset()
+    start = time.perf_counter()
+    with TelegramDelivery('TOKEN', '1', api_url=api_url, min_interval=0.1, batch_wait=0.2) as delivery:
+        for i in range(count):
+            time.sleep(0.01)  # giả lập thời gian vẽ biểu đồ chạy song song với việc gửi
+            delivery.send_photo(photo, caption=f"S{i}")
+    t_new = time.perf_counter() - start
+    stats = delivery.stats()
+    print(f"TelegramDelivery: {t_new:.2f}s, {FakeTelegramHandler.photos}/{count} ảnh tới nơi, "
+          f"{stats['requests']} yêu cầu, {stats['rate_limited']} lần 429")
+    print(f"  thông lượng {stats['photos_per_s']:.1f} ảnh/s, độ trễ hàng đợi p50 "
+          f"{stats['queue_latency_p50_s'] * 1e3:.0f} ms, p95 {stats['queue_latency_p95_s'] * 1e3:.0f} ms")
+    server.shutdown()
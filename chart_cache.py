@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import threading
+from io import BytesIO
+
+import pandas as pd
+
+from metrics import inc
+
+# Thư mục và dung lượng tối đa của cache ảnh biểu đồ
+CHART_CACHE_DIR = os.environ.get('PTCK_CHART_CACHE_DIR', os.path.join('data', 'charts'))
+CHART_CACHE_MAX_BYTES = int(os.environ.get('PTCK_CHART_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+
+def frame_digest(df):
+    # Băm nội dung DataFrame (index, tên cột, giá trị) thành chuỗi hex
+    h = hashlib.sha256()
+    h.update(json.dumps([str(c) for c in df.columns]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def chart_key(df, symbol, settings):
+    # Khóa cache = băm dữ liệu + mã + toàn bộ thiết lập ảnh hưởng tới hình vẽ
+    h = hashlib.sha256()
+    h.update(frame_digest(df).encode())
+    h.update(symbol.encode())
+    h.update(json.dumps(settings, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+class ChartCache:
+    # Cache ảnh PNG trên đĩa theo nội dung, loại bỏ ảnh ít dùng nhất (LRU theo mtime)
+    # khi tổng dung lượng vượt max_bytes.
+
+    def __init__(self, root: str = CHART_CACHE_DIR, max_bytes: int = CHART_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+
+    def path(self, key: str):
+        return os.path.join(self.root, key[:2], f"{key}.png")
+
+    def get(self, key: str):
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                png = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            inc('ptck_cache_misses_total', cache='chart')
+            return None
+        # Cập nhật thời gian truy cập để LRU giữ lại ảnh vừa dùng
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        self.hits += 1
+        inc('ptck_cache_hits_total', cache='chart')
+        return png
+
+    def put(self, key: str, png: bytes):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(png)
+        os.replace(tmp_path, path)
+        with self.lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(png)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith('.png'):
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield st.st_mtime, st.st_size, path
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        # Xóa tới khi còn 90% dung lượng cho phép để không phải dọn sau mỗi lần ghi
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+        self._size = total
+
+    def get_or_render(self, key: str, render):
+        png = self.get(key)
+        if png is None:
+            png = render()
+            self.put(key, png)
+        return png
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_chart_cache():
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ChartCache()
+    return _default_cache
+
+
+def as_buffer(png: bytes):
+    buf = BytesIO(png)
+    buf.seek(0)
+    return buf
@@ -0,0 +1,186 @@
+import threading
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from matplotlib import rc_context
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.figure import Figure
+from matplotlib.ticker import FuncFormatter, MaxNLocator
+
+import mplfinance as mpf
+
+from chart_cache import chart_key, get_chart_cache
+from charts import SAVEFIG_SETTINGS
+from metrics import timed
+
+# Các đường chỉ báo vẽ trên biểu đồ giá, giống charts.plot_chart
+PRICE_LINES = (
+    ('MA5', {'color': 'blue'}),
+    ('MA10', {'color': 'orange'}),
+    ('MA50', {'color': 'magenta'}),
+    ('BB_Upper', {'color': 'grey', 'linestyle': 'dashed'}),
+    ('BB_Middle', {'color': 'black', 'linestyle': 'dotted'}),
+    ('BB_Lower', {'color': 'grey', 'linestyle': 'dashed'}),
+)
+
+# Kích thước và bố cục lấy theo mpf.plot(figratio=(16, 9), figscale=1.2, panel_ratios=(6, 2))
+FIGSIZE = (12.27, 6.9)
+PRICE_AXES = (0.18, 0.355, 0.72, 0.525)
+LOWER_AXES = (0.18, 0.18, 0.72, 0.175)
+BODY_WIDTH = 0.6
+VOLUME_WIDTH = 0.9
+LINE_WIDTH = 1.3
+X_PADDING = 0.056
+
+
+class ChartTemplate:
+    # Biểu đồ dựng sẵn một lần (figure, trục, artist, style); mỗi mã chỉ thay dữ liệu
+    # của nến, khối lượng và các đường chỉ báo rồi vẽ lại.
+
+    def __init__(self, style: str = 'charles'):
+        style = mpf.make_mpf_style(base_mpf_style=style)
+        colors = style['marketcolors']
+        self.up_color = colors['candle']['up']
+        self.down_color = colors['candle']['down']
+        self.vol_up_color = colors['volume']['up']
+        self.vol_down_color = colors['volume']['down']
+        self.rc = dict(style['rc'])
+
+        with rc_context(self.rc):
+            self.fig = Figure(figsize=FIGSIZE, facecolor=style['facecolor'])
+            FigureCanvasAgg(self.fig)
+            self.ax_price = self.fig.add_axes(PRICE_AXES)
+            self.ax_volume = self.fig.add_axes(LOWER_AXES, sharex=self.ax_price)
+            self.ax_rsi = self.ax_volume.twinx()
+            for ax in (self.ax_price, self.ax_volume, self.ax_rsi):
+                ax.set_facecolor(style['facecolor'])
+                ax.grid(True, color=style['gridcolor'], linestyle=style['gridstyle'])
+            for ax in (self.ax_price, self.ax_volume):
+                ax.yaxis.tick_right()
+                ax.yaxis.set_label_position('right')
+            self.ax_rsi.yaxis.tick_left()
+            self.ax_rsi.yaxis.set_label_position('left')
+            self.ax_rsi.grid(False)
+            self.ax_price.set_ylabel('Price')
+            self.ax_volume.set_ylabel('Volume')
+            self.ax_rsi.set_ylabel('RSI')
+            self.ax_price.tick_params(labelbottom=False)
+            self.ax_volume.tick_params(axis='x', labelrotation=45)
+
+            self.wicks = LineCollection([], linewidths=1.0)
+            self.bodies = PolyCollection([], linewidths=0.5)
+            self.volume = PolyCollection([], linewidths=0.5)
+            self.ax_price.add_collection(self.wicks)
+            self.ax_price.add_collection(self.bodies)
+            self.ax_volume.add_collection(self.volume)
+            self.lines = {}
+            for name, kwargs in PRICE_LINES:
+                self.lines[name], = self.ax_price.plot([], [], linewidth=LINE_WIDTH, **kwargs)
+            self.lines['RSI'], = self.ax_rsi.plot([], [], color='purple', linewidth=LINE_WIDTH)
+            self.title = self.fig.suptitle('')
+
+        self.dates = np.array([], dtype='datetime64[ns]')
+        formatter = FuncFormatter(self._format_date)
+        self.ax_volume.xaxis.set_major_formatter(formatter)
+        self.ax_volume.xaxis.set_major_locator(MaxNLocator(nbins=8, integer=True))
+
+    def _format_date(self, x, pos=None):
+        i = int(round(x))
+        if i < 0 or i >= len(self.dates):
+            return ''
+        return pd.Timestamp(self.dates[i]).strftime('%Y-%b-%d')
+
+    def update(self, df, symbol):
+        n = len(df)
+        x = np.arange(n, dtype=np.float64)
+        o = df['open'].to_numpy(dtype=np.float64)
+        h = df['high'].to_numpy(dtype=np.float64)
+        l = df['low'].to_numpy(dtype=np.float64)
+        c = df['close'].to_numpy(dtype=np.float64)
+        v = df['volume'].to_numpy(dtype=np.float64)
+        self.dates = df.index.to_numpy()
+
+        # Dựng đỉnh của tất cả nến bằng NumPy, không tạo artist mới
+        up = c >= o
+        half = BODY_WIDTH / 2
+        left, right = x - half, x + half
+        bodies = np.stack([
+            np.column_stack([left, o]), np.column_stack([left, c]),
+            np.column_stack([right, c]), np.column_stack([right, o]),
+        ], axis=1)
+        wicks = np.stack([np.column_stack([x, l]), np.column_stack([x, h])], axis=1)
+        candle_colors = np.where(up, self.up_color, self.down_color)
+        self.bodies.set_verts(bodies)
+        self.bodies.set_facecolors(candle_colors)
+        self.bodies.set_edgecolors(candle_colors)
+        self.wicks.set_segments(wicks)
+        self.wicks.set_colors(candle_colors)
+
+        # Màu khối lượng theo giá đóng cửa so với phiên trước (giống style charles)
+        vol_up = np.ones(n, dtype=bool)
+        vol_up[1:] = c[1:] >= c[:-1]
+        zeros = np.zeros(n)
+        vol_left, vol_right = x - VOLUME_WIDTH / 2, x + VOLUME_WIDTH / 2
+        volume = np.stack([
+            np.column_stack([vol_left, zeros]), np.column_stack([vol_left, v]),
+            np.column_stack([vol_right, v]), np.column_stack([vol_right, zeros]),
+        ], axis=1)
+        vol_colors = np.where(vol_up, self.vol_up_color, self.vol_down_color)
+        self.volume.set_verts(volume)
+        self.volume.set_facecolors(vol_colors)
+        self.volume.set_edgecolors(vol_colors)
+
+        lows, highs = [l], [h]
+        for name, _ in PRICE_LINES:
+            y = df[name].to_numpy(dtype=np.float64)
+            self.lines[name].set_data(x, y)
+            lows.append(y)
+            highs.append(y)
+        rsi = df['RSI'].to_numpy(dtype=np.float64)
+        self.lines['RSI'].set_data(x, rsi)
+
+        pad = max(1.0, n * X_PADDING)
+        self.ax_price.set_xlim(-pad, n - 1 + pad)
+        with np.errstate(invalid='ignore'):
+            self._set_ylim(self.ax_price, np.nanmin(np.concatenate(lows)), np.nanmax(np.concatenate(highs)))
+            # Trục khối lượng như mpf: từ 0.3 lần khối lượng nhỏ nhất tới 1.1 lần lớn nhất
+            if n:
+                self.ax_volume.set_ylim(0.3 * np.nanmin(v), 1.1 * np.nanmax(v) or 1.0)
+            self._set_ylim(self.ax_rsi, np.nanmin(rsi) if n else 0, np.nanmax(rsi) if n else 100)
+        self.title.set_text(f"Biểu đồ kỹ thuật: {symbol}")
+
+    @staticmethod
+    def _set_ylim(ax, low, high, bottom_pad=True):
+        if not np.isfinite(low) or not np.isfinite(high):
+            low, high = 0.0, 1.0
+        span = (high - low) or abs(high) or 1.0
+        ax.set_ylim(low - (0.05 * span if bottom_pad else 0), high + 0.05 * span)
+
+    def render_png(self, df, symbol, **savefig):
+        self.update(df, symbol)
+        buf = BytesIO()
+        with rc_context(self.rc):
+            self.fig.savefig(buf, **{**SAVEFIG_SETTINGS, **savefig})
+        return buf.getvalue()
+
+
+_local = threading.local()
+
+
+def get_template():
+    # Mỗi luồng một template vì Figure của matplotlib không an toàn khi dùng chung;
+    # tiến trình vẽ của parallel_render/batch_run dựng sẵn template của nó khi khởi động
+    template = getattr(_local, 'template', None)
+    if template is None:
+        template = _local.template = ChartTemplate()
+    return template
+
+
+@timed('render_chart_template')
+def template_png(df, symbol, cache=None):
+    # Ảnh PNG vẽ bằng template của luồng hiện tại, dùng chung cache trên đĩa với charts.chart_png
+    cache = cache or get_chart_cache()
+    key = chart_key(df, symbol, {'renderer': 'ChartTemplate', 'savefig': SAVEFIG_SETTINGS})
+    return cache.get_or_render(key, lambda: get_template().render_png(df, symbol))
@@ -0,0 +1,73 @@
+from io import BytesIO
+
+from chart_cache import as_buffer, chart_key, get_chart_cache
+from metrics import timed, timer
+
+# Thiết lập chung cho biểu đồ kỹ thuật (nến + MA + Bollinger, khối lượng, RSI)
+CHART_SETTINGS = {
+    'type': 'candle',
+    'style': 'charles',
+    'volume': True,
+    'figratio': (16, 9),
+    'figscale': 1.2,
+    'panel_ratios': (6, 2),
+}
+
+# Tham số lưu ảnh PNG
+SAVEFIG_SETTINGS = {'format': 'png', 'bbox_inches': 'tight'}
+
+
+@timed('plot_chart')
+def plot_chart(df, symbol, **settings):
+    # Import khi vẽ biểu đồ đầu tiên để import charts không làm chậm khởi động
+    import mplfinance as mpf
+    addplots = [
+        mpf.make_addplot(df['MA5'], color='blue'),
+        mpf.make_addplot(df['MA10'], color='orange'),
+        mpf.make_addplot(df['MA50'], color='magenta'),
+        mpf.make_addplot(df['BB_Upper'], color='grey', linestyle='dashed'),
+        mpf.make_addplot(df['BB_Middle'], color='black', linestyle='dotted'),
+        mpf.make_addplot(df['BB_Lower'], color='grey', linestyle='dashed'),
+        mpf.make_addplot(df['RSI'], panel=1, color='purple', ylabel='RSI')
+    ]
+
+    fig, _ = mpf.plot(
+        df,
+        title=f"Biểu đồ kỹ thuật: {symbol}",
+        addplot=addplots,
+        returnfig=True,
+        **{**CHART_SETTINGS, **settings}
+    )
+    return fig
+
+
+def figure_to_png(fig, **savefig):
+    import matplotlib.pyplot as plt
+    with timer('png_encode') as span:
+        buf = BytesIO()
+        fig.savefig(buf, **{**SAVEFIG_SETTINGS, **savefig})
+        plt.close(fig)
+        span['bytes_out'] = buf.tell()
+    return buf.getvalue()
+
+
+def chart_png(df, symbol, cache=None, **settings):
+    # Ảnh PNG của plot_chart; chỉ gọi mpf.plot khi dữ liệu hoặc thiết lập thay đổi
+    cache = cache or get_chart_cache()
+    key = chart_key(df, symbol, {
+        'renderer': 'plot_chart',
+        'chart': {**CHART_SETTINGS, **settings},
+        'savefig': SAVEFIG_SETTINGS,
+    })
+    return cache.get_or_render(key, lambda: figure_to_png(plot_chart(df, symbol, **settings)))
+
+
+def chart_buffer(df, symbol, cache=None, **settings):
+    # Như chart_png nhưng trả về BytesIO (dùng để gửi Telegram)
+    return as_buffer(chart_png(df, symbol, cache=cache, **settings))
+
+
+def plot_candlestick_with_indicators(df, symbol, cache=None):
+    # Biểu đồ dùng trong các script gửi Telegram (backup/main copy 4.py), trả về BytesIO.
+    # Dùng chung thiết lập và cache ảnh với chart_png nên ảnh đã vẽ cho dashboard được dùng lại.
+    return chart_buffer(df, symbol, cache=cache)
@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+
+from cachetools import TTLCache
+
+from batch_fetch import RateLimiter
+from data_store import get_stock_history, get_vnstock
+
+# Thời gian sống (giây) và số mục tối đa của cache dùng chung giữa các phiên
+QUOTE_TTL = 15 * 60
+PROFILE_TTL = 24 * 60 * 60
+CACHE_ENTRIES = 512
+# Giới hạn số lần gọi nguồn mỗi giây của cả tiến trình; chỉ áp dụng khi trượt cache
+UPSTREAM_RATE = float(os.environ.get('PTCK_UPSTREAM_RATE', 5))
+UPSTREAM_BURST = 8
+
+
+def fetch_company_profile(symbol: str):
+    company = get_vnstock().stock(symbol=symbol).company
+    profile = company.overview()
+    leaders = company.officers(filter_by='working')
+    shareholders = company.shareholders()
+    return profile, leaders, shareholders
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    # Gộp các lời gọi trùng khóa đang chạy: chỉ luồng đầu tiên gọi nguồn, các luồng sau chờ
+    # và nhận chung kết quả (hoặc chung lỗi).
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, fn):
+        # Trả về (kết quả, có phải dùng chung với lời gọi khác không)
+        with self.lock:
+            call = self.calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = self.calls[key] = _Call()
+                leader = True
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result, False
+
+
+class DataService:
+    # Dịch vụ dữ liệu dùng chung cho mọi phiên trong tiến trình: cache có giới hạn + TTL,
+    # gộp các yêu cầu trùng đang chạy và khóa theo (loại dữ liệu, mã) để các yêu cầu giá khác nhau của
+    # cùng một mã (ví dụ khác số ngày) không cùng ghi file Parquet của mã đó; thông tin doanh nghiệp
+    # dùng khóa riêng nên không phải chờ tải giá của cùng mã.
+    # Kết quả được dùng chung giữa các phiên nên không được sửa trực tiếp.
+
+    def __init__(self, history=None, profile=fetch_company_profile, max_entries: int = CACHE_ENTRIES,
+                 quote_ttl: float = QUOTE_TTL, profile_ttl: float = PROFILE_TTL, timer=time.monotonic,
+                 rate_per_sec: float = UPSTREAM_RATE):
+        self.history = history or (lambda symbol, days_back, interval:
+                                   get_stock_history(symbol, days_back, interval=interval))
+        self.profile = profile
+        self.quotes = TTLCache(maxsize=max_entries, ttl=quote_ttl, timer=timer)
+        self.profiles = TTLCache(maxsize=max_entries, ttl=profile_ttl, timer=timer)
+        self.cache_lock = threading.Lock()
+        self.flight = SingleFlight()
+        self.limiter = RateLimiter(rate_per_sec, burst=UPSTREAM_BURST)
+        self.symbol_locks = {}
+        self.locks_lock = threading.Lock()
+        self.stats = {'requests': 0, 'cache_hits': 0, 'coalesced': 0, 'upstream_calls': 0, 'errors': 0}
+
+    def _symbol_lock(self, kind, symbol):
+        with self.locks_lock:
+            lock = self.symbol_locks.get((kind, symbol))
+            if lock is None:
+                lock = self.symbol_locks[(kind, symbol)] = threading.Lock()
+            return lock
+
+    def _count(self, name):
+        with self.cache_lock:
+            self.stats[name] += 1
+
+    def _get(self, cache, key, symbol, load):
+        with self.cache_lock:
+            self.stats['requests'] += 1
+            try:
+                value = cache[key]
+                self.stats['cache_hits'] += 1
+                return value
+            except KeyError:
+                pass
+
+        def fetch():
+            with self._symbol_lock(key[0], symbol):
+                # Yêu cầu trước có thể vừa ghi cache trong lúc chờ khóa
+                with self.cache_lock:
+                    if key in cache:
+                        return cache[key]
+                self._count('upstream_calls')
+                self.limiter.acquire()
+                try:
+                    value = load()
+                except Exception:
+                    self._count('errors')
+                    raise
+                # Lỗi không được cache để lần sau thử lại
+                with self.cache_lock:
+                    cache[key] = value
+                return value
+
+        value, shared = self.flight.do(key, fetch)
+        if shared:
+            self._count('coalesced')
+        return value
+
+    def quote_history(self, symbol: str, days_back: int = 180, interval: str = '1D'):
+        symbol = symbol.upper()
+        return self._get(self.quotes, ('quote', symbol, days_back, interval), symbol,
+                         lambda: self.history(symbol, days_back, interval))
+
+    def company_profile(self, symbol: str):
+        symbol = symbol.upper()
+        return self._get(self.profiles, ('profile', symbol), symbol, lambda: self.profile(symbol))
+
+    def snapshot(self):
+        with self.cache_lock:
+            return {**self.stats, 'cached_quotes': len(self.quotes), 'cached_profiles': len(self.profiles)}
+
+
+_default_service = None
+_default_lock = threading.Lock()
+
+
+def get_data_service():
+    global _default_service
+    with _default_lock:
+        if _default_service is None:
+            _default_service = DataService()
+    return _default_service
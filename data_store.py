@@ -0,0 +1,202 @@
+import os
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from metrics import timer
+from sources import NoData, get_router
+
+# Thư mục lưu dữ liệu giá (Parquet), có thể đổi bằng biến môi trường
+STORE_DIR = os.environ.get('PTCK_DATA_DIR', 'data')
+
+# Khóa metadata ghi lại ngày bắt đầu đã tải, tránh tải lại phần đầu khi mã mới niêm yết
+_META_FROM = b'ptck_fetched_from'
+
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+# Tên cột thời gian của các nguồn (VCI/TCBS/MSN) có thể khác nhau
+_TIME_COLUMNS = ('time', 'date', 'tradingdate', 'trading_date', 'datetime')
+# Múi giờ của dữ liệu nếu nguồn trả về thời gian có múi giờ; lưu trữ dùng giờ địa phương không múi giờ
+MARKET_TZ = 'Asia/Ho_Chi_Minh'
+
+
+def normalize_history(df):
+    # Chuẩn hóa kết quả quote.history của mọi nguồn về một dạng: index 'time' (không múi giờ),
+    # các cột open/high/low/close (float) và volume (int), sắp xếp, bỏ trùng
+    if df is None or df.empty:
+        return None
+    df = df.rename(columns=lambda c: str(c).strip().lower())
+    column = next((c for c in _TIME_COLUMNS if c in df.columns), None)
+    if column is not None:
+        df = df.set_index(column)
+    index = pd.to_datetime(df.index)
+    if index.tz is not None:
+        index = index.tz_convert(MARKET_TZ).tz_localize(None)
+    df = df[[c for c in PRICE_COLUMNS + ['volume'] if c in df.columns]].copy()
+    df.index = index.rename('time')
+    for c in PRICE_COLUMNS:
+        if c in df:
+            df[c] = pd.to_numeric(df[c], errors='coerce').astype('float64')
+    if 'volume' in df:
+        df['volume'] = pd.to_numeric(df['volume'], errors='coerce').fillna(0).astype('int64')
+    df = df[~df.index.duplicated(keep='last')].sort_index()
+    return df
+
+
+_vnstock_client = None
+_vnstock_lock = threading.Lock()
+
+
+def get_vnstock():
+    # Một client Vnstock dùng chung cho cả tiến trình; vnstock (kéo theo vnai và các phụ thuộc)
+    # chỉ được import ở lần gọi đầu tiên nên khởi động không phải chờ khi dữ liệu đã có trong kho
+    global _vnstock_client
+    with _vnstock_lock:
+        if _vnstock_client is None:
+            from vnstock import Vnstock
+            _vnstock_client = Vnstock()
+    return _vnstock_client
+
+
+def _fetch_quote_from(source, symbol, start, end, interval):
+    with timer('vnstock_quote', symbol=symbol, source=source) as span:
+        stock_instance = get_vnstock().stock(symbol=symbol, source=source)
+        df = stock_instance.quote.history(start=start, end=end, interval=interval)
+        if df is not None:
+            # Vnstock không cho biết số byte qua mạng: dùng dung lượng DataFrame nhận về
+            span['rows'] = len(df)
+            span['bytes_in'] = int(df.memory_usage(index=True, deep=True).sum())
+    return normalize_history(df)
+
+
+def fetch_quote_history(symbol: str, start: str, end: str, interval: str = '1D', source: str = None):
+    # source=None: bộ chọn nguồn (sources.py) chọn nguồn nhanh và khỏe nhất, gửi dự phòng khi chậm,
+    # chuyển nguồn khi lỗi; kết quả từ mọi nguồn đều qua normalize_history
+    if source is not None:
+        return _fetch_quote_from(source, symbol, start, end, interval)
+
+    def fetch(src):
+        df = _fetch_quote_from(src, symbol, start, end, interval)
+        if df is None:
+            # Nguồn trả lời nhưng không có nến nào: báo rõ cho bộ chọn nguồn đây không phải lỗi của nguồn
+            raise NoData(f"{src}: không có dữ liệu {symbol} từ {start} tới {end}")
+        return df
+
+    try:
+        df, _ = get_router().call('quote', fetch)
+    except NoData:
+        return None
+    return df
+
+
+def _day(ts):
+    return pd.Timestamp(ts).normalize()
+
+
+class OHLCVStore:
+    # Kho dữ liệu OHLCV trên đĩa: mỗi (interval, symbol) là một file Parquet.
+    # Lần chạy đầu tải toàn bộ, các lần sau chỉ tải phần còn thiếu rồi gộp lại.
+
+    def __init__(self, root: str = STORE_DIR, fetch=fetch_quote_history):
+        self.root = root
+        self.fetch = fetch
+
+    def path(self, symbol: str, interval: str = '1D'):
+        return os.path.join(self.root, interval, f"{symbol.upper()}.parquet")
+
+    def load(self, symbol: str, interval: str = '1D'):
+        df, _ = self._read(symbol, interval)
+        return df
+
+    def _read(self, symbol, interval):
+        path = self.path(symbol, interval)
+        if not os.path.exists(path):
+            return None, None
+        table = pq.read_table(path)
+        meta = table.schema.metadata or {}
+        fetched_from = meta.get(_META_FROM)
+        df = table.to_pandas()
+        return df, (pd.Timestamp(fetched_from.decode()) if fetched_from else None)
+
+    def save(self, symbol: str, df, interval: str = '1D', fetched_from=None):
+        path = self.path(symbol, interval)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = pa.Table.from_pandas(df)
+        meta = dict(table.schema.metadata or {})
+        if fetched_from is not None:
+            meta[_META_FROM] = _day(fetched_from).strftime('%Y-%m-%d').encode()
+        table = table.replace_schema_metadata(meta)
+        # Ghi ra file tạm rồi đổi tên để không làm hỏng dữ liệu cũ nếu bị ngắt giữa chừng;
+        # tên tạm riêng cho mỗi tiến trình/luồng vì dashboard và batch_run có thể ghi cùng mã một lúc
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+
+    def merge(self, symbol: str, new_df, interval: str = '1D', fetched_from=None):
+        old_df, old_from = self._read(symbol, interval)
+        frames = [f for f in (old_df, new_df) if f is not None and not f.empty]
+        if not frames:
+            return None
+        df = pd.concat(frames) if len(frames) > 1 else frames[0]
+        # Giữ bản ghi mới nhất khi trùng ngày (nến cuối có thể chưa chốt phiên)
+        df = df[~df.index.duplicated(keep='last')].sort_index()
+        if old_from is not None and fetched_from is not None:
+            fetched_from = min(_day(old_from), _day(fetched_from))
+        else:
+            fetched_from = fetched_from or old_from
+        self.save(symbol, df, interval, fetched_from=fetched_from)
+        return df
+
+    def history(self, symbol: str, start, end, interval: str = '1D'):
+        start, end = _day(start), _day(end)
+        df, fetched_from = self._read(symbol, interval)
+
+        if df is None or df.empty:
+            # Khởi động lạnh: tải toàn bộ khoảng thời gian như trước đây
+            new_df = self.fetch(symbol, start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'), interval)
+            df = self.merge(symbol, new_df, interval, fetched_from=start)
+        else:
+            covered_from = fetched_from if fetched_from is not None else _day(df.index.min())
+            if start < covered_from:
+                # Người dùng yêu cầu xa hơn dữ liệu đã lưu: tải bổ sung phần đầu
+                head_end = covered_from - timedelta(days=1)
+                head = self.fetch(symbol, start.strftime('%Y-%m-%d'), head_end.strftime('%Y-%m-%d'), interval)
+                df = self.merge(symbol, head, interval, fetched_from=start)
+
+            # Tải lại từ ngày của nến cuối cùng để cập nhật nến chưa chốt và các phiên mới
+            last_day = _day(df.index.max())
+            if last_day <= end:
+                try:
+                    tail = self.fetch(symbol, last_day.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'), interval)
+                except Exception as e:
+                    # Mất mạng hoặc nguồn lỗi: dùng tạm dữ liệu đã lưu, lần sau sẽ tải bổ sung lại
+                    print(f"Lỗi cập nhật dữ liệu mới {symbol}, dùng dữ liệu đã lưu tới {last_day:%d/%m/%Y}: {e}")
+                    tail = None
+                if tail is not None and not tail.empty:
+                    df = self.merge(symbol, tail, interval)
+
+        if df is None or df.empty:
+            return None
+        mask = (df.index >= start) & (df.index < end + timedelta(days=1))
+        return df.loc[mask].copy()
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_store():
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = OHLCVStore()
+    return _default_store
+
+
+def get_stock_history(symbol: str, days_back: int = 180, interval: str = '1D', store=None):
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=days_back)
+    return (store or get_store()).history(symbol, start_date, end_date, interval=interval)
@@ -0,0 +1,43 @@
+from collections import OrderedDict
+
+# Số biểu đồ (canvas) tối đa được giữ sống cùng lúc trong giao diện
+MAX_LIVE_CANVASES = 5
+
+
+class LRUPool:
+    # Giữ tối đa `capacity` đối tượng; khi vượt thì gọi on_evict cho đối tượng lâu không dùng nhất.
+    # Dùng để giới hạn số FigureCanvasTkAgg/figure còn sống trong giao diện Tk.
+
+    def __init__(self, capacity: int = MAX_LIVE_CANVASES, on_evict=None):
+        self.capacity = max(1, capacity)
+        self.on_evict = on_evict
+        self.items = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, key):
+        item = self.items.get(key)
+        if item is not None:
+            self.items.move_to_end(key)
+        return item
+
+    def put(self, key, item):
+        self.items[key] = item
+        self.items.move_to_end(key)
+        while len(self.items) > self.capacity:
+            old_key, old_item = self.items.popitem(last=False)
+            if self.on_evict is not None:
+                self.on_evict(old_key, old_item)
+
+    def discard(self, key):
+        item = self.items.pop(key, None)
+        if item is not None and self.on_evict is not None:
+            self.on_evict(key, item)
+
+    def clear(self):
+        for key in list(self.items):
+            self.discard(key)
@@ -0,0 +1,164 @@
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from data_store import STORE_DIR, get_vnstock
+from sources import get_router
+
+# Bốn báo cáo dùng trong báo cáo tài chính
+STATEMENTS = ('balance_sheet', 'income_statement', 'cash_flow', 'ratio')
+
+# Hạn công bố sau ngày kết thúc kỳ: BCTC năm kiểm toán 90 ngày, BCTC quý 45 ngày
+REPORT_DEADLINE_DAYS = {'year': 90, 'quarter': 45}
+# Trong mùa công bố, dữ liệu lưu quá số ngày này sẽ được tải lại
+SEASON_REFRESH_DAYS = 7
+
+_META_FETCHED_AT = b'ptck_fetched_at'
+
+
+def fetch_statements(symbol: str, period: str = 'year', lang: str = 'vi', source: str = None):
+    # Tải song song bốn báo cáo của một mã. Chỉ có nguồn dữ liệu từ VCI, TCBS, MSN được hỗ trợ;
+    # source=None: chọn nguồn qua bộ chọn nguồn (ngắt mạch, chuyển nguồn) trong SOURCES['finance']
+    if source is None:
+        statements, _ = get_router().call('finance', lambda src: fetch_statements(symbol, period, lang, src))
+        return statements
+    finance = get_vnstock().stock(symbol=symbol, source=source).finance
+    calls = {
+        'balance_sheet': lambda: finance.balance_sheet(period=period, lang=lang, dropna=True),
+        'income_statement': lambda: finance.income_statement(period=period, lang=lang, dropna=True),
+        'cash_flow': lambda: finance.cash_flow(period=period, dropna=True),
+        'ratio': lambda: finance.ratio(period=period, lang=lang, dropna=True),
+    }
+    with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+        futures = {name: pool.submit(contextvars.copy_context().run, call) for name, call in calls.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def _period_ends(period, today):
+    # Các ngày kết thúc kỳ báo cáo gần nhất (mới nhất trước)
+    if period == 'year':
+        return [date(today.year - k, 12, 31) for k in range(0, 3)]
+    ends = []
+    for year in (today.year, today.year - 1, today.year - 2):
+        for month, day in ((12, 31), (9, 30), (6, 30), (3, 31)):
+            ends.append(date(year, month, day))
+    return ends
+
+
+def is_fresh(fetched_at, period: str = 'year', now=None):
+    # Dữ liệu còn dùng được nếu đã tải sau hạn công bố của kỳ gần nhất;
+    # trong mùa công bố (từ cuối kỳ tới hạn nộp) thì tải lại mỗi SEASON_REFRESH_DAYS ngày.
+    if fetched_at is None:
+        return False
+    now = now or datetime.now()
+    today = now.date()
+    deadline_days = REPORT_DEADLINE_DAYS.get(period, REPORT_DEADLINE_DAYS['quarter'])
+    for end in _period_ends(period, today):
+        if end > today:
+            continue
+        deadline = end + timedelta(days=deadline_days)
+        if today <= deadline:
+            # Đang trong mùa công bố của kỳ này
+            return now - fetched_at < timedelta(days=SEASON_REFRESH_DAYS) and fetched_at.date() > end
+        return fetched_at.date() > deadline
+    return False
+
+
+def _to_table(df):
+    try:
+        return pa.Table.from_pandas(df)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Cột kiểu object lẫn số và chữ: lưu dưới dạng chuỗi
+        df = df.copy()
+        for i, dtype in enumerate(df.dtypes):
+            if dtype == object:
+                df.isetitem(i, df.iloc[:, i].astype('string'))
+        return pa.Table.from_pandas(df)
+
+
+class FundamentalsStore:
+    # Lưu báo cáo tài chính dạng Parquet theo mã/kỳ/ngôn ngữ; chỉ tải lại khi sang kỳ công bố mới
+
+    def __init__(self, root: str = os.path.join(STORE_DIR, 'fundamentals'), fetch=fetch_statements):
+        self.root = root
+        self.fetch = fetch
+
+    def path(self, symbol: str, period: str, lang: str, statement: str):
+        return os.path.join(self.root, period, lang, symbol.upper(), f"{statement}.parquet")
+
+    def _read(self, symbol, period, lang):
+        frames, fetched_at = {}, None
+        for statement in STATEMENTS:
+            path = self.path(symbol, period, lang, statement)
+            if not os.path.exists(path):
+                return None, None
+            table = pq.read_table(path)
+            meta = table.schema.metadata or {}
+            stamp = meta.get(_META_FETCHED_AT)
+            stamp = datetime.fromisoformat(stamp.decode()) if stamp else None
+            fetched_at = stamp if fetched_at is None or (stamp and stamp < fetched_at) else fetched_at
+            frames[statement] = table.to_pandas()
+        return frames, fetched_at
+
+    def _write(self, symbol, period, lang, frames, fetched_at):
+        for statement, df in frames.items():
+            if df is None:
+                df = pd.DataFrame()
+            path = self.path(symbol, period, lang, statement)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            table = _to_table(df)
+            meta = dict(table.schema.metadata or {})
+            meta[_META_FETCHED_AT] = fetched_at.isoformat().encode()
+            tmp_path = path + '.tmp'
+            pq.write_table(table.replace_schema_metadata(meta), tmp_path)
+            os.replace(tmp_path, path)
+
+    def get(self, symbol: str, period: str = 'year', lang: str = 'vi', refresh: bool = False, now=None):
+        now = now or datetime.now()
+        frames, fetched_at = self._read(symbol, period, lang)
+        if frames is not None and not refresh and is_fresh(fetched_at, period, now):
+            return frames
+        try:
+            fresh = self.fetch(symbol, period=period, lang=lang)
+        except Exception:
+            # Mất mạng hoặc nguồn lỗi: dùng tạm dữ liệu cũ nếu có
+            if frames is not None:
+                return frames
+            raise
+        self._write(symbol, period, lang, fresh, now)
+        return fresh
+
+    def prefetch(self, symbols, period: str = 'year', lang: str = 'vi', max_workers: int = 4):
+        # Nạp sẵn kho cho nhiều mã; trả về lỗi theo mã
+        errors = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {symbol: pool.submit(contextvars.copy_context().run, self.get, symbol, period, lang)
+                       for symbol in symbols}
+            for symbol, future in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    errors[symbol] = e
+        return errors
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_fundamentals_store():
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = FundamentalsStore()
+    return _default_store
+
+
+def get_financial_statements(symbol: str, period: str = 'year', lang: str = 'vi'):
+    return get_fundamentals_store().get(symbol, period=period, lang=lang)
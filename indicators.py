@@ -0,0 +1,246 @@
+import numpy as np
+
+from metrics import timer
+
+# Cấu hình chỉ báo giống với add_technical_indicators dùng thư viện ta
+MA_WINDOWS = (5, 10, 50)
+BB_WINDOW = 20
+BB_DEV = 2
+RSI_WINDOW = 14
+
+INDICATOR_COLUMNS = ('MA5', 'MA10', 'MA50', 'BB_Middle', 'BB_Upper', 'BB_Lower', 'RSI')
+
+# Độ dài khối khi giải hệ thức truy hồi Wilder; b**-(BLOCK-1) phải nhỏ để giữ độ chính xác
+_BLOCK = 64
+
+
+def _rolling_sum(csum, count, window):
+    # Tổng trượt từ mảng tổng tích lũy (đã chèn 0 ở đầu); NaN khi cửa sổ còn thiếu dữ liệu.
+    # count=None nghĩa là không có NaN trong dữ liệu.
+    out = np.empty((csum.shape[0], csum.shape[1] - 1))
+    out[:, :window - 1] = np.nan
+    total = np.subtract(csum[:, window:], csum[:, :-window], out=out[:, window - 1:])
+    if count is not None:
+        filled = count[:, window:] - count[:, :-window]
+        total[filled != window] = np.nan
+    return out
+
+
+def _linear_recurrence(c, coef, init):
+    # y[t] = coef * y[t-1] + c[t] theo trục cuối, với y[-1] = init.
+    # Giải theo khối: trong khối dùng cumsum có trọng số, giữa các khối chỉ truyền giá trị cuối.
+    rows, n = c.shape
+    pad = (-n) % _BLOCK
+    blocks = np.pad(c, ((0, 0), (0, pad))).reshape(rows, -1, _BLOCK)
+    j = np.arange(_BLOCK)
+    powers = coef ** j
+    local = powers * np.cumsum(blocks / powers, axis=-1)
+
+    carry_coef = coef ** _BLOCK
+    ends = local[:, :, -1]
+    prev = np.empty_like(ends)
+    if rows == 1:
+        # Một dòng: vòng lặp trên số thực Python nhanh hơn nhiều so với mảng 1 phần tử
+        carry = float(init[0])
+        carries = []
+        for end in ends[0].tolist():
+            carries.append(carry)
+            carry = carry_coef * carry + end
+        prev[0] = carries
+    else:
+        carry = np.asarray(init, dtype=float)
+        for i in range(ends.shape[1]):
+            prev[:, i] = carry
+            carry = carry_coef * carry + ends[:, i]
+
+    y = local + (coef * powers) * prev[:, :, None]
+    return y.reshape(rows, -1)[:, :n]
+
+
+def _wilder(x, window):
+    # ewm(alpha=1/window, adjust=False): y[0] = x[0], y[t] = (1-a) y[t-1] + a x[t]
+    alpha = 1.0 / window
+    return _linear_recurrence(alpha * x, 1 - alpha, x[:, 0])
+
+
+def compute_indicators(close):
+    # Tính MA5/MA10/MA50, dải Bollinger và RSI14 trong một lượt.
+    # close: mảng 1 chiều (bars) hoặc 2 chiều (symbols x bars); kết quả cùng kích thước.
+    close = np.asarray(close, dtype=np.float64)
+    squeeze = close.ndim == 1
+    x = np.atleast_2d(close)
+    rows, n = x.shape
+    valid = ~np.isnan(x)
+
+    # Trừ giá trị tham chiếu mỗi dòng để tổng bình phương không mất độ chính xác
+    with np.errstate(invalid='ignore'):
+        ref = np.nanmean(x, axis=1, keepdims=True) if n else np.zeros((rows, 1))
+    ref = np.nan_to_num(ref)
+    centered = np.where(valid, x - ref, 0.0)
+
+    zeros = np.zeros((rows, 1))
+    csum = np.concatenate([zeros, np.cumsum(centered, axis=1)], axis=1)
+    csum_sq = np.concatenate([zeros, np.cumsum(centered * centered, axis=1)], axis=1)
+    count = None if valid.all() else np.concatenate([zeros, np.cumsum(valid, axis=1)], axis=1)
+
+    out = {}
+    for window in MA_WINDOWS:
+        if n >= window:
+            out[f'MA{window}'] = _rolling_sum(csum, count, window) / window + ref
+        else:
+            out[f'MA{window}'] = np.full((rows, n), np.nan)
+
+    if n >= BB_WINDOW:
+        mean = _rolling_sum(csum, count, BB_WINDOW) / BB_WINDOW
+        mean_sq = _rolling_sum(csum_sq, count, BB_WINDOW) / BB_WINDOW
+        # ta dùng độ lệch chuẩn tổng thể (ddof=0)
+        std = np.sqrt(np.maximum(mean_sq - mean * mean, 0.0))
+        middle = mean + ref
+    else:
+        middle = std = np.full((rows, n), np.nan)
+    out['BB_Middle'] = middle
+    out['BB_Upper'] = middle + BB_DEV * std
+    out['BB_Lower'] = middle - BB_DEV * std
+
+    if n:
+        diff = np.zeros_like(x)
+        diff[:, 1:] = x[:, 1:] - x[:, :-1]
+        diff = np.nan_to_num(diff, nan=0.0)
+        avg_gain = _wilder(np.where(diff > 0, diff, 0.0), RSI_WINDOW)
+        avg_loss = _wilder(np.where(diff < 0, -diff, 0.0), RSI_WINDOW)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = np.where(avg_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + avg_gain / avg_loss))
+        # Chỉ có giá trị sau đủ RSI_WINDOW phiên kể từ phiên có dữ liệu đầu tiên của mỗi dòng
+        first = np.where(valid.any(axis=1), valid.argmax(axis=1), n)
+        warmup = np.arange(n) < (first + RSI_WINDOW - 1)[:, None]
+        rsi[warmup | ~valid] = np.nan
+    else:
+        rsi = np.full((rows, n), np.nan)
+    out['RSI'] = rsi
+
+    if squeeze:
+        out = {name: values[0] for name, values in out.items()}
+    return out
+
+
+def add_technical_indicators(df):
+    # Tính tất cả chỉ báo bằng compute_indicators rồi gán vào DataFrame một lần
+    with timer('indicators', rows=len(df)):
+        values = compute_indicators(df['close'].to_numpy(dtype=np.float64))
+        return df.assign(**values)
+
+
+class IncrementalIndicators:
+    # Trạng thái chỉ báo cập nhật O(1) cho mỗi nến mới: tổng trượt, tổng bình phương
+    # trượt và trung bình Wilder của lãi/lỗ, thay vì tính lại toàn bộ lịch sử.
+
+    # Sau mỗi RESYNC_EVERY lần cập nhật thì tính lại các tổng từ bộ đệm để sai số không tích lũy
+    RESYNC_EVERY = 1024
+
+    def __init__(self, closes=()):
+        closes = np.asarray(closes, dtype=np.float64)
+        self.size = max(MA_WINDOWS + (BB_WINDOW,))
+        self.count = len(closes)
+        # Giá tham chiếu để tổng bình phương không mất độ chính xác
+        self.ref = float(closes[-1]) if self.count else 0.0
+        tail = (closes[-self.size:] - self.ref).tolist()
+        self.buffer = [0.0] * (self.size - len(tail)) + tail
+        self.pos = 0
+        self.updates = 0
+        self._undo = None
+        self._resync()
+
+        if self.count:
+            diff = np.zeros(self.count)
+            diff[1:] = np.diff(closes)
+            self.avg_gain = float(_wilder(np.where(diff > 0, diff, 0.0)[None, :], RSI_WINDOW)[0, -1])
+            self.avg_loss = float(_wilder(np.where(diff < 0, -diff, 0.0)[None, :], RSI_WINDOW)[0, -1])
+            self.last_close = float(closes[-1])
+        else:
+            self.avg_gain = self.avg_loss = 0.0
+            self.last_close = None
+
+    @classmethod
+    def from_frame(cls, df):
+        # Nến cuối của df có thể chưa chốt: nạp nó bằng update để lần sửa đầu tiên (replace_last) hoàn tác được
+        closes = df['close'].to_numpy(dtype=np.float64)
+        if not len(closes):
+            return cls(closes)
+        state = cls(closes[:-1])
+        state.update(closes[-1])
+        return state
+
+    def _snapshot(self):
+        # Trạng thái trước lần cập nhật gần nhất, đủ để hoàn tác khi nến cuối thay đổi
+        return (dict(self.sums), self.sum_sq, self.pos, self.buffer[self.pos], self.count,
+                self.avg_gain, self.avg_loss, self.last_close, self.updates)
+
+    def _restore(self, state):
+        sums, self.sum_sq, self.pos, old, self.count, self.avg_gain, self.avg_loss, \
+            self.last_close, self.updates = state
+        self.sums = dict(sums)
+        self.buffer[self.pos] = old
+
+    def _recent(self, window):
+        # window giá trị gần nhất trong bộ đệm vòng (self.pos trỏ tới phần tử cũ nhất)
+        return [self.buffer[(self.pos - k) % self.size] for k in range(1, window + 1)]
+
+    def _resync(self):
+        self.sums = {w: sum(self._recent(w)) for w in set(MA_WINDOWS + (BB_WINDOW,))}
+        self.sum_sq = sum(v * v for v in self._recent(BB_WINDOW))
+
+    def update(self, bar, replace_last: bool = False):
+        # bar: giá đóng cửa hoặc một dict/Series có khóa 'close'.
+        # replace_last=True: nến cuối chưa chốt thay đổi giá, tính lại thay vì thêm nến mới.
+        close = float(bar['close'] if not np.isscalar(bar) else bar)
+        if replace_last and self._undo is not None:
+            self._restore(self._undo)
+        self._undo = self._snapshot()
+        value = close - self.ref
+
+        for w in self.sums:
+            self.sums[w] += value - self.buffer[(self.pos - w) % self.size]
+        old = self.buffer[(self.pos - BB_WINDOW) % self.size]
+        self.sum_sq += value * value - old * old
+        self.buffer[self.pos] = value
+        self.pos = (self.pos + 1) % self.size
+        self.count += 1
+
+        alpha = 1.0 / RSI_WINDOW
+        if self.last_close is None:
+            gain = loss = 0.0
+        else:
+            gain = max(close - self.last_close, 0.0)
+            loss = max(self.last_close - close, 0.0)
+        if self.count == 1:
+            self.avg_gain, self.avg_loss = gain, loss
+        else:
+            self.avg_gain = (1 - alpha) * self.avg_gain + alpha * gain
+            self.avg_loss = (1 - alpha) * self.avg_loss + alpha * loss
+        self.last_close = close
+
+        self.updates += 1
+        if self.updates % self.RESYNC_EVERY == 0:
+            self._resync()
+        return self.values()
+
+    def values(self):
+        out = {}
+        for window in MA_WINDOWS:
+            out[f'MA{window}'] = self.sums[window] / window + self.ref if self.count >= window else np.nan
+        if self.count >= BB_WINDOW:
+            mean = self.sums[BB_WINDOW] / BB_WINDOW
+            std = np.sqrt(max(self.sum_sq / BB_WINDOW - mean * mean, 0.0))
+            middle = mean + self.ref
+            out['BB_Middle'] = middle
+            out['BB_Upper'] = middle + BB_DEV * std
+            out['BB_Lower'] = middle - BB_DEV * std
+        else:
+            out['BB_Middle'] = out['BB_Upper'] = out['BB_Lower'] = np.nan
+        if self.count < RSI_WINDOW:
+            out['RSI'] = np.nan
+        elif self.avg_loss == 0:
+            out['RSI'] = 100.0
+        else:
+            out['RSI'] = 100.0 - 100.0 / (1.0 + self.avg_gain / self.avg_loss)
+        return out
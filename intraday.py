@@ -0,0 +1,304 @@
+import os
+import re
+import time
+from collections import namedtuple
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from data_store import STORE_DIR, get_vnstock
+from indicators import compute_indicators
+
+# Khung thời gian tổng hợp mặc định và số nến giữ lại cho mỗi (mã, khung)
+INTERVALS = ('1m', '5m', '15m')
+RING_CAPACITY = 1024
+TICK_DIR = os.path.join(STORE_DIR, 'ticks')
+
+BAR_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+_OPEN, _HIGH, _LOW, _CLOSE, _VOLUME = range(len(BAR_FIELDS))
+_UNITS = {'m': 60, 'h': 3600}
+
+# Sự kiện từ nguồn dữ liệu: lệnh khớp hoặc nến 1 phút đã chốt
+Tick = namedtuple('Tick', 'symbol time price volume')
+Bar = namedtuple('Bar', 'symbol time open high low close volume')
+
+
+def interval_ns(interval: str):
+    # '1m', '5m', '15m', '1H'... → độ dài khung tính bằng nano giây
+    match = re.fullmatch(r'(\d+)([mMhH])', interval)
+    if not match:
+        raise ValueError(f"Khung thời gian không hợp lệ: {interval}")
+    return int(match.group(1)) * _UNITS[match.group(2).lower()] * 1_000_000_000
+
+
+def _to_ns(when):
+    if isinstance(when, (int, np.integer)):
+        return int(when)
+    return pd.Timestamp(when).value
+
+
+class BarRing:
+    # Bộ đệm vòng kích thước cố định cho nến của một mã ở một khung thời gian.
+    # Mỗi giá trị được ghi hai lần (vị trí i và i + capacity) nên `capacity` nến gần nhất luôn
+    # nằm liền nhau trong bộ nhớ: view() trả về mảng NumPy trỏ thẳng vào bộ đệm, không sao chép.
+    # View là dữ liệu sống: nến mới sẽ ghi đè lên nó, cần giữ lâu thì .copy().
+
+    def __init__(self, capacity: int = RING_CAPACITY):
+        self.capacity = capacity
+        self.times = np.zeros(2 * capacity, dtype='datetime64[ns]')
+        self.values = np.zeros((len(BAR_FIELDS), 2 * capacity))
+        self._ns = self.times.view(np.int64)
+        self.head = 0
+        self.count = 0
+        self.last_time = None
+        # Thời điểm dữ liệu mới nhất đã gộp vào nến cuối (để lệnh đến trễ không ghi đè giá đóng cửa)
+        self.last_tick = None
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def _span(self):
+        end = self.head + self.capacity
+        return end - len(self), end
+
+    def _write(self, slot, row):
+        self.values[:, slot] = row
+        self.values[:, slot + self.capacity] = row
+
+    def append(self, when: int, open_, high, low, close, volume, tick: int = None):
+        slot = self.head
+        self._ns[slot] = self._ns[slot + self.capacity] = when
+        self._write(slot, (open_, high, low, close, volume))
+        self.head = (slot + 1) % self.capacity
+        self.count += 1
+        self.last_time = when
+        self.last_tick = when if tick is None else tick
+
+    def merge(self, when: int, high, low, close, volume, tick: int = None):
+        # Gộp vào nến có thời điểm `when`; trả về False nếu nến đó đã bị đẩy ra khỏi bộ đệm.
+        # tick: thời điểm của dữ liệu gộp vào; cũ hơn dữ liệu mới nhất của nến thì giữ nguyên giá đóng cửa
+        if when == self.last_time:
+            slot = (self.head - 1) % self.capacity
+            if tick is not None:
+                if tick < self.last_tick:
+                    close = self.values[_CLOSE, slot]
+                else:
+                    self.last_tick = tick
+        else:
+            start, end = self._span()
+            pos = start + int(np.searchsorted(self._ns[start:end], when))
+            if pos == end or self._ns[pos] != when:
+                return False
+            slot = pos % self.capacity
+            close = self.values[_CLOSE, slot]
+        row = self.values[:, slot]
+        self._write(slot, (row[_OPEN], max(row[_HIGH], high), min(row[_LOW], low), close, row[_VOLUME] + volume))
+        return True
+
+    def view(self, field: str):
+        start, end = self._span()
+        if field == 'time':
+            return self.times[start:end]
+        return self.values[BAR_FIELDS.index(field), start:end]
+
+    def last(self):
+        # Nến cuối dạng dict, dùng được cho LiveChart.update và AlertEngine
+        slot = (self.head - 1) % self.capacity
+        bar = dict(zip(BAR_FIELDS, self.values[:, slot].tolist()))
+        bar['time'] = self.times[slot]
+        return bar
+
+    def to_frame(self):
+        # Bản sao dạng DataFrame cho các hàm vẽ/báo cáo hiện có
+        return pd.DataFrame({field: self.view(field).copy() for field in BAR_FIELDS},
+                            index=pd.DatetimeIndex(self.view('time').copy(), name='time'))
+
+    @property
+    def nbytes(self):
+        return self.times.nbytes + self.values.nbytes
+
+
+class IntradayAggregator:
+    # Gom lệnh khớp (hoặc nến 1 phút) từ một nguồn bất kỳ thành nến ở nhiều khung cùng lúc.
+    # Mỗi (mã, khung) một BarRing kích thước cố định nên bộ nhớ không tăng theo thời gian.
+
+    def __init__(self, intervals=INTERVALS, capacity: int = RING_CAPACITY):
+        self.intervals = tuple(intervals)
+        self.steps = [interval_ns(i) for i in self.intervals]
+        self.capacity = capacity
+        self.rings = {}
+        self.listeners = []
+        self.stats = {'ticks': 0, 'bars': 0, 'late': 0, 'dropped': 0}
+
+    def subscribe(self, callback):
+        # callback(symbol, interval, ring, appended) sau mỗi lần nến thay đổi
+        self.listeners.append(callback)
+
+    def _rings(self, symbol):
+        rings = self.rings.get(symbol)
+        if rings is None:
+            rings = self.rings[symbol] = [BarRing(self.capacity) for _ in self.intervals]
+        return rings
+
+    def _add(self, symbol, when, open_, high, low, close, volume):
+        for interval, step, ring in zip(self.intervals, self.steps, self._rings(symbol)):
+            bucket = when - when % step
+            last = ring.last_time
+            if last is None or bucket > last:
+                ring.append(bucket, open_, high, low, close, volume, when)
+                appended = True
+            elif ring.merge(bucket, high, low, close, volume, when):
+                appended = False
+                if bucket != last:
+                    # Dữ liệu đến trễ: cập nhật nến cũ, giữ nguyên giá đóng cửa
+                    self.stats['late'] += 1
+                    continue
+            else:
+                self.stats['dropped'] += 1
+                continue
+            for callback in self.listeners:
+                callback(symbol, interval, ring, appended)
+
+    def on_tick(self, symbol: str, when, price: float, volume: float = 0.0):
+        self.stats['ticks'] += 1
+        price = float(price)
+        self._add(symbol, _to_ns(when), price, price, price, price, float(volume))
+
+    def on_bar(self, symbol: str, when, open_, high, low, close, volume=0.0):
+        # Nến 1 phút đã chốt; khung nhỏ hơn 1 phút không có nghĩa với loại dữ liệu này
+        self.stats['bars'] += 1
+        self._add(symbol, _to_ns(when), float(open_), float(high), float(low), float(close), float(volume))
+
+    def consume(self, feed):
+        # feed: iterable các Tick/Bar (ReplayFeed, PollingFeed hoặc nguồn tự viết)
+        for event in feed:
+            if isinstance(event, Bar):
+                self.on_bar(*event)
+            else:
+                self.on_tick(*event)
+
+    def ring(self, symbol: str, interval: str):
+        return self._rings(symbol)[self.intervals.index(interval)]
+
+    def view(self, symbol: str, interval: str, field: str = 'close'):
+        return self.ring(symbol, interval).view(field)
+
+    def frame(self, symbol: str, interval: str):
+        return self.ring(symbol, interval).to_frame()
+
+    def indicators(self, symbol: str, interval: str):
+        # Tính chỉ báo trực tiếp trên view giá đóng cửa (không sao chép)
+        return compute_indicators(self.view(symbol, interval))
+
+    def nbytes(self):
+        return sum(ring.nbytes for rings in self.rings.values() for ring in rings)
+
+
+def read_ticks(path: str):
+    # File lệnh khớp đã ghi (Parquet hoặc CSV) với các cột symbol, time, price, volume
+    if path.endswith('.csv'):
+        df = pd.read_csv(path, parse_dates=['time'])
+    else:
+        df = pd.read_parquet(path)
+    return df.sort_values('time', kind='stable').reset_index(drop=True)
+
+
+def record_ticks(feed, path: str = None, limit: int = None):
+    # Ghi lại các lệnh khớp từ một nguồn để phát lại sau (mặc định data/ticks/<ngày>.parquet)
+    path = path or os.path.join(TICK_DIR, f"{date.today():%Y%m%d}.parquet")
+    rows = []
+    for event in feed:
+        rows.append(event)
+        if limit and len(rows) >= limit:
+            break
+    df = pd.DataFrame(rows, columns=Tick._fields)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    df.to_parquet(path, index=False)
+    return len(df)
+
+
+class ReplayFeed:
+    # Phát lại lệnh khớp đã ghi. speed=None: nhanh nhất có thể; speed=60: nhanh gấp 60 lần thời gian thực.
+
+    def __init__(self, ticks, speed: float = None, clock=time.monotonic, sleep=time.sleep):
+        self.ticks = read_ticks(ticks) if isinstance(ticks, str) else ticks
+        self.speed = speed
+        self.clock = clock
+        self.sleep = sleep
+
+    def __len__(self):
+        return len(self.ticks)
+
+    def __iter__(self):
+        df = self.ticks
+        symbols = df['symbol'].astype(str).tolist()
+        times = pd.DatetimeIndex(df['time']).asi8
+        prices = df['price'].to_numpy(dtype=np.float64).tolist()
+        volumes = df['volume'].to_numpy(dtype=np.float64).tolist() if 'volume' in df else [0.0] * len(df)
+        if not len(df):
+            return
+        start_wall, start_tick = self.clock(), int(times[0])
+        for symbol, when, price, volume in zip(symbols, times.tolist(), prices, volumes):
+            if self.speed:
+                wait = (when - start_tick) / 1e9 / self.speed - (self.clock() - start_wall)
+                if wait > 0:
+                    self.sleep(wait)
+            yield Tick(symbol, when, price, volume)
+
+
+class PollingFeed:
+    # Nguồn trực tiếp: hỏi định kỳ lệnh khớp trong ngày từ vnstock, chỉ phát các lệnh chưa thấy
+    # (dừng khi stop() được gọi)
+
+    def __init__(self, symbols, every: float = 3.0, page_size: int = 500, source: str = 'VCI'):
+        self.symbols = [s.upper() for s in symbols]
+        self.every = every
+        self.page_size = page_size
+        self.source = source
+        self.seen = {}
+        self.gaps = 0
+        self.running = True
+
+    def stop(self):
+        self.running = False
+
+    def _poll(self, symbol):
+        df = get_vnstock().stock(symbol=symbol, source=self.source).quote.intraday(page_size=self.page_size)
+        if df is None or df.empty:
+            return []
+        df = df.assign(time=pd.to_datetime(df['time'])).sort_values('time', kind='stable').reset_index(drop=True)
+        if 'id' in df:
+            keys = df['id'].astype(str).tolist()
+        else:
+            # Không có mã lệnh: nhiều lệnh cùng giây, cùng giá, cùng khối lượng là chuyện thường,
+            # nên thêm số thứ tự của lệnh trong giây đó
+            seq = df.groupby('time', sort=False).cumcount()
+            keys = list(zip(df['time'], df['price'], df['volume'], seq))
+        seen = self.seen.get(symbol)
+        fresh = np.array([key not in seen for key in keys]) if seen else np.ones(len(df), dtype=bool)
+        if seen and fresh.all():
+            # Trang mới không trùng lệnh nào với lần hỏi trước: các lệnh ở giữa đã bị bỏ lỡ
+            self.gaps += 1
+            print(f"Có thể đã mất lệnh khớp {symbol}: không có lệnh nào trùng với lần hỏi trước "
+                  f"(tăng page_size hoặc giảm every)")
+        elif seen and 'id' not in df and len(df) >= self.page_size:
+            # Trang đầy cắt mất các lệnh đầu của giây cũ nhất nên số thứ tự trong giây đó bị lệch;
+            # các lệnh của giây đó đã có ở lần hỏi trước
+            fresh &= (df['time'] != df['time'].iloc[0]).to_numpy()
+        # Mỗi lần hỏi trả về page_size lệnh gần nhất nên chỉ cần nhớ các lệnh của trang vừa nhận
+        self.seen[symbol] = set(keys)
+        df = df[fresh]
+        return [Tick(symbol, t, p, v) for t, p, v in zip(df['time'], df['price'], df['volume'])]
+
+    def __iter__(self):
+        while self.running:
+            started = time.monotonic()
+            for symbol in self.symbols:
+                try:
+                    ticks = self._poll(symbol)
+                except Exception as e:
+                    print(f"Lỗi lấy lệnh khớp {symbol}: {e}")
+                    continue
+                yield from ticks
+            time.sleep(max(self.every - (time.monotonic() - started), 0))
@@ -0,0 +1,222 @@
+import numpy as np
+import pandas as pd
+from matplotlib import rc_context
+from matplotlib.collections import LineCollection, PolyCollection
+
+from chart_renderer import BODY_WIDTH, LINE_WIDTH, PRICE_LINES, VOLUME_WIDTH, X_PADDING, ChartTemplate
+from indicators import INDICATOR_COLUMNS, IncrementalIndicators, compute_indicators
+from metrics import timer
+
+PRICE_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+# Số nến hiển thị và phần chỗ trống bên phải (tỉ lệ theo số nến) để thêm nến mới mà không phải dời trục
+LIVE_WINDOW = 120
+LIVE_ROOM = 0.2
+# Khoảng trống thêm trên/dưới trục y để giá dao động nhẹ không buộc vẽ lại toàn bộ
+LIVE_HEADROOM = 0.1
+
+
+class LiveChart:
+    # Biểu đồ trực tiếp giữ nguyên trục: nền (các nến đã chốt) được vẽ một lần và lưu lại,
+    # mỗi lần có giá mới chỉ vẽ lại nến cuối, cột khối lượng cuối và đoạn cuối các đường chỉ báo
+    # (blitting). Chỉ vẽ lại toàn bộ khi hết chỗ trống bên phải hoặc giá vượt khỏi trục.
+    # Nhúng vào Tk: FigureCanvasTkAgg(chart.fig, master=...) rồi gọi chart.redraw().
+
+    def __init__(self, df, symbol, window: int = LIVE_WINDOW, template: ChartTemplate = None):
+        if len(df) < 2:
+            raise ValueError(f"Cần ít nhất 2 phiên dữ liệu để vẽ biểu đồ trực tiếp cho {symbol}.")
+        self.symbol = symbol
+        self.template = template or ChartTemplate()
+        self.fig = self.template.fig
+        self.window = min(window, len(df))
+        self.capacity = self.window + max(1, int(self.window * LIVE_ROOM))
+        # Chỉ báo tính trên toàn bộ lịch sử, sau đó cập nhật từng nến
+        self.indicators = IncrementalIndicators.from_frame(df)
+        closes = df['close'].to_numpy(dtype=np.float64)
+        values = {name: df[name].to_numpy(dtype=np.float64) for name in INDICATOR_COLUMNS if name in df}
+        if len(values) < len(INDICATOR_COLUMNS):
+            values = compute_indicators(closes)
+
+        tail = df.iloc[-self.window:]
+        self.n = len(tail)
+        self.times = np.empty(self.capacity, dtype='datetime64[ns]')
+        self.times[:self.n] = tail.index.to_numpy()
+        self.data = {}
+        for name in PRICE_FIELDS:
+            self.data[name] = np.full(self.capacity, np.nan)
+            self.data[name][:self.n] = tail[name].to_numpy(dtype=np.float64)
+        for name in INDICATOR_COLUMNS:
+            self.data[name] = np.full(self.capacity, np.nan)
+            self.data[name][:self.n] = values[name][-self.n:]
+
+        # Artist của phần đuôi: animated nên không nằm trong nền, chỉ vẽ bằng draw_artist
+        t = self.template
+        with rc_context(t.rc):
+            self.tail_wick = LineCollection([], linewidths=1.0, animated=True)
+            self.tail_body = PolyCollection([], linewidths=0.5, animated=True)
+            self.tail_volume = PolyCollection([], linewidths=0.5, animated=True)
+            t.ax_price.add_collection(self.tail_wick)
+            t.ax_price.add_collection(self.tail_body)
+            t.ax_volume.add_collection(self.tail_volume)
+            self.tail_lines = {}
+            for name, kwargs in PRICE_LINES:
+                self.tail_lines[name], = t.ax_price.plot([], [], linewidth=LINE_WIDTH, animated=True, **kwargs)
+            self.tail_lines['RSI'], = t.ax_rsi.plot([], [], color='purple', linewidth=LINE_WIDTH, animated=True)
+        self.tail_artists = [self.tail_wick, self.tail_body, self.tail_volume, *self.tail_lines.values()]
+        self.background = None
+        self.redraws = 0
+        self.redraw()
+
+    @property
+    def canvas(self):
+        # Luôn lấy canvas hiện tại của figure (có thể đã được gắn vào Tk sau khi tạo)
+        return self.fig.canvas
+
+    def frame(self):
+        # Dữ liệu đang hiển thị dưới dạng DataFrame
+        index = pd.DatetimeIndex(self.times[:self.n], name='time')
+        return pd.DataFrame({name: values[:self.n] for name, values in self.data.items()}, index=index)
+
+    def redraw(self):
+        # Vẽ lại toàn bộ: các nến đã chốt vào nền, trục y có thêm khoảng trống, trục x chừa chỗ cho nến mới
+        t = self.template
+        main = self.frame().iloc[:-1]
+        t.update(main, self.symbol)
+        t.dates = self.times[:self.n].copy()
+        pad = max(1.0, self.window * X_PADDING)
+        t.ax_price.set_xlim(-pad, self.capacity - 1 + pad)
+
+        d = {name: values[:self.n] for name, values in self.data.items()}
+        with np.errstate(invalid='ignore'):
+            lines = np.concatenate([d[name] for name, _ in PRICE_LINES])
+            self._set_ylim(t.ax_price, np.nanmin(np.concatenate([d['low'], lines])),
+                           np.nanmax(np.concatenate([d['high'], lines])))
+            self._set_ylim(t.ax_volume, 0, np.nanmax(d['volume']), bottom_pad=False)
+            self._set_ylim(t.ax_rsi, np.nanmin(d['RSI']), np.nanmax(d['RSI']))
+
+        self._set_tail()
+        canvas = self.canvas
+        with rc_context(t.rc):
+            canvas.draw()
+        self.background = canvas.copy_from_bbox(self.fig.bbox) if canvas.supports_blit else None
+        self.redraws += 1
+        self._blit()
+
+    @staticmethod
+    def _set_ylim(ax, low, high, bottom_pad=True):
+        if not np.isfinite(low) or not np.isfinite(high):
+            low, high = 0.0, 1.0
+        span = (high - low) or abs(high) or 1.0
+        margin = (0.05 + LIVE_HEADROOM) * span
+        ax.set_ylim(low - (margin if bottom_pad else 0), high + margin)
+
+    def _set_tail(self):
+        t, d, i = self.template, self.data, self.n - 1
+        o, h, l, c, v = (d[name][i] for name in PRICE_FIELDS)
+        half = BODY_WIDTH / 2
+        left, right = i - half, i + half
+        color = t.up_color if c >= o else t.down_color
+        self.tail_body.set_verts([[(left, o), (left, c), (right, c), (right, o)]])
+        self.tail_body.set_facecolor(color)
+        self.tail_body.set_edgecolor(color)
+        self.tail_wick.set_segments([[(i, l), (i, h)]])
+        self.tail_wick.set_color(color)
+        vol_color = t.vol_up_color if i == 0 or c >= d['close'][i - 1] else t.vol_down_color
+        vol_left, vol_right = i - VOLUME_WIDTH / 2, i + VOLUME_WIDTH / 2
+        self.tail_volume.set_verts([[(vol_left, 0), (vol_left, v), (vol_right, v), (vol_right, 0)]])
+        self.tail_volume.set_facecolor(vol_color)
+        self.tail_volume.set_edgecolor(vol_color)
+        x = (i - 1, i)
+        for name, line in self.tail_lines.items():
+            line.set_data(x, d[name][i - 1:i + 1])
+
+    def _draw_tail(self):
+        for artist in self.tail_artists:
+            self.fig.draw_artist(artist)
+
+    def _blit(self):
+        canvas = self.canvas
+        if self.background is None:
+            # Backend không hỗ trợ blitting: vẽ lại cả figure
+            for artist in self.tail_artists:
+                artist.set_animated(False)
+            canvas.draw_idle()
+            return
+        with rc_context(self.template.rc):
+            canvas.restore_region(self.background)
+            self._draw_tail()
+        canvas.blit(self.fig.bbox)
+
+    def _commit_tail(self):
+        # Nến cuối đã chốt: vẽ nó vào nền đã lưu thay vì vẽ lại toàn bộ
+        if self.background is None:
+            return
+        canvas = self.canvas
+        with rc_context(self.template.rc):
+            canvas.restore_region(self.background)
+            self._draw_tail()
+        self.background = canvas.copy_from_bbox(self.fig.bbox)
+
+    def _out_of_range(self):
+        t, d, i = self.template, self.data, self.n - 1
+        low, high = t.ax_price.get_ylim()
+        prices = [d['low'][i], d['high'][i]] + [d[name][i] for name, _ in PRICE_LINES]
+        if any(p < low or p > high for p in prices if p == p):
+            return True
+        if d['volume'][i] > t.ax_volume.get_ylim()[1]:
+            return True
+        rsi = d['RSI'][i]
+        low, high = t.ax_rsi.get_ylim()
+        return rsi == rsi and not low <= rsi <= high
+
+    def update(self, bar):
+        # bar: dict/Series có time, open, high, low, close, volume.
+        # Cùng thời gian với nến cuối thì cập nhật nến đó, muộn hơn thì thêm nến mới, cũ hơn thì bỏ qua.
+        # Trả về 'tail' (chỉ vẽ lại phần đuôi), 'redraw' (vẽ lại toàn bộ) hoặc None.
+        when = np.datetime64(pd.Timestamp(bar['time']), 'ns')
+        last = self.times[self.n - 1]
+        if when < last:
+            return None
+        with timer('live_chart') as fields:
+            appended = when > last
+            # Không có blitting thì nến vừa chốt phải được vẽ lại cùng các nến cũ
+            full = appended and (self.n == self.capacity or self.background is None)
+            if appended and self.n == self.capacity:
+                # Hết chỗ trống: dời cửa sổ, giữ lại self.window - 1 nến cũ
+                keep = self.window - 1
+                self.times[:keep] = self.times[self.n - keep:self.n]
+                for values in self.data.values():
+                    values[:keep] = values[self.n - keep:self.n]
+                self.n = keep
+            elif appended and not full:
+                self._commit_tail()
+            self.n += appended
+            i = self.n - 1
+            self.times[i] = when
+            for name in PRICE_FIELDS:
+                self.data[name][i] = float(bar[name])
+            values = self.indicators.update(bar, replace_last=not appended)
+            for name, value in values.items():
+                self.data[name][i] = value
+
+            full = full or self._out_of_range()
+            if full:
+                self.redraw()
+            else:
+                self._set_tail()
+                self._blit()
+            fields['mode'] = 'redraw' if full else 'tail'
+        return fields['mode']
+
+
+class LiveBoard:
+    # Bảng nhiều mã trực tiếp: mỗi mã một LiveChart (một figure riêng)
+
+    def __init__(self, frames, window: int = LIVE_WINDOW):
+        self.charts = {symbol: LiveChart(df, symbol, window) for symbol, df in frames.items()}
+
+    def __getitem__(self, symbol):
+        return self.charts[symbol]
+
+    def update(self, symbol, bar):
+        chart = self.charts.get(symbol)
+        return chart.update(bar) if chart is not None else None
@@ -1,93 +1,238 @@
-import pandas as pd
-import mplfinance as mpf
-import matplotlib.pyplot as plt
-import ta
-from datetime import datetime, timedelta
-from vnstock import Vnstock
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from data_store import get_stock_history
+from indicators import add_technical_indicators
+from batch_fetch import fetch_many
+from charts import plot_chart
+from pyramid import chart_title, fit_to_budget
 import tkinter as tk
 from tkinter import ttk
+import queue
+import threading
+from figure_pool import LRUPool, MAX_LIVE_CANVASES
+from parallel_render import frame_to_payload, payload_to_frame
+from metrics import timed
 
-def get_vietnam_stock_data(symbol: str, days_back: int = 180):
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=days_back)
+@timed('create_chart')
+def create_chart(df, symbol):
+    # Dùng chung thiết lập biểu đồ với charts.plot_chart; khoảng dài được vẽ bằng nến tuần/tháng
+    df, level = fit_to_budget(df, symbol)
+    return plot_chart(df, chart_title(symbol, level))
+
+# Chu kỳ (ms) luồng giao diện kiểm tra kết quả tải dữ liệu từ luồng nền
+POLL_INTERVAL_MS = 100
+# Chế độ trực tiếp: khung nến và số ngày nến trong ngày tải làm lịch sử trước khi nhận lệnh khớp
+LIVE_INTERVAL = '1m'
+LIVE_DAYS_BACK = 3
 
-    start_date_str = start_date.strftime('%Y-%m-%d')
-    end_date_str = end_date.strftime('%Y-%m-%d')
+def load_in_background(symbols, results, days_back: int = 180):
+    # Chạy trên luồng nền: lấy dữ liệu và tính chỉ báo, đẩy từng mã xong vào hàng đợi.
+    # Không được đụng tới widget Tk ở đây.
+    def fetch(symbol):
+        df = get_stock_history(symbol, days_back, interval='1D')
+        if df is not None and not df.empty:
+            results.put((symbol, add_technical_indicators(df), None))
+        return df
 
     try:
-        stock_instance = Vnstock().stock(symbol=symbol)
-        df = stock_instance.quote.history(start=start_date_str, end=end_date_str, interval='1D')
+        _, errors = fetch_many(symbols, days_back, fetch=fetch)
+    except Exception as e:
+        errors = {symbol: e for symbol in symbols}
+    for symbol, error in errors.items():
+        results.put((symbol, None, error))
 
-        if df is not None and not df.empty:
-            if 'time' in df.columns:
-                df['time'] = pd.to_datetime(df['time'])
-                df = df.set_index('time')
-            elif 'date' in df.columns:
-                df['date'] = pd.to_datetime(df['date'])
-                df = df.set_index('date')
-            return df
-        else:
-            return None
-    except:
-        return None
-
-def add_technical_indicators(df):
-    df['MA5'] = ta.trend.sma_indicator(df['close'], window=5)
-    df['MA10'] = ta.trend.sma_indicator(df['close'], window=10)
-    df['MA50'] = ta.trend.sma_indicator(df['close'], window=50)
-    bb = ta.volatility.BollingerBands(close=df['close'], window=20, window_dev=2)
-    df['BB_Middle'] = bb.bollinger_mavg()
-    df['BB_Upper'] = bb.bollinger_hband()
-    df['BB_Lower'] = bb.bollinger_lband()
-    df['RSI'] = ta.momentum.RSIIndicator(df['close'], window=14).rsi()
-    return df
+def load_live_history(symbol, results, days_back: int = LIVE_DAYS_BACK):
+    # Chạy trên luồng nền: nến trong ngày gần đây làm lịch sử cho biểu đồ trực tiếp
+    try:
+        df = get_stock_history(symbol, days_back, interval=LIVE_INTERVAL)
+        if df is None or df.empty:
+            raise LookupError(f"Không có nến {LIVE_INTERVAL} cho mã {symbol}.")
+        results.put((symbol, add_technical_indicators(df), None))
+    except Exception as e:
+        results.put((symbol, None, e))
 
-def create_chart(df, symbol):
-    addplots = [
-        mpf.make_addplot(df['MA5'], color='blue'),
-        mpf.make_addplot(df['MA10'], color='orange'),
-        mpf.make_addplot(df['MA50'], color='magenta'),
-        mpf.make_addplot(df['BB_Upper'], color='grey', linestyle='dashed'),
-        mpf.make_addplot(df['BB_Middle'], color='black', linestyle='dotted'),
-        mpf.make_addplot(df['BB_Lower'], color='grey', linestyle='dashed'),
-        mpf.make_addplot(df['RSI'], panel=1, color='purple', ylabel='RSI')
-    ]
-
-    fig, _ = mpf.plot(
-        df,
-        type='candle',
-        style='charles',
-        title=f"Biểu đồ kỹ thuật: {symbol}",
-        volume=True,
-        addplot=addplots,
-        figratio=(16, 9),
-        figscale=1.2,
-        panel_ratios=(6, 2),
-        returnfig=True
-    )
-    return fig
-
-def create_gui(symbols):
+def stream_in_background(feed, updates, interval: str = LIVE_INTERVAL):
+    # Chạy trên luồng nền: gom lệnh khớp của feed thành nến, đẩy nến vừa thay đổi vào hàng đợi
+    # để luồng Tk vẽ. Kết thúc khi feed.stop() được gọi.
+    from intraday import IntradayAggregator
+    aggregator = IntradayAggregator((interval,))
+    aggregator.subscribe(lambda symbol, _, ring, appended: updates.put((feed, symbol, ring.last())))
+    aggregator.consume(feed)
+
+def create_gui(symbols, max_live_canvases: int = MAX_LIVE_CANVASES):
     root = tk.Tk()
     root.title("Biểu đồ cổ phiếu theo tab")
     notebook = ttk.Notebook(root)
+    notebook.pack(fill=tk.BOTH, expand=True)
 
+    # Tạo ngay các tab giữ chỗ để cửa sổ hiện ra không phải chờ dữ liệu
+    symbols = list(dict.fromkeys(symbols))
+    tabs = {}
     for symbol in symbols:
-        df = get_vietnam_stock_data(symbol)
-        if df is None:
-            continue
-        df = add_technical_indicators(df)
-        fig = create_chart(df, symbol)
-
         frame = ttk.Frame(notebook)
+        tab = {'symbol': symbol, 'frame': frame, 'data': None, 'canvas': None,
+               'live': None, 'live_var': tk.BooleanVar(value=False)}
+        # Thanh công cụ nằm trên cùng, trước biểu đồ: bật/tắt cập nhật trực tiếp cho tab này
+        toolbar = ttk.Frame(frame)
+        toolbar.pack(side=tk.TOP, fill=tk.X)
+        ttk.Checkbutton(toolbar, text=f"Trực tiếp (nến {LIVE_INTERVAL})", variable=tab['live_var'],
+                        command=lambda tab=tab: toggle_live(tab)).pack(side=tk.RIGHT)
+        tab['label'] = ttk.Label(frame, text=f"Đang tải dữ liệu {symbol}...")
+        tab['label'].pack(expand=True)
         notebook.add(frame, text=symbol)
+        tabs[str(frame)] = tab
+    tab_by_symbol = {tab['symbol']: tab for tab in tabs.values()}
 
-        canvas = FigureCanvasTkAgg(fig, master=frame)
+    def release_canvas(key, canvas):
+        # Tab bị đẩy ra khỏi pool: hủy canvas, đóng figure, chỉ giữ lại dữ liệu dạng mảng
+        import matplotlib.pyplot as plt
+        tab = tabs[key]
+        canvas.get_tk_widget().destroy()
+        plt.close(canvas.figure)
+        tab['canvas'] = None
+        tab['label'].config(text=f"Đang vẽ lại biểu đồ {tab['symbol']}...")
+        if tab['live'] is None:
+            tab['label'].pack(expand=True)
+
+    # Chỉ giữ tối đa max_live_canvases biểu đồ còn sống, theo thứ tự dùng gần nhất
+    live_canvases = LRUPool(max_live_canvases, on_evict=release_canvas)
+
+    def draw_tab(tab):
+        # Chỉ dựng biểu đồ khi tab được chọn và dữ liệu đã sẵn sàng
+        key = str(tab['frame'])
+        if tab['live'] is not None:
+            # Tab đang ở chế độ trực tiếp: biểu đồ trực tiếp đã hiển thị
+            return
+        if tab['canvas'] is not None:
+            live_canvases.get(key)
+            return
+        if tab['data'] is None:
+            return
+        # matplotlib chỉ được import khi vẽ biểu đồ đầu tiên để cửa sổ hiện ra sớm
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        fig = create_chart(payload_to_frame(tab['data']), tab['symbol'])
+        tab['label'].pack_forget()
+        canvas = FigureCanvasTkAgg(fig, master=tab['frame'])
         canvas.draw()
         canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        tab['canvas'] = canvas
+        live_canvases.put(key, canvas)
 
-    notebook.pack(fill=tk.BOTH, expand=True)
+    def on_tab_changed(event):
+        tab = tabs.get(notebook.select())
+        if tab is not None:
+            draw_tab(tab)
+
+    # Chế độ trực tiếp: mỗi tab bật trực tiếp có một LiveChart trong board; một PollingFeed chung
+    # cho mọi mã đang bật, chạy trên luồng nền qua IntradayAggregator
+    live = {'board': None, 'feed': None}
+    live_results = queue.Queue()
+    live_updates = queue.Queue()
+
+    def restart_feed():
+        # Danh sách mã thay đổi: dừng feed cũ, dựng feed mới cho các mã còn bật
+        from intraday import PollingFeed
+        if live['feed'] is not None:
+            live['feed'].stop()
+            live['feed'] = None
+        live_symbols = list(live['board'].charts) if live['board'] is not None else []
+        if live_symbols:
+            live['feed'] = PollingFeed(live_symbols)
+            threading.Thread(target=stream_in_background, args=(live['feed'], live_updates), daemon=True).start()
+
+    def toggle_live(tab):
+        if tab['live_var'].get():
+            # Biểu đồ tĩnh vẫn hiển thị cho tới khi có nến trong ngày
+            threading.Thread(target=load_live_history, args=(tab['symbol'], live_results), daemon=True).start()
+        else:
+            stop_live(tab)
+
+    def start_live(tab, df):
+        # matplotlib và live_chart chỉ được import khi bật trực tiếp lần đầu
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from live_chart import LiveBoard, LiveChart
+        symbol = tab['symbol']
+        if tab['live'] is not None:
+            return
+        chart = LiveChart(df, f"{symbol} ({LIVE_INTERVAL})")
+        if tab['canvas'] is not None:
+            tab['canvas'].get_tk_widget().pack_forget()
+        tab['label'].pack_forget()
+        canvas = FigureCanvasTkAgg(chart.fig, master=tab['frame'])
+        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        chart.redraw()
+        tab['live'] = canvas
+        if live['board'] is None:
+            live['board'] = LiveBoard({})
+        live['board'].charts[symbol] = chart
+        restart_feed()
+
+    def stop_live(tab):
+        # Quay về biểu đồ tĩnh (vẽ lại nếu canvas tĩnh đã bị đẩy ra khỏi pool)
+        if tab['live'] is None:
+            return
+        live['board'].charts.pop(tab['symbol'], None)
+        restart_feed()
+        tab['live'].get_tk_widget().destroy()
+        tab['live'] = None
+        if tab['canvas'] is not None:
+            tab['canvas'].get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        else:
+            tab['label'].pack(expand=True)
+            draw_tab(tab)
+
+    def poll_live():
+        while True:
+            try:
+                symbol, df, error = live_results.get_nowait()
+            except queue.Empty:
+                break
+            tab = tab_by_symbol[symbol]
+            if not tab['live_var'].get():
+                # Đã tắt trực tiếp trước khi tải xong
+                continue
+            try:
+                if df is None:
+                    raise error
+                start_live(tab, df)
+            except Exception as e:
+                print(f"Không bật được chế độ trực tiếp cho {symbol}: {e}")
+                tab['live_var'].set(False)
+
+        # Gộp các nến cùng (mã, thời điểm) trong một chu kỳ, giữ thứ tự để nến vừa chốt vẫn được vẽ
+        # trạng thái cuối trước khi sang nến mới
+        bars = {}
+        while True:
+            try:
+                feed, symbol, bar = live_updates.get_nowait()
+            except queue.Empty:
+                break
+            if feed is live['feed']:
+                bars[(symbol, bar['time'])] = bar
+        for (symbol, _), bar in bars.items():
+            live['board'].update(symbol, bar)
+
+    results = queue.Queue()
+
+    def poll_results():
+        # Nhận kết quả từ luồng nền trên luồng Tk
+        poll_live()
+        while True:
+            try:
+                symbol, df, error = results.get_nowait()
+            except queue.Empty:
+                break
+            tab = tab_by_symbol[symbol]
+            if df is not None:
+                tab['data'] = frame_to_payload(df)
+                if notebook.select() == str(tab['frame']):
+                    draw_tab(tab)
+            else:
+                print(f"Lỗi khi lấy dữ liệu {symbol}: {error}")
+                tab['label'].config(text=f"Không có dữ liệu cho mã {symbol}: {error}")
+        root.after(POLL_INTERVAL_MS, poll_results)
+
+    notebook.bind('<<NotebookTabChanged>>', on_tab_changed)
+    threading.Thread(target=load_in_background, args=(symbols, results), daemon=True).start()
+    root.after(POLL_INTERVAL_MS, poll_results)
     root.mainloop()
 
 # --- CHẠY CHÍNH ---
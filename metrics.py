@@ -0,0 +1,252 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# File log JSON (mỗi dòng một sự kiện), file Prometheus (textfile collector) và cổng HTTP /metrics;
+# bỏ trống thì không ghi/mở
+METRICS_LOG = os.environ.get('PTCK_METRICS_LOG')
+METRICS_FILE = os.environ.get('PTCK_METRICS_FILE')
+METRICS_PORT = os.environ.get('PTCK_METRICS_PORT')
+
+# Biên các ô histogram độ trễ (giây)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_HELP = {
+    'ptck_stage_seconds': ('histogram', "Thời gian mỗi lần gọi theo bước"),
+    'ptck_stage_errors_total': ('counter', "Số lần gọi lỗi theo bước"),
+    'ptck_rows_processed_total': ('counter', "Số dòng dữ liệu đã xử lý"),
+    'ptck_fetched_bytes_total': ('counter', "Dung lượng dữ liệu đã tải (byte)"),
+    'ptck_sent_bytes_total': ('counter', "Dung lượng dữ liệu đã gửi (byte)"),
+    'ptck_cache_hits_total': ('counter', "Số lần trúng cache"),
+    'ptck_cache_misses_total': ('counter', "Số lần trượt cache"),
+    'ptck_source_hedges_total': ('counter', "Số yêu cầu dự phòng gửi tới nguồn thứ hai"),
+    'ptck_source_breaker_open_total': ('counter', "Số lần ngắt mạch một nguồn dữ liệu"),
+}
+
+# Trường trong sự kiện được cộng dồn vào counter tương ứng
+_FIELD_COUNTERS = {
+    'rows': 'ptck_rows_processed_total',
+    'bytes_in': 'ptck_fetched_bytes_total',
+    'bytes_out': 'ptck_sent_bytes_total',
+}
+
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    parts = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+class Metrics:
+    # Bộ đếm và histogram dùng chung trong tiến trình; mỗi sự kiện đồng thời được ghi log JSON
+    # và gửi tới các capture() đang mở trong ngữ cảnh hiện tại (dùng cho bảng hiệu năng của từng lần
+    # chạy lại dashboard: các phiên Streamlit chạy song song không lẫn sự kiện của nhau).
+
+    def __init__(self, log_path: str = METRICS_LOG, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.captures = ContextVar(f'ptck_captures_{id(self)}', default=())
+        self.log_path = log_path
+        self._log = None
+        self._server = None
+
+    def _emit(self, event):
+        for events in self.captures.get():
+            events.append(event)
+        if self.log_path:
+            if self._log is None:
+                os.makedirs(os.path.dirname(self.log_path) or '.', exist_ok=True)
+                self._log = open(self.log_path, 'a', encoding='utf-8', buffering=1)
+            self._log.write(json.dumps(event, ensure_ascii=False, default=str) + '\n')
+
+    def _add(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def inc(self, name: str, value=1, **labels):
+        with self.lock:
+            self._add(name, labels, value)
+            self._emit({'ts': time.time(), 'counter': name, 'value': value, **labels})
+
+    def observe(self, stage: str, seconds: float, ok: bool = True, **fields):
+        key = ('ptck_stage_seconds', (('stage', stage),))
+        with self.lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    hist[0][i] += 1
+                    break
+            hist[1] += seconds
+            hist[2] += 1
+            if not ok:
+                self._add('ptck_stage_errors_total', {'stage': stage}, 1)
+            for field, counter in _FIELD_COUNTERS.items():
+                if fields.get(field):
+                    self._add(counter, {'stage': stage}, fields[field])
+            self._emit({'ts': time.time(), 'stage': stage, 'seconds': seconds, 'ok': ok, **fields})
+
+    @contextmanager
+    def timer(self, stage: str, **fields):
+        # Đo một đoạn mã; bên trong có thể bổ sung trường (rows, bytes_in, bytes_out...) vào dict trả về
+        start = time.perf_counter()
+        ok = False
+        try:
+            yield fields
+            ok = True
+        finally:
+            self.observe(stage, time.perf_counter() - start, ok, **fields)
+
+    def timed(self, stage: str = None):
+        def decorator(func):
+            name = stage or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @contextmanager
+    def capture(self):
+        # Gom các sự kiện phát sinh trong khối vào một danh sách. Chỉ thấy sự kiện của luồng hiện tại và
+        # các luồng con được chạy trong bản sao ngữ cảnh (contextvars.copy_context().run)
+        events = []
+        token = self.captures.set(self.captures.get() + (events,))
+        try:
+            yield events
+        finally:
+            self.captures.reset(token)
+
+    def prometheus_text(self):
+        with self.lock:
+            histograms = {k: (list(v[0]), v[1], v[2]) for k, v in self.histograms.items()}
+            counters = dict(self.counters)
+        lines, described = [], set()
+
+        def describe(name):
+            if name not in described:
+                described.add(name)
+                kind, text = _HELP.get(name, ('counter', name))
+                lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), (counts, total, count) in sorted(histograms.items()):
+            describe(name)
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_label_text(labels + (('le', repr(bound)),))} {cumulative}")
+            lines.append(f"{name}_bucket{_label_text(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_label_text(labels)} {total!r}")
+            lines.append(f"{name}_count{_label_text(labels)} {count}")
+        for (name, labels), value in sorted(counters.items()):
+            describe(name)
+            lines.append(f"{name}{_label_text(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str = METRICS_FILE):
+        # Ghi nguyên tử để node_exporter không đọc phải file ghi dở
+        if not path:
+            return
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+    def serve(self, port: int, host: str = '0.0.0.0'):
+        # Mở /metrics trên luồng nền (một lần cho mỗi tiến trình)
+        if self._server is not None:
+            return self._server
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, int(port)), Handler)
+        threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True).start()
+        return self._server
+
+
+def summarize(events):
+    # Bảng tổng hợp theo bước từ danh sách sự kiện của capture()
+    stages = {}
+    for event in events:
+        if 'stage' in event:
+            row = stages.setdefault(event['stage'], {'calls': 0, 'errors': 0, 'total_s': 0.0, 'max_s': 0.0,
+                                                     'rows': 0, 'bytes_in': 0, 'bytes_out': 0})
+            row['calls'] += 1
+            row['errors'] += not event['ok']
+            row['total_s'] += event['seconds']
+            row['max_s'] = max(row['max_s'], event['seconds'])
+            for field in _FIELD_COUNTERS:
+                row[field] += event.get(field) or 0
+    counters = {}
+    for event in events:
+        if 'counter' in event:
+            label = event.get('cache') or event.get('stage') or ''
+            key = f"{event['counter']}{{{label}}}" if label else event['counter']
+            counters[key] = counters.get(key, 0) + event['value']
+    return stages, counters
+
+
+_default_metrics = None
+_default_lock = threading.Lock()
+
+
+def get_metrics():
+    global _default_metrics
+    with _default_lock:
+        if _default_metrics is None:
+            _default_metrics = Metrics()
+            if METRICS_PORT:
+                _default_metrics.serve(int(METRICS_PORT))
+    return _default_metrics
+
+
+def timer(stage: str, **fields):
+    return get_metrics().timer(stage, **fields)
+
+
+def timed(stage: str = None):
+    # Decorator đo thời gian; metrics mặc định chỉ được tạo ở lần gọi đầu tiên
+    def decorator(func):
+        name = stage or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_metrics().timer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def inc(name: str, value=1, **labels):
+    get_metrics().inc(name, value, **labels)
+
+
+def capture():
+    return get_metrics().capture()
@@ -0,0 +1,239 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from data_store import get_store
+from indicators import INDICATOR_COLUMNS, compute_indicators
+
+PRICE_FIELDS = ('open', 'high', 'low', 'close')
+# Giá vnstock tính theo nghìn đồng; bước giá nhỏ nhất 10 đồng = 0.01
+PRICE_TICK = 0.01
+# Chia cho số nguyên (thay vì nhân 0.01) để giá giải mã trùng khớp giá gốc tới từng bit
+_TICKS_PER_UNIT = round(1 / PRICE_TICK)
+# Giá trị đánh dấu ô không có dữ liệu khi lưu giá dạng số nguyên
+_MISSING = np.iinfo(np.int32).min
+# Giới hạn bộ nhớ mặc định cho một bảng (MB)
+PANEL_BUDGET_MB = int(os.environ.get('PTCK_PANEL_BUDGET_MB', 1024))
+# Số ô float64 tạm cần cho mỗi ô giá khi tính chỉ báo (tổng tích lũy, bình phương, RSI...)
+_INDICATOR_TEMPS = 24
+
+
+def _to_ticks(values):
+    # Đổi giá sang số bước giá nếu không mất thông tin; trả về None nếu không được
+    valid = ~np.isnan(values)
+    ticks = np.rint(values[valid] * _TICKS_PER_UNIT)
+    if ticks.size and (np.abs(ticks).max() >= np.iinfo(np.int32).max
+                       or not np.array_equal(ticks / _TICKS_PER_UNIT, values[valid])):
+        return None
+    out = np.full(values.shape, _MISSING, dtype=np.int32)
+    out[valid] = ticks
+    return out
+
+
+class SymbolSlice:
+    # Dữ liệu một mã trong bảng: các mảng là view trên bảng chung (giá số nguyên được giải mã khi đọc)
+
+    def __init__(self, panel, row):
+        self.panel = panel
+        self.row = row
+        self.symbol = panel.symbols[row]
+        self.start, self.stop = panel.bounds[row]
+
+    def __len__(self):
+        return self.stop - self.start
+
+    @property
+    def dates(self):
+        return self.panel.dates[self.start:self.stop]
+
+    def raw(self, field):
+        return self.panel.fields[field][self.row, self.start:self.stop]
+
+    def __getitem__(self, field):
+        if field in self.panel.indicators:
+            return self.panel.indicators[field][self.row, self.start:self.stop]
+        return self.panel.decode(field, self.raw(field))
+
+    def to_frame(self, indicators: bool = True):
+        # Đổi sang DataFrame (ví dụ để vẽ biểu đồ); chỉ giữ các phiên có giao dịch
+        mask = self.panel.valid[self.row, self.start:self.stop]
+        columns = {field: self[field][mask].astype(np.float64) for field in PRICE_FIELDS}
+        columns['volume'] = self.raw('volume')[mask].astype(np.int64)
+        if indicators:
+            for name in self.panel.indicators:
+                columns[name] = self[name][mask].astype(np.float64)
+        return pd.DataFrame(columns, index=pd.DatetimeIndex(self.dates[mask], name='time'))
+
+
+class CompactPanel:
+    # Bảng OHLCV gọn cho nhiều mã: một trục ngày dùng chung, mỗi trường là một ma trận (mã x ngày).
+    # Giá lưu dạng int32 (số bước giá) nếu không mất thông tin, ngược lại float32; khối lượng int32.
+
+    def __init__(self, symbols, dates, fields, valid, bounds, budget_bytes: int = PANEL_BUDGET_MB << 20):
+        self.symbols = list(symbols)
+        self.rows = {s: i for i, s in enumerate(self.symbols)}
+        self.dates = dates
+        self.fields = fields
+        self.valid = valid
+        self.bounds = bounds
+        self.budget_bytes = budget_bytes
+        self.indicators = {}
+        self.source_bytes = None
+
+    @staticmethod
+    def estimate_bytes(n_symbols: int, n_dates: int, indicators: bool = False):
+        # Ước lượng trường hợp xấu nhất (giá float32) trước khi cấp phát
+        cells = n_symbols * n_dates
+        total = cells * (4 * len(PRICE_FIELDS) + 4 + 1) + n_dates * 8 + n_symbols * 16
+        if indicators:
+            total += cells * 4 * len(INDICATOR_COLUMNS)
+        return total
+
+    def _check_budget(self, extra: int = 0):
+        used = self.nbytes() + extra
+        if used > self.budget_bytes:
+            raise MemoryError(f"Bảng cần {used / 2**20:.1f} MB, vượt giới hạn {self.budget_bytes / 2**20:.1f} MB")
+
+    @classmethod
+    def build(cls, symbols, dates_of, load, budget_bytes: int = PANEL_BUDGET_MB << 20):
+        # Dựng bảng trong hai lượt: lượt 1 chỉ đọc ngày để lập trục chung, lượt 2 đọc từng mã
+        # rồi ghi thẳng vào ma trận, nên mỗi lúc chỉ có một DataFrame trong bộ nhớ.
+        per_symbol = {s: dates_of(s) for s in symbols}
+        symbols = [s for s, d in per_symbol.items() if d is not None and len(d)]
+        dates = np.unique(np.concatenate([per_symbol[s] for s in symbols])) if symbols \
+            else np.array([], dtype='datetime64[ns]')
+        rows, n = len(symbols), len(dates)
+        estimate = cls.estimate_bytes(rows, n)
+        if estimate > budget_bytes:
+            raise MemoryError(f"Bảng {rows} mã x {n} phiên cần khoảng {estimate / 2**20:.1f} MB, "
+                              f"vượt giới hạn {budget_bytes / 2**20:.1f} MB")
+
+        fields = {field: np.full((rows, n), _MISSING, dtype=np.int32) for field in PRICE_FIELDS}
+        fields['volume'] = np.zeros((rows, n), dtype=np.int32)
+        valid = np.zeros((rows, n), dtype=bool)
+        bounds = np.zeros((rows, 2), dtype=np.int64)
+        source_bytes = 0
+        for i, symbol in enumerate(symbols):
+            df = load(symbol)
+            source_bytes += int(df.memory_usage(index=True, deep=True).sum())
+            cols = np.searchsorted(dates, per_symbol[symbol])
+            bounds[i] = cols[0], cols[-1] + 1
+            valid[i, cols] = True
+            for field in PRICE_FIELDS:
+                values = df[field].to_numpy(dtype=np.float64)
+                target = fields[field]
+                ticks = _to_ticks(values) if target.dtype == np.int32 else None
+                if ticks is not None:
+                    target[i, cols] = ticks
+                    continue
+                if target.dtype == np.int32:
+                    # Giá đã điều chỉnh (lẻ bước giá): chuyển cả trường sang float32
+                    target = fields[field] = np.where(target == _MISSING, np.nan,
+                                                      target / _TICKS_PER_UNIT).astype(np.float32)
+                target[i, cols] = values
+            volume = np.nan_to_num(df['volume'].to_numpy(dtype=np.float64)).astype(np.int64)
+            if fields['volume'].dtype == np.int32 and volume.size and volume.max() > np.iinfo(np.int32).max:
+                fields['volume'] = fields['volume'].astype(np.int64)
+            fields['volume'][i, cols] = volume
+
+        panel = cls(symbols, dates, fields, valid, bounds, budget_bytes)
+        panel.source_bytes = source_bytes
+        panel._check_budget()
+        return panel
+
+    @classmethod
+    def from_frames(cls, frames, budget_bytes: int = PANEL_BUDGET_MB << 20):
+        frames = {s: df for s, df in frames.items() if df is not None and not df.empty}
+        return cls.build(list(frames), lambda s: pd.DatetimeIndex(frames[s].index).to_numpy('datetime64[ns]'),
+                         frames.__getitem__, budget_bytes)
+
+    @classmethod
+    def from_store(cls, symbols, interval: str = '1D', store=None, budget_bytes: int = PANEL_BUDGET_MB << 20):
+        # Đọc trực tiếp từ kho Parquet; lượt đầu chỉ đọc cột thời gian
+        store = store or get_store()
+
+        def dates_of(symbol):
+            path = store.path(symbol, interval)
+            if not os.path.exists(path):
+                return None
+            return pq.read_table(path, columns=['time']).column('time').to_numpy().astype('datetime64[ns]')
+
+        return cls.build(symbols, dates_of, lambda s: store.load(s, interval), budget_bytes)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self.rows
+
+    def __getitem__(self, symbol):
+        return SymbolSlice(self, self.rows[symbol])
+
+    def decode(self, field, values):
+        # Giải mã giá số nguyên về số thực; ô trống thành NaN
+        if values.dtype != np.int32 or field == 'volume':
+            return values
+        out = values / _TICKS_PER_UNIT
+        out[values == _MISSING] = np.nan
+        return out
+
+    def prices(self, field: str = 'close', rows=slice(None)):
+        return self.decode(field, self.fields[field][rows])
+
+    def compute_indicators(self, chunk_rows: int = None):
+        # Tính chỉ báo trên từng khối dòng (float64 tạm thời), lưu kết quả float32 vào bảng.
+        # Mã có phiên tạm ngừng giữa chừng được tính trên các phiên có giao dịch như add_technical_indicators.
+        rows, n = self.valid.shape
+        self._check_budget(rows * n * 4 * len(INDICATOR_COLUMNS))
+        out = {name: np.full((rows, n), np.nan, dtype=np.float32) for name in INDICATOR_COLUMNS}
+        if chunk_rows is None:
+            headroom = max(self.budget_bytes - self.nbytes() - rows * n * 4 * len(INDICATOR_COLUMNS), 0)
+            chunk_rows = int(min(max(headroom // max(n * 8 * _INDICATOR_TEMPS, 1), 1), 512))
+
+        spans = self.bounds[:, 1] - self.bounds[:, 0]
+        gaps = self.valid.sum(axis=1) != spans
+        dense = np.flatnonzero(~gaps)
+        for i in range(0, len(dense), chunk_rows):
+            block = dense[i:i + chunk_rows]
+            # Cắt theo khoảng phiên chung của khối để không tính trên các cột trống
+            lo, hi = self.bounds[block, 0].min(), self.bounds[block, 1].max()
+            values = compute_indicators(self.prices('close', (block, slice(lo, hi))).astype(np.float64))
+            for name in INDICATOR_COLUMNS:
+                out[name][block, lo:hi] = values[name]
+        for row in np.flatnonzero(gaps):
+            mask = self.valid[row]
+            values = compute_indicators(self.prices('close', row)[mask].astype(np.float64))
+            for name in INDICATOR_COLUMNS:
+                out[name][row, mask] = values[name]
+        # compute_indicators coi NaN ở đầu khối là thiếu dữ liệu nên các mã niêm yết muộn vẫn đúng
+        self.indicators = out
+        return out
+
+    def nbytes(self):
+        return sum(self.footprint().values())
+
+    def footprint(self):
+        sizes = {field: values.nbytes for field, values in self.fields.items()}
+        sizes['valid'] = self.valid.nbytes
+        sizes['dates'] = self.dates.nbytes
+        sizes['bounds'] = self.bounds.nbytes
+        sizes['indicators'] = sum(values.nbytes for values in self.indicators.values())
+        sizes['symbols'] = sum(sys.getsizeof(s) for s in self.symbols)
+        return sizes
+
+    def report(self):
+        sizes = self.footprint()
+        total = sum(sizes.values())
+        lines = [f"Bảng {len(self.symbols)} mã x {len(self.dates)} phiên: {total / 2**20:.1f} MB "
+                 f"(giới hạn {self.budget_bytes / 2**20:.0f} MB)"]
+        for name, size in sizes.items():
+            dtype = self.fields[name].dtype if name in self.fields else ''
+            lines.append(f"  {name:<11s} {size / 2**20:8.1f} MB {dtype}")
+        if self.source_bytes:
+            base = total - sizes['indicators']
+            lines.append(f"  DataFrame gốc: {self.source_bytes / 2**20:.1f} MB "
+                         f"(bảng gọn nhỏ hơn {self.source_bytes / base:.1f}x, chưa kể chỉ báo)")
+        return "\n".join(lines)
@@ -0,0 +1,78 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Các cột cần để vẽ biểu đồ; chỉ những cột này được gửi sang tiến trình con
+RENDER_COLUMNS = ('open', 'high', 'low', 'close', 'volume',
+                  'MA5', 'MA10', 'MA50', 'BB_Upper', 'BB_Middle', 'BB_Lower', 'RSI')
+
+
+def frame_to_payload(df):
+    # Gói dữ liệu gọn: index dạng int64 (ns) và một ma trận float64, thay vì pickle cả DataFrame
+    index = pd.DatetimeIndex(df.index)
+    return (index.asi8.copy(), np.ascontiguousarray(df.loc[:, RENDER_COLUMNS].to_numpy(dtype=np.float64)))
+
+
+def payload_to_frame(payload):
+    index, values = payload
+    return pd.DataFrame(values, index=pd.DatetimeIndex(index, name='time'), columns=RENDER_COLUMNS)
+
+
+def init_worker():
+    # Tiến trình con vẽ không giao diện (Agg) và dựng sẵn một ChartTemplate: mỗi mã chỉ thay dữ liệu
+    # (initializer cho mọi pool vẽ: render_many và batch_run)
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+    import matplotlib.pyplot as plt
+    plt.rcParams['font.family'] = 'DejaVu Sans'
+    from chart_renderer import get_template
+    get_template()
+
+
+def _render_one(job):
+    from chart_renderer import get_template
+    symbol, payload = job
+    try:
+        return symbol, get_template().render_png(payload_to_frame(payload), symbol), None
+    except Exception as e:
+        return symbol, None, f"{type(e).__name__}: {e}"
+
+
+def render_many(frames, max_workers=None, chunksize=None):
+    # Vẽ biểu đồ cho nhiều mã trên process pool (mặc định mỗi nhân một tiến trình).
+    # frames: dict mã -> DataFrame đã có chỉ báo; trả về (ảnh PNG theo mã, lỗi theo mã).
+    jobs = [(symbol, frame_to_payload(df)) for symbol, df in frames.items()]
+    images, errors = {}, {}
+    if not jobs:
+        return images, errors
+    max_workers = min(max_workers or os.cpu_count() or 1, len(jobs))
+    chunksize = chunksize or max(1, len(jobs) // (max_workers * 4))
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker) as pool:
+        for symbol, png, error in pool.map(_render_one, jobs, chunksize=chunksize):
+            if error is None:
+                images[symbol] = png
+            else:
+                errors[symbol] = error
+    return images, errors
+
+
+# --- CHẠY CHÍNH ---
+if __name__ == "__main__":
+    from batch_fetch import fetch_many
+    from indicators import add_technical_indicators
+
+    symbols = [s.upper() for s in sys.argv[1:]] or ['BID', 'HPG', 'CII', 'SSI', 'PDR']
+    data, fetch_errors = fetch_many(symbols)
+    for symbol, error in fetch_errors.items():
+        print(f"Lỗi khi lấy dữ liệu {symbol}: {error}")
+
+    images, render_errors = render_many({s: add_technical_indicators(df) for s, df in data.items()})
+    for symbol, png in images.items():
+        with open(f"{symbol}_chart.png", "wb") as f:
+            f.write(png)
+        print(f"Đã lưu biểu đồ {symbol}_chart.png")
+    for symbol, error in render_errors.items():
+        print(f"Lỗi khi vẽ biểu đồ {symbol}: {error}")
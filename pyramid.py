@@ -0,0 +1,157 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from data_store import STORE_DIR, OHLCVStore, get_store
+from figure_pool import LRUPool
+from indicators import add_technical_indicators
+
+# Các mức của tháp giá, từ mịn tới thô, và quy tắc gom nến ngày tương ứng
+LEVELS = ('1D', '1W', '1M')
+_PERIODS = {'1W': 'W-FRI', '1M': 'M'}
+LEVEL_NAMES = {'1D': 'ngày', '1W': 'tuần', '1M': 'tháng'}
+BAR_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+# Số nến tối đa trên một biểu đồ; vượt quá thì chuyển sang mức thô hơn
+CANDLE_BUDGET = int(os.environ.get('PTCK_CANDLE_BUDGET', 300))
+PYRAMID_DIR = os.path.join(STORE_DIR, 'pyramid')
+# Số mã giữ các mức đã tính trong bộ nhớ (0: không giữ, mỗi lần cập nhật đọc lại từ đĩa)
+PYRAMID_CACHE_SIZE = int(os.environ.get('PTCK_PYRAMID_CACHE', 32))
+
+
+def resample_ohlcv(daily, level: str):
+    # Gom nến ngày (đã sắp xếp) theo tuần/tháng; mỗi nến gộp lấy ngày giao dịch đầu tiên làm mốc
+    bars = daily[BAR_COLUMNS]
+    if level == '1D' or bars.empty:
+        return bars.astype(np.float64)
+    keys = daily.index.to_period(_PERIODS[level]).asi8
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)] - 1
+    values = {name: bars[name].to_numpy(dtype=np.float64) for name in BAR_COLUMNS}
+    return pd.DataFrame({
+        'open': values['open'][starts],
+        'high': np.maximum.reduceat(values['high'], starts),
+        'low': np.minimum.reduceat(values['low'], starts),
+        'close': values['close'][ends],
+        'volume': np.add.reduceat(values['volume'], starts),
+    }, index=pd.DatetimeIndex(daily.index[starts], name='time'))
+
+
+def choose_level(levels, start=None, end=None, budget: int = CANDLE_BUDGET):
+    # Mức mịn nhất có số nến trong khoảng [start, end] không vượt ngân sách; trả về (df, mức)
+    df, level = None, None
+    for level in LEVELS:
+        if level not in levels:
+            continue
+        df = levels[level]
+        if start is not None:
+            df = df[df.index >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df.index <= pd.Timestamp(end)]
+        if len(df) <= budget:
+            return df, level
+    # Cả mức thô nhất vẫn quá nhiều nến: giữ các nến gần nhất
+    return (df.iloc[-budget:], level) if df is not None else (None, None)
+
+
+def chart_title(symbol: str, level: str):
+    return symbol if level in (None, '1D') else f"{symbol} (nến {LEVEL_NAMES[level]})"
+
+
+class PricePyramid:
+    # Tháp giá ngày/tuần/tháng kèm chỉ báo của từng mức, lưu cạnh dữ liệu gốc (data/pyramid/<mức>/<MÃ>.parquet).
+    # Khi có dữ liệu ngày mới chỉ gom lại từ kỳ cuối đã lưu (kỳ đó có thể chưa kết thúc);
+    # chỉ báo tính lại trên cả mức vì mỗi mức chỉ vài trăm tới vài nghìn nến.
+
+    def __init__(self, store: OHLCVStore = None, root: str = PYRAMID_DIR, cache_size: int = PYRAMID_CACHE_SIZE):
+        self.store = store or get_store()
+        self.levels = OHLCVStore(root, fetch=None)
+        # Các mức đã đọc/tính gần nhất theo mã (LRU), kèm dấu hiệu nhận biết dữ liệu ngày tương ứng.
+        # self.lock chỉ bảo vệ cache và bảng khóa; việc tính/ghi của mỗi mã dùng khóa riêng của mã đó
+        self.cache = LRUPool(cache_size) if cache_size > 0 else None
+        self.lock = threading.Lock()
+        self.symbol_locks = {}
+
+    def _symbol_lock(self, symbol):
+        with self.lock:
+            lock = self.symbol_locks.get(symbol)
+            if lock is None:
+                lock = self.symbol_locks[symbol] = threading.Lock()
+            return lock
+
+    def _update_level(self, symbol, daily, level, old):
+        if old is None:
+            old = self.levels.load(symbol, level)
+        bars = None
+        if old is not None and len(old) > 1 and old.index[0] == daily.index[0]:
+            cut = old.index[-1]
+            head = old[old.index < cut]
+            before = daily[daily.index < cut]
+            # Giá cũ có thể đã được điều chỉnh (chia cổ tức, tách cổ phiếu): khi đó dựng lại cả mức
+            if len(before) and before['close'].iloc[-1] == head['close'].iloc[-1]:
+                tail = resample_ohlcv(daily[daily.index >= cut], level)
+                kept = old[old.index >= cut]
+                if tail.index.equals(kept.index) and np.array_equal(tail.to_numpy(), kept[BAR_COLUMNS].to_numpy()):
+                    return old
+                bars = pd.concat([head[BAR_COLUMNS], tail])
+        if bars is None:
+            bars = resample_ohlcv(daily, level)
+        df = add_technical_indicators(bars)
+        self.levels.save(symbol, df, level)
+        return df
+
+    def update(self, symbol: str, daily=None):
+        # Cập nhật mọi mức từ dữ liệu ngày (mặc định toàn bộ dữ liệu đã lưu của mã); trả về {mức: DataFrame}
+        symbol = symbol.upper()
+        if daily is None:
+            daily = self.store.load(symbol)
+        if daily is None or daily.empty:
+            return {}
+        last = daily.iloc[-1]
+        signature = (len(daily), daily.index[0], daily.index[-1], tuple(last[BAR_COLUMNS]))
+        with self._symbol_lock(symbol):
+            cached_signature, cached = None, {}
+            if self.cache is not None:
+                with self.lock:
+                    cached_signature, cached = self.cache.get(symbol) or (None, {})
+            if cached_signature == signature:
+                return cached
+            levels = {level: self._update_level(symbol, daily, level, cached.get(level)) for level in LEVELS}
+            if self.cache is not None:
+                with self.lock:
+                    self.cache.put(symbol, (signature, levels))
+            return levels
+
+    def view(self, symbol: str, start=None, end=None, budget: int = CANDLE_BUDGET):
+        return choose_level(self.update(symbol), start, end, budget)
+
+
+_default_pyramid = None
+_default_lock = threading.Lock()
+
+
+def get_pyramid():
+    global _default_pyramid
+    with _default_lock:
+        if _default_pyramid is None:
+            _default_pyramid = PricePyramid()
+    return _default_pyramid
+
+
+def fit_to_budget(df, symbol: str, budget: int = CANDLE_BUDGET, pyramid: PricePyramid = None):
+    # Dữ liệu ngày của khoảng cần vẽ → (DataFrame có chỉ báo, mức) với số nến trong ngân sách.
+    # Dùng tháp đã lưu nếu kho có đủ dữ liệu của khoảng đó, nếu không thì gom ngay trong bộ nhớ.
+    if len(df) <= budget:
+        return (df if 'MA5' in df else add_technical_indicators(df)), '1D'
+    start, end = df.index[0], df.index[-1]
+    pyramid = pyramid or get_pyramid()
+    try:
+        levels = pyramid.update(symbol)
+    except Exception as e:
+        print(f"Lỗi cập nhật tháp giá {symbol}: {e}")
+        levels = {}
+    daily = levels.get('1D')
+    if daily is None or daily.index[0] > start or daily.index[-1] < end:
+        levels = {level: add_technical_indicators(resample_ohlcv(df, level)) for level in LEVELS}
+    return choose_level(levels, start, end, budget)
@@ -0,0 +1,114 @@
+import operator
+import os
+
+import numpy as np
+import pandas as pd
+
+from fundamentals import get_financial_statements
+
+# Đuôi file báo cáo theo định dạng
+REPORT_EXTENSIONS = {'text': 'txt', 'wide': 'txt', 'markdown': 'md', 'csv': 'csv'}
+
+
+def _summary_block(df, n):
+    # n cột đầu tiên sau cột ticker và mảng giá trị của chúng.
+    # Chỉ giữ kiểu số gốc khi cả khối cùng một kiểu, để int không bị đổi thành float.
+    block = df.iloc[:, 1:n+1]
+    dtypes = set(block.dtypes)
+    if len(dtypes) == 1 and next(iter(dtypes)).kind in 'biuf':
+        values = block.to_numpy()
+    else:
+        values = block.to_numpy(dtype=object)
+    return block, values
+
+
+def _column_strings(values):
+    # Đổi cả cột sang chuỗi trong một lần map; NaN/None thành chuỗi rỗng như fillna('')
+    strings = list(map(str, values.tolist()))
+    for i in np.flatnonzero(pd.isna(values)):
+        strings[i] = ''
+    return strings
+
+
+def df_to_summary(df, n=3):
+    # Một dòng cho mỗi ô: định dạng theo cả cột rồi nối chuỗi một lần
+    if df is None or df.empty:
+        return "Không có dữ liệu."
+    block, values = _summary_block(df, n)
+    prefixes = ["  - " + str(idx) + ": " for idx in block.index]
+    lines = []
+    for j, col in enumerate(block.columns):
+        lines.append(f"*{col}*")
+        lines.extend(map(operator.add, prefixes, _column_strings(values[:, j])))
+        lines.append("")
+    return "\n".join(lines)
+
+
+def summary_table(df, n=3, fmt='markdown'):
+    # Bản gọn: một dòng cho mỗi chỉ tiêu thay vì một dòng cho mỗi ô.
+    # fmt: 'markdown' (bảng Markdown), 'csv' hoặc 'wide' (bảng căn cột dạng chữ)
+    if df is None or df.empty:
+        return "Không có dữ liệu."
+    block, values = _summary_block(df, n)
+    if fmt == 'csv':
+        return block.to_csv(na_rep='')
+    if fmt == 'wide':
+        return block.fillna('').to_string()
+    if fmt != 'markdown':
+        raise ValueError(f"Định dạng không hỗ trợ: {fmt}")
+    columns = [[str(idx) for idx in block.index]]
+    columns += [_column_strings(values[:, j]) for j in range(values.shape[1])]
+    rows = map(" | ".join, zip(*columns))
+    header = "| Chỉ tiêu | " + " | ".join(str(col) for col in block.columns) + " |"
+    separator = "|" + "---|" * (values.shape[1] + 1)
+    return "\n".join([header, separator, *("| " + row + " |" for row in rows)])
+
+
+def render_statement(df, fmt='text', n=3):
+    if fmt == 'text':
+        return df_to_summary(df, n)
+    return summary_table(df, n, fmt)
+
+
+def write_financial_report(symbol, period='year', lang='vi', fmt='text', out_dir='.'):
+    # Ghi báo cáo đầy đủ ra file {symbol}_report.{ext} và trả về (caption ngắn, đường dẫn file)
+    # Đọc từ kho báo cáo tài chính cục bộ, chỉ tải lại khi sang kỳ công bố mới
+    statements = get_financial_statements(symbol, period=period, lang=lang)
+    bs = statements['balance_sheet']
+    inc = statements['income_statement']
+    cf = statements['cash_flow']
+    ratio = statements['ratio']
+
+    # Tóm tắt caption
+    short_summary = f"📊 *{symbol}* - Tổng quan tài chính ({period}):\n"
+    if not ratio.empty:
+        latest_col = ratio.columns[-1]
+        try:
+            roe = ratio.loc['ROE', latest_col]
+            eps = ratio.loc['EPS', latest_col]
+            pe = ratio.loc['P/E', latest_col]
+            short_summary += f"ROE: {roe} | EPS: {eps} | P/E: {pe}"
+        except Exception as e:
+            print(f"Lỗi khi đọc ROE/EPS/P/E của {symbol}: {e}")
+            short_summary += "Không có chỉ số ROE, EPS, P/E"
+
+    # Nội dung lưu file
+    full_text = f"📊 *BÁO CÁO TÀI CHÍNH {symbol}* ({period})\n\n"
+    full_text += "*Bảng cân đối kế toán:*\n" + render_statement(bs, fmt) + "\n"
+    full_text += "*Kết quả hoạt động kinh doanh:*\n" + render_statement(inc, fmt) + "\n"
+    full_text += "*Lưu chuyển tiền tệ:*\n" + render_statement(cf, fmt) + "\n"
+    full_text += "*Chỉ số tài chính:*\n" + render_statement(ratio, fmt) + "\n"
+
+    path = os.path.join(out_dir, f"{symbol}_report.{REPORT_EXTENSIONS[fmt]}")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(full_text)
+
+    return short_summary, path
+
+
+def get_financial_report_text(symbol, period='year', lang='vi', fmt='text'):
+    try:
+        short_summary, _ = write_financial_report(symbol, period, lang, fmt)
+        return short_summary
+    except Exception as e:
+        return f"Lỗi khi lấy báo cáo tài chính {symbol}: {e}"
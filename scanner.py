@@ -0,0 +1,165 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from data_store import get_store
+from indicators import compute_indicators
+
+EXCHANGES = ('HOSE', 'HNX', 'UPCOM')
+# Tên sàn HOSE trong dữ liệu niêm yết của VCI là HSX
+_EXCHANGE_ALIASES = {'HOSE': ('HOSE', 'HSX'), 'HNX': ('HNX',), 'UPCOM': ('UPCOM',)}
+
+PANEL_FIELDS = ('close', 'volume')
+
+
+def list_universe(exchanges=EXCHANGES, source: str = 'VCI'):
+    # Danh sách mã cổ phiếu đang niêm yết trên các sàn
+    from vnstock import Listing
+    listing = Listing(source=source).symbols_by_exchange()
+    if 'type' in listing.columns:
+        listing = listing[listing['type'].str.upper() == 'STOCK']
+    wanted = {alias for ex in exchanges for alias in _EXCHANGE_ALIASES.get(ex.upper(), (ex.upper(),))}
+    listing = listing[listing['exchange'].str.upper().isin(wanted)]
+    return sorted(listing['symbol'].str.upper().unique())
+
+
+def _panel_path(store, interval, field):
+    return os.path.join(store.root, 'panel', interval, f"{field}.parquet")
+
+
+def build_price_panel(symbols, interval: str = '1D', store=None):
+    # Gộp dữ liệu đã lưu của từng mã thành bảng (ngày x mã) cho từng trường và lưu lại
+    store = store or get_store()
+    series = {field: {} for field in PANEL_FIELDS}
+    for symbol in symbols:
+        df = store.load(symbol, interval)
+        if df is None or df.empty:
+            continue
+        for field in PANEL_FIELDS:
+            series[field][symbol] = df[field]
+    panels = {}
+    for field, columns in series.items():
+        panel = pd.DataFrame(columns).sort_index()
+        panel.index.name = 'time'
+        path = _panel_path(store, interval, field)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        pq.write_table(pa.Table.from_pandas(panel), tmp_path)
+        os.replace(tmp_path, path)
+        panels[field] = panel
+    return panels
+
+
+def load_price_panel(symbols, interval: str = '1D', store=None):
+    # Đọc bảng giá đã gộp; dựng lại nếu thiếu mã hoặc có file của mã nào mới hơn bảng gộp
+    store = store or get_store()
+    paths = [_panel_path(store, interval, field) for field in PANEL_FIELDS]
+    if all(os.path.exists(p) for p in paths):
+        built_at = min(os.path.getmtime(p) for p in paths)
+        stale = False
+        for symbol in symbols:
+            path = store.path(symbol, interval)
+            if os.path.exists(path) and os.path.getmtime(path) > built_at:
+                stale = True
+                break
+        if not stale:
+            panels = {field: pd.read_parquet(path) for field, path in zip(PANEL_FIELDS, paths)}
+            available = [s for s in symbols if s in panels['close'].columns]
+            missing = [s for s in symbols if s not in panels['close'].columns and os.path.exists(store.path(s, interval))]
+            if not missing:
+                return {field: panel[available] for field, panel in panels.items()}
+    return build_price_panel(symbols, interval, store)
+
+
+def _ffill_rows(values):
+    # Điền giá phiên trước cho ngày mã không giao dịch (tạm ngừng, chưa có phiên); NaN ở đầu giữ nguyên
+    mask = np.isnan(values)
+    idx = np.where(~mask, np.arange(values.shape[1]), 0)
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    filled = values[np.arange(values.shape[0])[:, None], idx]
+    filled[np.cumsum(~mask, axis=1) == 0] = np.nan
+    return filled
+
+
+def _cross_up(fast, slow):
+    with np.errstate(invalid='ignore'):
+        return (fast[:, -2] <= slow[:, -2]) & (fast[:, -1] > slow[:, -1])
+
+
+# Điều kiện lọc: nhận (chỉ báo, giá đóng cửa) dạng (mã x ngày), trả về mảng bool theo mã
+SCREENS = {
+    'rsi_oversold': lambda ind, close: ind['RSI'][:, -1] < 30,
+    'rsi_overbought': lambda ind, close: ind['RSI'][:, -1] > 70,
+    'below_bb_lower': lambda ind, close: close[:, -1] < ind['BB_Lower'][:, -1],
+    'above_bb_upper': lambda ind, close: close[:, -1] > ind['BB_Upper'][:, -1],
+    'ma5_cross_above_ma50': lambda ind, close: _cross_up(ind['MA5'], ind['MA50']),
+    'ma5_cross_below_ma50': lambda ind, close: _cross_up(ind['MA50'], ind['MA5']),
+}
+
+DEFAULT_SCREENS = ('rsi_oversold', 'below_bb_lower', 'ma5_cross_above_ma50')
+
+
+def scan_panel(close, volume=None, screens=DEFAULT_SCREENS):
+    # close, volume: DataFrame (ngày x mã). Trả về bảng xếp hạng các mã khớp ít nhất một điều kiện.
+    symbols = np.asarray(close.columns)
+    values = _ffill_rows(close.to_numpy(dtype=np.float64).T)
+    if values.shape[1] < 2:
+        return pd.DataFrame(columns=['symbol', 'score', 'signals'])
+    ind = compute_indicators(values)
+
+    with np.errstate(invalid='ignore'):
+        hits = np.column_stack([SCREENS[name](ind, values) for name in screens])
+    score = hits.sum(axis=1)
+    selected = score > 0
+
+    last_close = values[:, -1]
+    band = ind['BB_Upper'][:, -1] - ind['BB_Lower'][:, -1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        pct_b = (last_close - ind['BB_Lower'][:, -1]) / band
+    result = pd.DataFrame({
+        'symbol': symbols,
+        'score': score,
+        'close': last_close,
+        'RSI': ind['RSI'][:, -1],
+        'MA5': ind['MA5'][:, -1],
+        'MA50': ind['MA50'][:, -1],
+        'BB_Lower': ind['BB_Lower'][:, -1],
+        'BB_Upper': ind['BB_Upper'][:, -1],
+        'pct_b': pct_b,
+    })
+    if volume is not None:
+        result['volume'] = volume.to_numpy(dtype=np.float64)[-1]
+    names = np.array(screens, dtype=object)
+    result = result.loc[selected].copy()
+    result['signals'] = [', '.join(names[row]) for row in hits[selected]]
+    # Nhiều tín hiệu hơn xếp trước; cùng số tín hiệu thì RSI thấp hơn xếp trước
+    return result.sort_values(['score', 'RSI'], ascending=[False, True], na_position='last').reset_index(drop=True)
+
+
+def scan_market(exchanges=EXCHANGES, screens=DEFAULT_SCREENS, days_back: int = 180,
+                symbols=None, store=None):
+    # Quét toàn thị trường trên dữ liệu đã lưu (không gọi mạng nếu đã có danh sách mã)
+    symbols = symbols if symbols is not None else list_universe(exchanges)
+    panels = load_price_panel(symbols, store=store)
+    close = panels['close']
+    if days_back:
+        close = close[close.index >= close.index.max() - pd.Timedelta(days=days_back)]
+    volume = panels['volume'].loc[close.index]
+    return scan_panel(close, volume, screens)
+
+
+# --- CHẠY CHÍNH ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quét tín hiệu kỹ thuật toàn thị trường")
+    parser.add_argument('--exchange', nargs='+', default=list(EXCHANGES))
+    parser.add_argument('--screen', nargs='+', default=list(DEFAULT_SCREENS), choices=sorted(SCREENS))
+    parser.add_argument('--days', type=int, default=180)
+    parser.add_argument('--top', type=int, default=30)
+    args = parser.parse_args()
+
+    result = scan_market(args.exchange, args.screen, args.days)
+    print(result.head(args.top).to_string(index=False))
@@ -0,0 +1,300 @@
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+
+from metrics import get_metrics
+
+# Nguồn dữ liệu theo loại yêu cầu, theo thứ tự ưu tiên khi chưa có số liệu đo.
+# vnstock chỉ hỗ trợ VCI, TCBS, MSN; báo cáo tài chính của TCBS/MSN khác cấu trúc bảng
+# của VCI (reports.py dựa trên VCI) nên mặc định chỉ dùng VCI, có thể đổi bằng biến môi trường.
+SOURCES = {
+    'quote': tuple(os.environ.get('PTCK_QUOTE_SOURCES', 'VCI,TCBS,MSN').split(',')),
+    'finance': tuple(os.environ.get('PTCK_FINANCE_SOURCES', 'VCI').split(',')),
+}
+
+# Số lần gọi gần nhất dùng để tính độ trễ và tỉ lệ lỗi của mỗi nguồn
+LATENCY_WINDOW = 50
+# Gửi thêm yêu cầu dự phòng tới nguồn thứ hai khi nguồn đầu chậm hơn phân vị này của chính nó
+HEDGE_PERCENTILE = 95
+HEDGE_MIN_SAMPLES = 5
+# Hạn chờ (giây) khi chưa đủ số liệu, và hạn chờ nhỏ nhất
+DEFAULT_HEDGE_DELAY = 3.0
+MIN_HEDGE_DELAY = 0.25
+# Ngắt mạch: sau FAILURE_THRESHOLD lỗi liên tiếp hoặc tỉ lệ lỗi vượt ERROR_RATE_THRESHOLD
+# (khi có ít nhất ERROR_RATE_MIN_SAMPLES lần gọi), nguồn bị loại trong BREAKER_COOLDOWN giây,
+# gấp đôi sau mỗi lần thử lại thất bại (tối đa MAX_BREAKER_COOLDOWN)
+FAILURE_THRESHOLD = 3
+ERROR_RATE_THRESHOLD = 0.5
+ERROR_RATE_MIN_SAMPLES = 10
+BREAKER_COOLDOWN = 30.0
+MAX_BREAKER_COOLDOWN = 300.0
+# Hạn chờ (giây) cho một lần gọi một nguồn: quá hạn thì tính là lỗi của nguồn và chuyển sang nguồn khác
+CALL_TIMEOUT = float(os.environ.get('PTCK_SOURCE_TIMEOUT', 30))
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class SourceUnavailable(RuntimeError):
+    # Mọi nguồn đều lỗi hoặc đang bị ngắt mạch; errors: lỗi theo nguồn
+    def __init__(self, operation, errors):
+        detail = '; '.join(f"{source}: {error}" for source, error in errors.items()) or "tất cả nguồn đang bị ngắt"
+        super().__init__(f"Không lấy được dữ liệu {operation} từ nguồn nào ({detail})")
+        self.errors = errors
+
+
+class NoData(LookupError):
+    # fn(source) ném lỗi này khi nguồn trả lời bình thường nhưng không có dữ liệu cho yêu cầu
+    # (mã không tồn tại, khoảng thời gian trống)
+    pass
+
+
+class SourceNoData(SourceUnavailable, NoData):
+    # Mọi nguồn đã trả lời đều báo không có dữ liệu cho yêu cầu
+    pass
+
+
+def is_request_error(error):
+    # Chỉ tín hiệu "không có dữ liệu" tường minh là lỗi của yêu cầu: không tính vào sức khỏe nguồn,
+    # không chuyển nguồn. Mọi lỗi khác (kể cả KeyError/ValueError do nguồn đổi định dạng) là lỗi của nguồn
+    return isinstance(error, NoData)
+
+
+class SourceHealth:
+    # Độ trễ, kết quả các lần gọi gần nhất và trạng thái ngắt mạch của một nguồn
+
+    def __init__(self, name: str, window: int = LATENCY_WINDOW):
+        self.name = name
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.cooldown = BREAKER_COOLDOWN
+        self.trial = False
+
+    def percentile(self, q):
+        return float(np.percentile(self.latencies, q)) if self.latencies else None
+
+    def error_rate(self):
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def available(self, now):
+        # Nguồn bị ngắt được thử lại một yêu cầu (half-open) sau thời gian chờ
+        if self.state == OPEN and now - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+            self.trial = False
+        if self.state == HALF_OPEN:
+            return not self.trial
+        return self.state == CLOSED
+
+    def hedge_delay(self):
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return DEFAULT_HEDGE_DELAY
+        return max(self.percentile(HEDGE_PERCENTILE), MIN_HEDGE_DELAY)
+
+    def record(self, seconds, ok, now):
+        # Trả về True nếu lần ghi này làm mạch bị ngắt; seconds=None: không ghi độ trễ
+        self.outcomes.append(ok)
+        if ok:
+            if seconds is not None:
+                self.latencies.append(seconds)
+            self.failures = 0
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self.cooldown = BREAKER_COOLDOWN
+                self.outcomes.clear()
+            return False
+        self.failures += 1
+        if self.state == HALF_OPEN:
+            self.cooldown = min(self.cooldown * 2, MAX_BREAKER_COOLDOWN)
+        elif self.state == OPEN or not (self.failures >= FAILURE_THRESHOLD or (
+                len(self.outcomes) >= ERROR_RATE_MIN_SAMPLES and self.error_rate() > ERROR_RATE_THRESHOLD)):
+            return False
+        self.state = OPEN
+        self.opened_at = now
+        return True
+
+    def snapshot(self):
+        p50, p95 = self.percentile(50), self.percentile(95)
+        return {'state': self.state, 'calls': len(self.outcomes), 'error_rate': round(self.error_rate(), 3),
+                'p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+                'p95_ms': round(p95 * 1000, 1) if p95 is not None else None}
+
+
+class SourceRouter:
+    # Chọn nguồn cho mỗi yêu cầu: gửi tới nguồn khỏe có độ trễ trung vị thấp nhất (nguồn chưa có số liệu
+    # xếp sau, theo thứ tự ưu tiên), quá hạn chờ theo phân vị thì gửi thêm bản dự phòng tới nguồn kế tiếp
+    # và lấy kết quả về trước; nguồn lỗi hoặc quá CALL_TIMEOUT thì chuyển ngay sang nguồn khác.
+    # Lần gọi thua vẫn chạy hết và được ghi nhận (trừ lần đã bị tính quá hạn).
+
+    def __init__(self, sources=SOURCES, max_workers: int = 16, clock=time.monotonic,
+                 timeout: float = CALL_TIMEOUT):
+        self.sources = {op: tuple(names) for op, names in sources.items()}
+        self.clock = clock
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.health = {}
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='source')
+        self.stats = {'requests': 0, 'hedges': 0, 'hedge_wins': 0, 'failovers': 0, 'breaker_opens': 0,
+                      'timeouts': 0}
+
+    def _health(self, operation, source):
+        key = (operation, source)
+        health = self.health.get(key)
+        if health is None:
+            health = self.health[key] = SourceHealth(source)
+        return health
+
+    def ranked(self, operation):
+        # Các nguồn dùng được: nguồn đã có số liệu, nhanh nhất trước, rồi các nguồn chưa có số liệu
+        # theo thứ tự ưu tiên (sắp xếp ổn định nên giữ thứ tự cấu hình)
+        now = self.clock()
+        with self.lock:
+            ready = [(source, self._health(operation, source)) for source in self.sources[operation]]
+            ready = [(source, health.percentile(50)) for source, health in ready if health.available(now)]
+        return [source for source, p50 in sorted(ready, key=lambda item: (item[1] is None, item[1] or 0.0))]
+
+    def _start(self, operation, source, fn):
+        with self.lock:
+            health = self._health(operation, source)
+            if health.state == HALF_OPEN:
+                health.trial = True
+        attempt = {'source': source, 'deadline': time.perf_counter() + self.timeout, 'done': False}
+        attempt['future'] = self.pool.submit(contextvars.copy_context().run, self._run, operation, attempt, fn)
+        return attempt, health.hedge_delay()
+
+    def _run(self, operation, attempt, fn):
+        # Đo độ trễ trong luồng của pool: không tính thời gian chờ trong hàng đợi
+        started = time.perf_counter()
+        try:
+            result = fn(attempt['source'])
+        except Exception as e:
+            self._finish(operation, attempt, time.perf_counter() - started, e)
+            raise
+        self._finish(operation, attempt, time.perf_counter() - started, None)
+        return result
+
+    def _finish(self, operation, attempt, seconds, error):
+        source = attempt['source']
+        # Lỗi của yêu cầu (mã không có dữ liệu...) nghĩa là nguồn vẫn trả lời bình thường
+        ok = error is None or is_request_error(error)
+        with self.lock:
+            if attempt['done']:
+                # Đã bị tính quá hạn trong call()
+                return
+            attempt['done'] = True
+            opened = self._health(operation, source).record(seconds if error is None else None, ok, self.clock())
+            if opened:
+                self.stats['breaker_opens'] += 1
+        metrics = get_metrics()
+        metrics.observe(f"source_{operation}_{source}", seconds, ok)
+        if opened:
+            metrics.inc('ptck_source_breaker_open_total', operation=operation, source=source)
+            print(f"Ngắt nguồn {source} ({operation}) do lỗi liên tục: {error}")
+
+    def _expire(self, operation, attempt):
+        # Lần gọi quá hạn: ghi lỗi cho nguồn (có thể làm ngắt mạch); trả về False nếu nó vừa kịp xong
+        source = attempt['source']
+        with self.lock:
+            if attempt['done']:
+                return False
+            attempt['done'] = True
+            self.stats['timeouts'] += 1
+            opened = self._health(operation, source).record(None, False, self.clock())
+            if opened:
+                self.stats['breaker_opens'] += 1
+        metrics = get_metrics()
+        metrics.inc('ptck_source_timeouts_total', operation=operation, source=source)
+        if opened:
+            metrics.inc('ptck_source_breaker_open_total', operation=operation, source=source)
+            print(f"Ngắt nguồn {source} ({operation}) do quá hạn {self.timeout:g}s")
+        return True
+
+    def call(self, operation: str, fn):
+        # fn(source) thực hiện yêu cầu với một nguồn cụ thể; trả về (kết quả, nguồn đã dùng).
+        # NoData được ném lại, không chuyển sang nguồn khác.
+        candidates = self.ranked(operation)
+        with self.lock:
+            self.stats['requests'] += 1
+        if not candidates:
+            raise SourceUnavailable(operation, {})
+        pending, errors = {}, {}
+        rest = list(candidates)
+        attempt, delay = self._start(operation, rest.pop(0), fn)
+        pending[attempt['future']] = attempt
+        hedge_at = time.perf_counter() + delay
+        hedged = False
+        while pending:
+            # Thức dậy khi có kết quả, khi tới hạn gửi dự phòng (chỉ một bản mỗi yêu cầu) hoặc khi có lần gọi quá hạn
+            # (lần gọi đã xong trong luồng nhưng future chưa kịp hoàn tất có deadline None: chỉ cần chờ kết quả)
+            wakes = [attempt['deadline'] for attempt in pending.values() if attempt['deadline'] is not None]
+            if rest and not hedged:
+                wakes.append(hedge_at)
+            timeout = max(min(wakes) - time.perf_counter(), 0) if wakes else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                source = pending.pop(future)['source']
+                try:
+                    result = future.result()
+                except Exception as e:
+                    errors[source] = e
+                    if is_request_error(e):
+                        rest = []
+                    continue
+                with self.lock:
+                    if hedged and source != candidates[0]:
+                        self.stats['hedge_wins'] += 1
+                    if errors:
+                        self.stats['failovers'] += 1
+                return result, source
+            now = time.perf_counter()
+            for future, attempt in list(pending.items()):
+                if attempt['deadline'] is None or now < attempt['deadline']:
+                    continue
+                if self._expire(operation, attempt):
+                    del pending[future]
+                    errors[attempt['source']] = TimeoutError(f"quá hạn {self.timeout:g}s")
+                else:
+                    attempt['deadline'] = None
+            if not rest:
+                continue
+            if not pending:
+                # Lỗi nhanh hoặc quá hạn: chuyển sang nguồn kế tiếp ngay, không chờ hạn dự phòng
+                attempt, delay = self._start(operation, rest.pop(0), fn)
+                pending[attempt['future']] = attempt
+                hedge_at = time.perf_counter() + delay
+            elif not hedged and now >= hedge_at:
+                hedged = True
+                with self.lock:
+                    self.stats['hedges'] += 1
+                get_metrics().inc('ptck_source_hedges_total', operation=operation, source=rest[0])
+                attempt, _ = self._start(operation, rest.pop(0), fn)
+                pending[attempt['future']] = attempt
+        request_errors = [e for e in errors.values() if is_request_error(e)]
+        if request_errors and len(request_errors) == len(errors):
+            raise SourceNoData(operation, errors) from request_errors[-1]
+        if request_errors:
+            raise request_errors[-1]
+        raise SourceUnavailable(operation, errors)
+
+    def snapshot(self):
+        with self.lock:
+            health = {f"{op}:{source}": h.snapshot() for (op, source), h in self.health.items()}
+            return {**self.stats, 'sources': health}
+
+
+_default_router = None
+_default_lock = threading.Lock()
+
+
+def get_router():
+    global _default_router
+    with _default_lock:
+        if _default_router is None:
+            _default_router = SourceRouter()
+    return _default_router
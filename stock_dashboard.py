@@ -1,72 +1,48 @@
 import streamlit as st
 import pandas as pd
-import mplfinance as mpf
-import ta
-from datetime import datetime, timedelta
-from vnstock import Vnstock
-import matplotlib.pyplot as plt
+from data_service import get_data_service
+from pyramid import LEVEL_NAMES, chart_title, fit_to_budget
+from batch_fetch import fetch_many
+from charts import chart_png
+from metrics import capture, get_metrics, summarize, timed, timer
+from sources import get_router
 
 st.set_page_config(layout="wide")
 
-def get_vietnam_stock_data(symbol: str, days_back: int = 180):
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=days_back)
-    start_date_str = start_date.strftime('%Y-%m-%d')
-    end_date_str = end_date.strftime('%Y-%m-%d')
-    try:
-        stock_instance = Vnstock().stock(symbol=symbol)
-        df = stock_instance.quote.history(start=start_date_str, end=end_date_str, interval='1D')
-        if df is not None and not df.empty:
-            df['time'] = pd.to_datetime(df.get('time', df.get('date')))
-            df = df.set_index('time')
-            return df
-    except Exception as e:
-        st.error(f"Lỗi khi lấy dữ liệu: {e}")
-    return None
-
-def add_technical_indicators(df):
-    df['MA5'] = ta.trend.sma_indicator(df['close'], window=5)
-    df['MA10'] = ta.trend.sma_indicator(df['close'], window=10)
-    df['MA50'] = ta.trend.sma_indicator(df['close'], window=50)
-    bb = ta.volatility.BollingerBands(close=df['close'], window=20, window_dev=2)
-    df['BB_Middle'] = bb.bollinger_mavg()
-    df['BB_Upper'] = bb.bollinger_hband()
-    df['BB_Lower'] = bb.bollinger_lband()
-    df['RSI'] = ta.momentum.RSIIndicator(df['close'], window=14).rsi()
-    return df
-
-def plot_chart(df, symbol):
-    addplots = [
-        mpf.make_addplot(df['MA5'], color='blue'),
-        mpf.make_addplot(df['MA10'], color='orange'),
-        mpf.make_addplot(df['MA50'], color='magenta'),
-        mpf.make_addplot(df['BB_Upper'], color='grey', linestyle='dashed'),
-        mpf.make_addplot(df['BB_Middle'], color='black', linestyle='dotted'),
-        mpf.make_addplot(df['BB_Lower'], color='grey', linestyle='dashed'),
-        mpf.make_addplot(df['RSI'], panel=1, color='purple', ylabel='RSI')
-    ]
-
-    fig, _ = mpf.plot(
-        df,
-        type='candle',
-        style='charles',
-        title=f"Biểu đồ kỹ thuật: {symbol}",
-        volume=True,
-        addplot=addplots,
-        figratio=(16, 9),
-        figscale=1.2,
-        panel_ratios=(6, 2),
-        returnfig=True
-    )
-    return fig
+# Thời gian sống của cache (giây) và số mục tối đa cho mỗi hàm được cache
+QUOTE_TTL = 15 * 60
+CACHE_ENTRIES = 128
+
+@st.cache_resource
+def data_service():
+    # Một dịch vụ dữ liệu cho mọi phiên: nhiều người cùng xem một mã chỉ gọi nguồn một lần
+    return get_data_service()
+
+def load_quote_history(symbol: str, days_back: int):
+    # Cache dùng chung giữa các phiên nằm trong data_service; lỗi không bị cache
+    return data_service().quote_history(symbol, days_back, interval='1D')
+
+@st.cache_data(ttl=QUOTE_TTL, max_entries=CACHE_ENTRIES, show_spinner=False)
+def cached_view(df, symbol):
+    # Khóa cache: nội dung DataFrame giá. Khoảng dài được vẽ bằng nến tuần/tháng từ tháp giá
+    # để số nến không vượt ngân sách vẽ.
+    return fit_to_budget(df, symbol)
+
+@st.cache_data(ttl=QUOTE_TTL, max_entries=CACHE_ENTRIES, show_spinner=False)
+def render_chart(df, symbol):
+    # Cache ảnh PNG thay vì Figure để lần chạy lại không phải vẽ và mã hóa ảnh;
+    # chart_png còn dùng cache trên đĩa nên ảnh được dùng lại giữa các lần khởi động
+    return chart_png(df, symbol)
+
+@timed('get_company_profile')
+def load_company_profile(symbol: str):
+    # Thông tin doanh nghiệp, ban lãnh đạo, cổ đông ít thay đổi nên được giữ lâu hơn trong data_service.
+    # Đo ở đây (không phải get_company_profile) để lỗi được ghi nhận trước khi bị bắt và hiển thị
+    return data_service().company_profile(symbol)
 
 def get_company_profile(symbol):
     try:
-        company = Vnstock().stock(symbol=symbol).company
-        profile = company.overview()
-        leaders = company.officers(filter_by='working')
-        shareholders = company.shareholders()
-        return profile, leaders, shareholders
+        return load_company_profile(symbol)
     except Exception as e:
         st.warning(f"Lỗi khi lấy thông tin công ty {symbol}: {e}")
         return None, None, None
@@ -76,30 +52,65 @@ st.title("📈 Biểu đồ kỹ thuật & Thông tin doanh nghiệp")
 
 symbol_input = st.text_input("Nhập mã cổ phiếu (ngăn cách bởi dấu phẩy):", "BID, HPG, SSI")
 symbols = [sym.strip().upper() for sym in symbol_input.split(",") if sym.strip()]
-days_back = st.slider("Số ngày gần đây:", min_value=30, max_value=365, value=180)
-
-if symbols:
-    for symbol in symbols:
-        st.subheader(f"🔍 Mã: {symbol}")
-        df = get_vietnam_stock_data(symbol, days_back)
-        if df is not None:
-            df = add_technical_indicators(df)
-            fig = plot_chart(df, symbol)
-            st.pyplot(fig)
-
-            # --- Thông tin doanh nghiệp ---
-            st.markdown("### 🏢 Thông tin doanh nghiệp")
-            profile, leaders, shareholders = get_company_profile(symbol)
-
-            if profile is not None and not profile.empty:
-                st.dataframe(profile.T)  # transpose để dễ đọc
-
-            st.markdown("### 👨‍💼 Ban lãnh đạo")
-            if leaders is not None and not leaders.empty:
-                st.dataframe(leaders)
-
-            st.markdown("### 🏦 Cổ đông lớn")
-            if shareholders is not None and not shareholders.empty:
-                st.dataframe(shareholders)
+# Tối đa 20 năm: khoảng dài tự chuyển sang nến tuần/tháng
+days_back = st.slider("Số ngày gần đây:", min_value=30, max_value=20 * 365, value=180)
+show_performance = st.sidebar.checkbox("Hiển thị hiệu năng", value=False)
+
+def fetch_quote(symbol):
+    with timer('load_quote_history', symbol=symbol):
+        return load_quote_history(symbol, days_back)
+
+def show_performance_breakdown(events):
+    stages, counters = summarize(events)
+    with st.expander("⏱️ Hiệu năng lần chạy này", expanded=False):
+        if stages:
+            table = pd.DataFrame.from_dict(stages, orient='index')
+            table['mean_ms'] = table['total_s'] / table['calls'] * 1000
+            table['max_ms'] = table['max_s'] * 1000
+            st.dataframe(table[['calls', 'errors', 'total_s', 'mean_ms', 'max_ms', 'rows', 'bytes_in', 'bytes_out']]
+                         .sort_values('total_s', ascending=False))
         else:
-            st.warning(f"Không có dữ liệu cho mã {symbol}.")
+            st.write("Mọi kết quả đều lấy từ cache của Streamlit.")
+        if counters:
+            st.write(counters)
+        # Số liệu của dịch vụ dữ liệu dùng chung và của từng nguồn (tính từ khi khởi động tiến trình)
+        st.write(data_service().snapshot())
+        st.write(get_router().snapshot())
+
+with capture() as perf_events:
+    if symbols:
+        # Lấy dữ liệu tất cả các mã song song trước khi vẽ. Giới hạn tốc độ nằm trong data_service
+        # (chỉ khi phải gọi nguồn) nên lần chạy lại trúng cache không bị chờ
+        data, errors = fetch_many(symbols, days_back, fetch=fetch_quote, rate_per_sec=0)
+        for symbol in symbols:
+            st.subheader(f"🔍 Mã: {symbol}")
+            df = data.get(symbol)
+            if df is not None:
+                df, level = cached_view(df, symbol)
+                st.image(render_chart(df, chart_title(symbol, level)), use_container_width=True)
+                if level != '1D':
+                    st.caption(f"Khoảng thời gian dài: hiển thị {len(df)} nến {LEVEL_NAMES[level]}.")
+
+                # --- Thông tin doanh nghiệp ---
+                st.markdown("### 🏢 Thông tin doanh nghiệp")
+                profile, leaders, shareholders = get_company_profile(symbol)
+
+                if profile is not None and not profile.empty:
+                    st.dataframe(profile.T)  # transpose để dễ đọc
+
+                st.markdown("### 👨‍💼 Ban lãnh đạo")
+                if leaders is not None and not leaders.empty:
+                    st.dataframe(leaders)
+
+                st.markdown("### 🏦 Cổ đông lớn")
+                if shareholders is not None and not shareholders.empty:
+                    st.dataframe(shareholders)
+            elif isinstance(errors.get(symbol), LookupError):
+                st.warning(f"Không có dữ liệu cho mã {symbol}.")
+            else:
+                st.error(f"Lỗi khi lấy dữ liệu {symbol}: {errors.get(symbol)}")
+
+if show_performance:
+    show_performance_breakdown(perf_events)
+# Xuất số liệu cho Prometheus nếu có cấu hình PTCK_METRICS_FILE
+get_metrics().write_prometheus()
@@ -0,0 +1,203 @@
+import json
+import os
+import queue
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import timer
+
+TELEGRAM_API = os.environ.get('PTCK_TELEGRAM_API', 'https://api.telegram.org')
+
+# sendMediaGroup nhận tối đa 10 ảnh; caption tối đa 1024 ký tự
+MEDIA_GROUP_SIZE = 10
+CAPTION_LIMIT = 1024
+# Telegram giới hạn khoảng 1 tin/giây cho mỗi chat
+CHAT_MIN_INTERVAL = 1.0
+
+_STOP = object()
+
+
+def _photo_bytes(photo):
+    # Nhận bytes hoặc BytesIO như các hàm send_telegram_photo cũ
+    if hasattr(photo, 'getvalue'):
+        return photo.getvalue()
+    if hasattr(photo, 'read'):
+        return photo.read()
+    return photo
+
+
+class TelegramDelivery:
+    # Hàng đợi gửi ảnh Telegram chạy trên luồng riêng: dùng chung một HTTP session,
+    # gom tối đa MEDIA_GROUP_SIZE ảnh vào một lần sendMediaGroup, giãn cách theo giới hạn
+    # mỗi chat và thử lại khi gặp 429 (retry_after) hoặc lỗi mạng.
+
+    def __init__(self, bot_token: str, chat_id: str, api_url: str = TELEGRAM_API,
+                 group_size: int = MEDIA_GROUP_SIZE, batch_wait: float = 0.5,
+                 min_interval: float = CHAT_MIN_INTERVAL, max_retries: int = 5,
+                 parse_mode: str = None, session=None, timeout: float = 30):
+        self.base_url = f"{api_url.rstrip('/')}/bot{bot_token}"
+        self.chat_id = chat_id
+        self.group_size = max(1, min(group_size, MEDIA_GROUP_SIZE))
+        self.batch_wait = batch_wait
+        self.min_interval = min_interval
+        self.max_retries = max_retries
+        self.parse_mode = parse_mode
+        self.timeout = timeout
+        if session is None:
+            session = requests.Session()
+            session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+            session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self.session = session
+
+        self.queue = queue.Queue()
+        self.last_request = 0.0
+        self.lock = threading.Lock()
+        self.metrics = {'queued': 0, 'sent': 0, 'failed': 0, 'requests': 0, 'retries': 0, 'rate_limited': 0}
+        self.latencies = []
+        self.errors = []
+        self.started_at = None
+        self.thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def start(self):
+        if self.thread is None:
+            self.started_at = time.perf_counter()
+            self.thread = threading.Thread(target=self._run, name='telegram-delivery', daemon=True)
+            self.thread.start()
+        return self
+
+    def send_photo(self, photo, caption=None):
+        # Đưa ảnh vào hàng đợi và trả về ngay; luồng gửi sẽ gom nhóm và gửi sau
+        if self.thread is None:
+            self.start()
+        with self.lock:
+            self.metrics['queued'] += 1
+        self.queue.put((_photo_bytes(photo), caption, time.perf_counter()))
+
+    def close(self, wait: bool = True):
+        if self.thread is None:
+            return
+        self.queue.put(_STOP)
+        if wait:
+            self.thread.join()
+        self.thread = None
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self.queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            # Chờ thêm một chút để gom đủ nhóm ảnh
+            deadline = time.perf_counter() + self.batch_wait
+            while len(batch) < self.group_size:
+                try:
+                    item = self.queue.get(timeout=max(0.0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._deliver(batch)
+
+    def _wait_turn(self):
+        wait = self.last_request + self.min_interval - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+
+    def _request(self, batch):
+        data = {'chat_id': self.chat_id}
+        if len(batch) == 1:
+            png, caption, _ = batch[0]
+            if caption:
+                data['caption'] = caption[:CAPTION_LIMIT]
+                if self.parse_mode:
+                    data['parse_mode'] = self.parse_mode
+            files = {'photo': ('chart.png', png)}
+            method = 'sendPhoto'
+        else:
+            media, files = [], {}
+            for i, (png, caption, _) in enumerate(batch):
+                entry = {'type': 'photo', 'media': f"attach://photo{i}"}
+                if caption:
+                    entry['caption'] = caption[:CAPTION_LIMIT]
+                    if self.parse_mode:
+                        entry['parse_mode'] = self.parse_mode
+                media.append(entry)
+                files[f"photo{i}"] = (f"chart{i}.png", png)
+            data['media'] = json.dumps(media, ensure_ascii=False)
+            method = 'sendMediaGroup'
+        return self.session.post(f"{self.base_url}/{method}", data=data, files=files, timeout=self.timeout)
+
+    def _deliver(self, batch):
+        backoff = 1.0
+        for attempt in range(self.max_retries + 1):
+            self._wait_turn()
+            self.last_request = time.perf_counter()
+            self.metrics['requests'] += 1
+            try:
+                with timer('telegram_send', photos=len(batch),
+                           bytes_out=sum(len(png) for png, _, _ in batch)):
+                    resp = self._request(batch)
+            except requests.RequestException as e:
+                error = f"Lỗi mạng: {e}"
+                retry_after = backoff
+            else:
+                if resp.status_code == 200:
+                    now = time.perf_counter()
+                    with self.lock:
+                        self.metrics['sent'] += len(batch)
+                        self.latencies.extend(now - queued_at for _, _, queued_at in batch)
+                    return True
+                error = f"HTTP {resp.status_code}: {resp.text[:200]}"
+                if resp.status_code == 429:
+                    self.metrics['rate_limited'] += 1
+                    try:
+                        retry_after = float(resp.json()['parameters']['retry_after'])
+                    except (ValueError, KeyError, TypeError):
+                        retry_after = backoff
+                elif resp.status_code >= 500:
+                    retry_after = backoff
+                else:
+                    # Lỗi phía yêu cầu (400, 403...): thử lại cũng không được
+                    break
+            if attempt < self.max_retries:
+                self.metrics['retries'] += 1
+                time.sleep(retry_after)
+                backoff = min(backoff * 2, 30.0)
+        with self.lock:
+            self.metrics['failed'] += len(batch)
+            self.errors.append(error)
+        print(f"Lỗi gửi Telegram: {error}")
+        return False
+
+    def stats(self):
+        # Thông lượng và độ trễ trong hàng đợi (từ lúc đưa vào tới lúc gửi xong)
+        with self.lock:
+            latencies = sorted(self.latencies)
+            metrics = dict(self.metrics)
+        elapsed = time.perf_counter() - self.started_at if self.started_at else 0.0
+
+        def pct(p):
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else 0.0
+
+        metrics.update({
+            'pending': self.queue.qsize(),
+            'elapsed_s': elapsed,
+            'photos_per_s': metrics['sent'] / elapsed if elapsed else 0.0,
+            'queue_latency_p50_s': pct(0.5),
+            'queue_latency_p95_s': pct(0.95),
+            'queue_latency_max_s': latencies[-1] if latencies else 0.0,
+        })
+        return metrics